@@ -1,36 +1,64 @@
 # run_backtest.py
-from datetime import datetime
+"""Run one backtest.
+
+    python run_backtest.py --strategy RsiMacdStrategy --pair EURJPY --tf 1h --param rsi_period=10
+    python run_backtest.py --strategy RsiTrendStrategy --start 2024-04-01 --end 2024-07-01
+
+Without arguments the configuration block below is used. Strategies are looked
+up by class name in strategies/ (see tools.strategy_registry) and only the
+selected one is imported; pandas and the report tooling load only on the code
+paths that need them, so short scheduled jobs start fast.
+"""
+from __future__ import annotations
+
+import argparse
+import ast
+import contextlib
+import json
+import math
 import os
-from typing import Optional
+from datetime import datetime
+from typing import TYPE_CHECKING, List, Optional
 
-import pandas as pd
-import quantstats as qs
+import numpy as np
 import backtrader as bt
 
 # Tools
 from tools.equity_tracker import EquityTracker
+from tools.bar_cache import (ArrayData, cached_feed, load_arrays, load_compact, period_start,
+                             periods_back, resample_bars, row_slice, slice_bars)
+from tools.online_metrics import OnlineMetrics
+from tools.early_stop import EarlyStop
+from tools.indicator_cache import cached_indicators
+from tools.strategy_registry import discover, get_strategy
 
-# Strategies
-from strategies.sma_rsi_strategy import SmaRsiStrategy
-from strategies.rsi_trend_strategy import RsiTrendStrategy
-from strategies.rsi_macd_strategy import RsiMacdStrategy
-from strategies.rsi_macd_trend_strategy import RsiMacdTrendStrategy
-from strategies.rsi_trend_with_TP_SL import RsiTrendWithTPSLStrategy
-from strategies.hft_mean_reversion_strategy import HFTMeanReversionStrategy
-from strategies.sma_price_action_strategy import SMAPriceActionStrategy
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 # =========================
 # Configuration (edit here)
 # =========================
 PAIR = "EURUSD"              # currency pair to backtest, e.g. "EURUSD", "USDCAD", etc.
-STRATEGY = SMAPriceActionStrategy   # pick one of the imported strategies
+STRATEGY = "SMAPriceActionStrategy"  # class name of any strategy in strategies/
 DATA_PATH = "data"                  # folder with CSVs like EURUSD_1m.csv, etc.
 CASH_START = 10_000
 ORDER_SIZE = 1_000                  # fixed units
 MAIN_TF = "1h"                      # which feed to use as main: "1m", "15m", "1h", "4h", "1d"
 ADD_TREND_TF: Optional[str] = None  # e.g. "1h" or "1d" if your strategy reads datas[1]
+DERIVE_TREND_TF = True              # build the trend feed from the main bars in memory (no lookahead)
+FILL_TF: Optional[str] = None       # e.g. "15m": match stop/limit orders on finer bars (tools.intrabar)
+START: Optional[str] = None         # e.g. "2024-04-01": run from this date (warm-up bars loaded before it)
+END: Optional[str] = None           # e.g. "2024-07-01": run up to, not including, this date
+WARMUP_BARS: Optional[int] = None   # main bars before START; None = what the strategy's indicators need
 MAKE_PLOT = False                   # set True to show Backtrader chart at the end
+USE_BAR_CACHE = True                # stream bars from the binary cache in data/.cache
+COMPACT_BARS = False                # cache as int32 pips / epoch minutes, no empty columns (~60% smaller)
+EQUITY_BUCKET: Optional[float] = 1.0  # days per EquityTracker record (None = every bar)
+STOP_RULES: Optional[dict] = None   # e.g. dict(max_drawdown=0.2, min_value=8_000, no_trades_bars=500)
+CACHE_INDICATORS = False            # memoize standard indicators across runs (data/.cache/indicators)
+RENDER_REPORT = False               # render QuantStats now; else batch: python -m tools.report_builder
+USE_RESULT_STORE = True             # answer identical runs from reports/results.sqlite (tools.result_store)
 # =========================
 
 
@@ -50,12 +78,19 @@ def feed_path(pair: str, tf: str) -> str:
     return os.path.join(DATA_PATH, f"{pair}{suffix}")
 
 
-def make_feed(pair: str, tf: str) -> bt.feeds.GenericCSVData:
-    """Create a GenericCSVData feed for a given timeframe."""
+def make_feed(pair: str, tf: str, use_cache: Optional[bool] = None) -> bt.feed.DataBase:
+    """Create a feed for a given timeframe.
+
+    Served from the binary bar cache when enabled (built on first use),
+    otherwise parsed from the CSV with GenericCSVData.
+    """
     if tf not in TF_MAP:
         raise ValueError(f"Unknown timeframe '{tf}'. Supported: {list(TF_MAP.keys())}")
 
     timeframe, compression, dtformat, _ = TF_MAP[tf]
+    if USE_BAR_CACHE if use_cache is None else use_cache:
+        return cached_feed(feed_path(pair, tf), timeframe, compression, compact=COMPACT_BARS)
+
     return bt.feeds.GenericCSVData(
         dataname=feed_path(pair, tf),
         dtformat=dtformat,
@@ -67,6 +102,254 @@ def make_feed(pair: str, tf: str) -> bt.feeds.GenericCSVData:
     )
 
 
+def load_bars(pair: str, tf: str) -> dict:
+    """Column arrays for data/{PAIR}_{tf}.csv, memory-mapped from the bar cache
+    (a CompactBars, decoded on lookup, with COMPACT_BARS)."""
+    if tf not in TF_MAP:
+        raise ValueError(f"Unknown timeframe '{tf}'. Supported: {list(TF_MAP.keys())}")
+    load = load_compact if COMPACT_BARS else load_arrays
+    return load(feed_path(pair, tf), daily=TF_MAP[tf][0] >= bt.TimeFrame.Days)
+
+
+def tf_seconds(tf: str) -> int:
+    timeframe, compression, _, _ = TF_MAP[tf]
+    return compression * (86400 if timeframe >= bt.TimeFrame.Days else 60)
+
+
+def check_trend_tf(tf: str, trend_tf: str) -> None:
+    if tf_seconds(trend_tf) <= tf_seconds(tf):
+        raise ValueError(f"Trend timeframe '{trend_tf}' must be higher than '{tf}'")
+
+
+def check_fill_tf(tf: str, fill_tf: str) -> None:
+    if tf_seconds(fill_tf) >= tf_seconds(tf) or tf_seconds(tf) % tf_seconds(fill_tf):
+        raise ValueError(f"Fill timeframe '{fill_tf}' must evenly divide '{tf}'")
+
+
+def load_trend_bars(pair: str, tf: str, trend_tf: str, derive: bool = DERIVE_TREND_TF) -> dict:
+    """Column arrays for the trend feed of a `tf` run.
+
+    Derived in memory from the `tf` bars, each trend bar stamped at the source
+    bar that completes it (see resample_bars), or else loaded from the trend
+    timeframe's own CSV.
+    """
+    if not derive:
+        return load_bars(pair, trend_tf)
+    check_trend_tf(tf, trend_tf)
+    return resample_bars(load_bars(pair, tf), tf_seconds(trend_tf))
+
+
+def parse_date(text: Optional[str]) -> Optional[float]:
+    """'2024-04-01' or '2024-04-01 12:00' -> Backtrader float days (None stays None)."""
+    if text is None:
+        return None
+    try:
+        return bt.date2num(datetime.fromisoformat(text))
+    except ValueError:
+        raise ValueError(f"Bad date '{text}' (expected YYYY-MM-DD or YYYY-MM-DD HH:MM)") from None
+
+
+def strategy_minperiods(strategy_cls, params: Optional[dict] = None, n_feeds: int = 1) -> List[int]:
+    """Bars each feed needs before the strategy's next() can run (its indicators' warm-up).
+
+    Backtrader works these out when the strategy is built, so the strategy is
+    built once on one-bar feeds; nothing is run.
+    """
+    one_bar = {col: np.zeros(1) for col in ("datetime", "open", "high", "low", "close", "volume")}
+    one_bar["datetime"][0] = bt.date2num(datetime(2000, 1, 3))
+    cerebro = bt.Cerebro(stdstats=False)
+    for _ in range(n_feeds):
+        cerebro.adddata(ArrayData(arrays=one_bar))
+    cerebro.addstrategy(strategy_cls, **(params or {}))
+    strat = cerebro.run(runonce=False, preload=False)[0]
+    return list(strat._minperiods)
+
+
+def trend_feed_use(strategy_cls, params: Optional[dict] = None) -> Optional[str]:
+    """How the strategy uses a second (trend) feed: "required" when it cannot be
+    built without one, "optional" when it builds indicators on one if given, else None."""
+    try:
+        strategy_minperiods(strategy_cls, params, 1)
+    except IndexError:
+        return "required"
+    return "optional" if strategy_minperiods(strategy_cls, params, 2)[1] > 1 else None
+
+
+def gated_strategy(strategy_cls, start: float):
+    """Subclass of `strategy_cls` whose next() only runs on bars from `start` on.
+
+    Earlier (warm-up) bars still advance its indicators, but it cannot trade on them.
+    """
+    def next(self):
+        if self.datas[0].datetime[0] >= start:
+            strategy_cls.next(self)
+
+    return type(strategy_cls)(strategy_cls.__name__, (strategy_cls,),
+                              {"next": next, "__module__": strategy_cls.__module__})
+
+
+def window_feeds(strategy_cls, params: Optional[dict], pair: str, tf: str,
+                 trend_tf: Optional[str], derive_trend: bool, start: Optional[float],
+                 end: Optional[float], warmup: Optional[int] = WARMUP_BARS) -> list:
+    """Feeds over the bars in [start, end) plus warm-up bars before start.
+
+    The bar cache's datetime column is the timestamp index: binary searches on
+    the mapped arrays find the window, and only its bars are read, so loading
+    scales with the window rather than the file. `warmup` None takes the
+    strategy's own minimum periods (strategy_minperiods) on every feed; a
+    derived trend feed starts at a whole trend period, as in a full run.
+    run_backtest runs them with trade_from=start, so warm-up bars never trade.
+    """
+    bars = load_bars(pair, tf)
+    dt = bars["datetime"]
+    start = dt[0] if start is None else start
+    end = dt[-1] + 1 if end is None else end
+    first, hi = (int(i) for i in np.searchsorted(dt, [start, end]))
+    if first >= hi:
+        raise ValueError("No bars between the start and end dates")
+
+    need = strategy_minperiods(strategy_cls, params, 2 if trend_tf else 1) if warmup is None else None
+    lo = max(0, first - (need[0] - 1 if need else warmup))
+    trend = None
+    if trend_tf and derive_trend:
+        check_trend_tf(tf, trend_tf)
+        seconds = tf_seconds(trend_tf)
+        if need:
+            lo = min(lo, periods_back(dt, first, need[1], seconds))
+        lo = period_start(dt, lo, seconds)
+        trend = resample_bars(row_slice(bars, lo, hi), seconds)
+    elif trend_tf:
+        trend_bars = load_bars(pair, trend_tf)
+        if need:
+            t = max(0, int(np.searchsorted(trend_bars["datetime"], start)) - need[1])
+            lo = min(lo, int(np.searchsorted(dt, trend_bars["datetime"][t])))
+        # same time span as the main slice; CSV trend bars are stamped at their open, so a
+        # bar still looks ahead, as in a full run (derive_trend avoids it)
+        trend = slice_bars(trend_bars, dt[lo], end)
+
+    feeds = [bars_feed(row_slice(bars, lo, hi), tf)]
+    if trend is not None:
+        feeds.append(bars_feed(trend, trend_tf))
+    return feeds
+
+
+def bars_feed(bars: dict, tf: str) -> ArrayData:
+    """Wrap already-loaded column arrays as a feed (no re-parsing of the CSV)."""
+    timeframe, compression, _, _ = TF_MAP[tf]
+    return ArrayData(arrays=bars, timeframe=timeframe, compression=compression)
+
+
+def run_strategy(strategy_cls, feeds, params: Optional[dict] = None,
+                 cash: float = CASH_START, stake: int = ORDER_SIZE,
+                 analyzers: Optional[dict] = None,
+                 equity_bucket: Optional[float] = EQUITY_BUCKET,
+                 stop_rules: Optional[dict] = None,
+                 cache_indicators: bool = CACHE_INDICATORS,
+                 fill_bars: Optional[dict] = None,
+                 profiler=None, broker=None, cerebro: Optional[bt.Cerebro] = None,
+                 trade_from: Optional[float] = None):
+    """Run one strategy over the given feeds. Returns (cerebro, strategy).
+
+    `analyzers` maps extra analyzer names to classes, added next to "equity"
+    and "metrics". `stop_rules` are EarlyStop params; when given the run halts
+    as soon as one of them triggers. With `cache_indicators` the strategy's
+    standard indicators are served from tools.indicator_cache. `fill_bars`
+    (column arrays of a finer timeframe of feeds[0]) switches to
+    tools.intrabar.IntrabarBroker, which matches stop/limit orders on them. A
+    tools.profiler.Profiler passed as `profiler` times the run's hot paths.
+    `broker` replaces the default BackBroker (e.g. tools.live.PaperBroker);
+    `cerebro` is a prepared Cerebro to set up and run instead of a new one
+    (e.g. tools.checkpoint.SnapshotCerebro). With `trade_from` (Backtrader
+    float date) the bars before it only warm up: the strategy does not trade
+    on them (gated_strategy) and the equity and metrics analyzers skip them.
+    """
+    cerebro = cerebro if cerebro is not None else bt.Cerebro()
+    if broker is not None:
+        cerebro.broker = broker
+    if fill_bars is not None:
+        from tools.intrabar import IntrabarBroker, attach_fine_bars
+        cerebro.broker = IntrabarBroker()
+        attach_fine_bars(feeds[0], fill_bars)
+    if trade_from is not None:
+        strategy_cls = gated_strategy(strategy_cls, trade_from)
+    cerebro.addstrategy(strategy_cls, **(params or {}))
+    cerebro.addanalyzer(EquityTracker, _name="equity", bucket=equity_bucket, start=trade_from)
+    cerebro.addanalyzer(OnlineMetrics, _name="metrics", start=trade_from)
+    if stop_rules:
+        cerebro.addanalyzer(EarlyStop, _name="early_stop", **stop_rules)
+    for name, analyzer in (analyzers or {}).items():
+        cerebro.addanalyzer(analyzer, _name=name)
+    if profiler is not None:
+        from tools.profiler import ProfileAnalyzer
+        cerebro.addanalyzer(ProfileAnalyzer, _name="profile", profiler=profiler)
+        profiler.instrument_feeds(feeds)
+    for feed in feeds:
+        cerebro.adddata(feed)
+    cerebro.broker.setcash(cash)
+    cerebro.addsizer(bt.sizers.FixedSize, stake=stake)
+    with _phase(profiler, "run"):
+        if cache_indicators:
+            with cached_indicators():
+                results = cerebro.run()
+        else:
+            results = cerebro.run()
+    return cerebro, results[0]
+
+
+def _phase(profiler, name: str):
+    """profiler.phase(name), or a no-op when not profiling."""
+    return profiler.phase(name) if profiler is not None else contextlib.nullcontext()
+
+
+def equity_series(strat) -> pd.Series:
+    """Equity curve recorded by the EquityTracker analyzer."""
+    return strat.analyzers.equity.series()
+
+
+def daily_returns(eq: pd.Series) -> pd.Series:
+    """Daily returns based on EOD equity."""
+    equity_daily = eq.resample("1D").last().dropna()
+    return equity_daily.pct_change().dropna()
+
+
+def daily_drawdown(returns: pd.Series) -> pd.Series:
+    daily_curve = (1 + returns).cumprod()
+    return daily_curve / daily_curve.cummax() - 1.0
+
+
+def sharpe_ratio(returns: pd.Series, periods: int = 252) -> float:
+    """Annualized Sharpe of daily returns (risk-free rate 0, as QuantStats)."""
+    std = returns.std()
+    if not std or math.isnan(std):
+        return 0.0
+    return float(returns.mean() / std * periods ** 0.5)
+
+
+def summary_metrics(cerebro, strat, cash: float = CASH_START) -> dict:
+    """Final value, ROI (%) and the OnlineMetrics figures of a finished run.
+
+    Read from the running totals, so no equity series or pandas work is needed.
+    """
+    m = strat.analyzers.metrics.get_analysis()
+    final_value = cerebro.broker.getvalue()
+    return {
+        "final_value": final_value,
+        "roi": (final_value - cash) / cash * 100,
+        "max_daily_dd": m["max_daily_dd"],
+        "max_dd": m["max_drawdown"],
+        "sharpe": m["sharpe"],
+        "sortino": m["sortino"],
+        "exposure": m["exposure"],
+        "stop_reason": stop_reason(strat),
+    }
+
+
+def stop_reason(strat) -> Optional[str]:
+    """Why EarlyStop halted the run, or None if it ran to the end."""
+    early_stop = getattr(strat.analyzers, "early_stop", None)
+    return early_stop.reason if early_stop else None
+
+
 def ensure_dir(path: str) -> None:
     if not os.path.exists(path):
         os.makedirs(path, exist_ok=True)
@@ -79,88 +362,296 @@ def build_report_folder(strategy_cls, pair: str, tf: str) -> str:
     return folder
 
 
-def run_backtest():
-    report_path = build_report_folder(STRATEGY, PAIR, MAIN_TF)
-
-    # --- Cerebro setup ---
-    cerebro = bt.Cerebro()
-    cerebro.addstrategy(STRATEGY)
-    cerebro.addanalyzer(EquityTracker, _name="equity")
+def parse_assignments(items: List[str]) -> dict:
+    """['rsi_period=10', 'mode="fast"'] -> {'rsi_period': 10, 'mode': 'fast'}.
+
+    Values are read as Python literals, falling back to the raw string.
+    """
+    out = {}
+    for item in items:
+        name, sep, raw = item.partition("=")
+        if not sep or not name:
+            raise ValueError(f"Expected NAME=VALUE, got '{item}'")
+        try:
+            value = ast.literal_eval(raw)
+        except (ValueError, SyntaxError):
+            value = raw
+        out[name.strip()] = value
+    return out
+
+
+def run_backtest(strategy=STRATEGY, pair: str = PAIR, tf: str = MAIN_TF,
+                 trend_tf: Optional[str] = ADD_TREND_TF, params: Optional[dict] = None,
+                 stop_rules: Optional[dict] = STOP_RULES, cash: float = CASH_START,
+                 stake: int = ORDER_SIZE, render: bool = RENDER_REPORT,
+                 plot: bool = MAKE_PLOT, metrics_only: bool = False,
+                 derive_trend: bool = DERIVE_TREND_TF, fill_tf: Optional[str] = FILL_TF,
+                 store: bool = USE_RESULT_STORE, rerun: bool = False,
+                 start: Optional[str] = START, end: Optional[str] = END,
+                 warmup: Optional[int] = WARMUP_BARS, profiler=None) -> dict:
+    """Run one backtest and return its summary metrics.
+
+    `strategy` is a class or a class name from strategies/. With `metrics_only`
+    nothing is printed or written (no report folder, no pandas). With `fill_tf`
+    stop/limit orders are matched on that finer timeframe's bars. With `store`
+    an identical earlier run is answered from tools.result_store without
+    running (`rerun` runs anyway and replaces it), its report folder rebuilt
+    from the stored daily equity; plotting and profiling always run.
+    `start` / `end` (ISO dates) limit the run to that window, loaded with
+    `warmup` bars before it (see window_feeds). `profiler`
+    (tools.profiler.Profiler) records phase and hot-path timings.
+    """
+    with _phase(profiler, "load_strategy"):
+        strategy_cls = get_strategy(strategy) if isinstance(strategy, str) else strategy
+
+    # --- Result store: an identical earlier run answers without running ---
+    results = key = None
+    if store and not plot and profiler is None:
+        from tools.result_store import ResultStore, TradeList
+        results = ResultStore()
+        config = {"pair": pair, "tf": tf, "trend_tf": trend_tf, "fill_tf": fill_tf,
+                  "derive_trend": derive_trend, "stop_rules": stop_rules, "cash": cash,
+                  "stake": stake, "equity_bucket": EQUITY_BUCKET}
+        if start or end:
+            config.update(start=start, end=end, warmup=warmup)
+        key = results.run_key(strategy_cls, params, config,
+                              data_files(pair, tf, trend_tf, derive_trend, fill_tf))
+        hit = results.get(key) if key and not rerun else None
+        if hit:
+            eq = None if metrics_only else results.equity(key)
+            results.close()
+            if not metrics_only:
+                print(f"Identical run in the result store (key {key[:12]}, {hit['created']}); "
+                      "not re-run, pass --rerun to run it again")
+                # the report folder is rebuilt from the stored daily equity
+                write_report(build_report_folder(strategy_cls, pair, tf), eq, strategy_cls.__name__,
+                             pair, tf, hit["metrics"]["stop_reason"], render, profiler)
+                print_performance(hit["metrics"], cash)
+            return hit["metrics"]
 
     # Data feeds
-    data_main = make_feed(PAIR, MAIN_TF)
-    cerebro.adddata(data_main)  # data[0]
+    with _phase(profiler, "make_feeds"):
+        if start or end:
+            feeds = window_feeds(strategy_cls, params, pair, tf, trend_tf, derive_trend,
+                                 parse_date(start), parse_date(end), warmup)
+        else:
+            feeds = [make_feed(pair, tf)]  # data[0]
+            if trend_tf and derive_trend:
+                feeds.append(bars_feed(load_trend_bars(pair, tf, trend_tf), trend_tf))  # data[1]
+            elif trend_tf:
+                feeds.append(make_feed(pair, trend_tf))  # data[1]
+        fill_bars = load_bars(pair, fill_tf) if fill_tf else None
+
+    analyzers = {"trade_list": TradeList} if key else None
+    if metrics_only:
+        cerebro, strat = run_strategy(strategy_cls, feeds, params, cash, stake, analyzers,
+                                      stop_rules=stop_rules, fill_bars=fill_bars, profiler=profiler,
+                                      trade_from=parse_date(start))
+        metrics = summary_metrics(cerebro, strat, cash)
+        if key:
+            store_run(results, key, strategy_cls, params, config, metrics, strat)
+        return metrics
+
+    report_path = build_report_folder(strategy_cls, pair, tf)
+    if fill_tf:
+        print(f"Stop/limit fills resolved on {fill_tf} bars")
+    if trend_tf:
+        print(f"Added trend TF: {trend_tf}" + (f" (derived from {tf})" if derive_trend else ""))
+    if start or end:
+        first = bt.num2date(feeds[0].p.arrays["datetime"][0])
+        print(f"Date range: {start or 'start'} .. {end or 'end'} (bars loaded from {first:%Y-%m-%d %H:%M})")
+
+    print(f"Starting Portfolio Value: {cash:.2f}")
 
-    data_trend = None
-    if ADD_TREND_TF:
-        data_trend = make_feed(PAIR, ADD_TREND_TF)
-        cerebro.adddata(data_trend)  # data[1]
-        print(f"Added trend TF: {ADD_TREND_TF}")
+    # --- Run ---
+    cerebro, strat = run_strategy(strategy_cls, feeds, params, cash, stake, analyzers,
+                                  stop_rules=stop_rules, fill_bars=fill_bars, profiler=profiler,
+                                  trade_from=parse_date(start))
+    reason = stop_reason(strat)
+    if reason:
+        print(f"Run stopped early: {reason}")
 
-    # Broker & sizing
-    cerebro.broker.setcash(CASH_START)
-    cerebro.addsizer(bt.sizers.FixedSize, stake=ORDER_SIZE)
+    # --- Equity from analyzer (use exact bt timestamps) ---
+    with _phase(profiler, "equity_series"):
+        eq = equity_series(strat)
+    write_report(report_path, eq, strategy_cls.__name__, pair, tf, reason, render, profiler)
 
-    print(f"Starting Portfolio Value: {cerebro.broker.getvalue():.2f}")
+    # --- Summary ---
+    metrics = summary_metrics(cerebro, strat, cash)
+    if key:
+        store_run(results, key, strategy_cls, params, config, metrics, strat)
+    print_performance(metrics, cash)
 
-    # --- Run ---
-    results = cerebro.run()
-    strat = results[0]
+    if plot:
+        cerebro.plot(style="candlestick")
+    return metrics
 
-    # --- Equity from analyzer (use exact bt timestamps) ---
-    equity_values = strat.analyzers.equity.values
-    equity_times = pd.DatetimeIndex(strat.analyzers.equity.datetimes)
 
-    # De-duplicate timestamps just in case (keep last tick of same timestamp)
-    eq = pd.Series(equity_values, index=equity_times)
-    eq = eq[~eq.index.duplicated(keep="last")]
+def write_report(report_path: str, eq: pd.Series, strategy_name: str, pair: str, tf: str,
+                 reason: Optional[str], render: bool = RENDER_REPORT, profiler=None) -> None:
+    """Fill a report folder from an equity curve: daily drawdown, the daily returns
+    for the QuantStats report, and the report itself with `render`."""
+    with _phase(profiler, "import_reporting"):
+        from tools.report_builder import render_report, save_run, write_index
 
     # --- Daily drawdown (based on EOD equity) ---
-    equity_daily = eq.resample("1D").last().dropna()
-    daily_returns = equity_daily.pct_change().dropna()
-    daily_curve = (1 + daily_returns).cumprod()
-    daily_dd = daily_curve / daily_curve.cummax() - 1.0
-    max_daily_dd = daily_dd.min()
+    with _phase(profiler, "daily_drawdown"):
+        returns = daily_returns(eq)
+        daily_dd = daily_drawdown(returns)
+        max_daily_dd = daily_dd.min()
+        daily_dd.to_csv(os.path.join(report_path, "daily_drawdown.csv"))
 
     print(f"\nMax Daily Drawdown: {max_daily_dd:.2%}")
-    daily_dd.to_csv(os.path.join(report_path, "daily_drawdown.csv"))
     print("Daily drawdown saved to 'daily_drawdown.csv'")
 
-    # --- QuantStats report (use daily returns) ---
-    qs_report_filename = "qs_report.html"
-    qs_report_path = os.path.join(report_path, qs_report_filename)
-
-    qs.reports.html(
-        daily_returns,
-        output=qs_report_path,
-        title=f"{PAIR} Strategy Performance",
-    )
-    print(f"QuantStats report saved as '{qs_report_path}'")
-
-    # Save a copy into docs/ for GitHub Pages
-    ensure_dir("docs")
-    qs_docs_filename = (
-        f"{STRATEGY.__name__}_{PAIR}_{MAIN_TF}_"
-        f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_qs_report.html"
-    )
-    qs_docs_path = os.path.join("docs", qs_docs_filename)
-    import shutil
-    shutil.copy(qs_report_path, qs_docs_path)
-    print(f"QuantStats report also copied to '{qs_docs_path}' for GitHub Pages")
-
-    # --- Summary ---
-    final_value = cerebro.broker.getvalue()
-    profit = final_value - CASH_START
-    roi = (profit / CASH_START) * 100
-
+    # --- Daily returns for the QuantStats report (rendered in batch) ---
+    with _phase(profiler, "save_run"):
+        save_run(report_path, returns, strategy_name, pair, tf, reason)
+    if reason is not None:
+        print("QuantStats report skipped for a stopped run")
+    elif render:
+        with _phase(profiler, "render_report"):
+            qs_docs_path = render_report(report_path)
+            write_index()
+        print(f"QuantStats report saved and copied to '{qs_docs_path}' for GitHub Pages")
+    else:
+        print("Daily returns saved; render reports with 'python -m tools.report_builder'")
+
+
+def data_files(pair: str, tf: str, trend_tf: Optional[str], derive_trend: bool,
+               fill_tf: Optional[str]) -> List[str]:
+    """The CSVs a run reads: the main timeframe, plus the trend and fill timeframes' own."""
+    files = [feed_path(pair, tf)]
+    if trend_tf and not derive_trend:
+        files.append(feed_path(pair, trend_tf))
+    if fill_tf:
+        files.append(feed_path(pair, fill_tf))
+    return files
+
+
+def store_run(results, key: str, strategy_cls, params: Optional[dict], config: dict,
+              metrics: dict, strat) -> None:
+    """Save a finished run (metrics, daily equity, closed trades) under its key."""
+    from tools.result_store import daily_equity
+
+    results.put(key, strategy_cls, params, config, metrics,
+                daily_equity(strat.analyzers.equity.arrays()),
+                strat.analyzers.trade_list.get_analysis())
+    results.close()
+
+
+def print_performance(metrics: dict, cash: float) -> None:
     print("\n--- Performance Summary ---")
-    print(f"Final Portfolio Value: ${final_value:.2f}")
-    print(f"Total Profit: ${profit:.2f}")
-    print(f"ROI: {roi:.2f}%")
-
-    if MAKE_PLOT:
-        cerebro.plot(style="candlestick")
+    print(f"Final Portfolio Value: ${metrics['final_value']:.2f}")
+    print(f"Total Profit: ${metrics['final_value'] - cash:.2f}")
+    print(f"ROI: {metrics['roi']:.2f}%")
+    print(f"Sharpe: {metrics['sharpe']:.2f} | Sortino: {metrics['sortino']:.2f}")
+    print(f"Exposure: {metrics['exposure']:.1%}")
+
+
+def profile_backtest(run_args: tuple, json_path: str, pstats_path: Optional[str] = None,
+                     quiet: bool = False) -> dict:
+    """run_backtest(*run_args) under a Profiler (and cProfile); write the JSON profile."""
+    import cProfile
+    from tools.profiler import Profiler, print_summary
+
+    profiler = Profiler()
+    profile = cProfile.Profile() if pstats_path else None
+    if profile:
+        profile.enable()
+    metrics = run_backtest(*run_args, profiler=profiler)
+    if profile:
+        profile.disable()
+        profile.dump_stats(pstats_path)
+
+    strategy_cls, pair, tf, trend_tf, params = run_args[:5]
+    report = profiler.report(strategy=strategy_cls.__name__, pair=pair, tf=tf,
+                             trend_tf=trend_tf, params=params)
+    with open(json_path, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    if not quiet:
+        print_summary(report)
+        print(f"Profile saved to '{json_path}'"
+              + (f", cProfile stats to '{pstats_path}'" if pstats_path else ""))
+    return metrics
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Run one backtest (defaults: config block).")
+    parser.add_argument("--strategy", default=STRATEGY, help="strategy class name")
+    parser.add_argument("--pair", default=PAIR)
+    parser.add_argument("--tf", default=MAIN_TF, choices=list(TF_MAP))
+    parser.add_argument("--trend-tf", default=ADD_TREND_TF, choices=list(TF_MAP))
+    parser.add_argument("--csv-trend", dest="derive_trend", action="store_false",
+                        default=DERIVE_TREND_TF, help="read the trend TF from its CSV instead of "
+                                                      "deriving it from the main bars")
+    parser.add_argument("--fill-tf", default=FILL_TF, choices=list(TF_MAP),
+                        help="match stop/limit orders intrabar on this finer timeframe")
+    parser.add_argument("--start", default=START, metavar="DATE",
+                        help="run from this date (YYYY-MM-DD[ HH:MM]); warm-up bars are loaded before it")
+    parser.add_argument("--end", default=END, metavar="DATE", help="run up to, not including, this date")
+    parser.add_argument("--warmup", type=int, default=WARMUP_BARS, metavar="BARS",
+                        help="main bars to load before --start (default: the strategy's warm-up)")
+    parser.add_argument("--param", action="append", default=[], metavar="NAME=VALUE",
+                        help="strategy parameter, repeatable")
+    parser.add_argument("--stop", action="append", default=[], metavar="RULE=VALUE",
+                        help="EarlyStop rule, e.g. max_drawdown=0.2; repeatable")
+    parser.add_argument("--cash", type=float, default=CASH_START)
+    parser.add_argument("--stake", type=int, default=ORDER_SIZE)
+    parser.add_argument("--render-report", action="store_true", default=RENDER_REPORT,
+                        help="render the QuantStats report now instead of in batch")
+    parser.add_argument("--plot", action="store_true", default=MAKE_PLOT)
+    parser.add_argument("--metrics-only", action="store_true",
+                        help="print the summary metrics as JSON, write no report folder")
+    parser.add_argument("--profile", nargs="?", const="profile.json", metavar="JSON",
+                        help="time phases, indicators and callbacks; write the profile as JSON "
+                             "(default: profile.json)")
+    parser.add_argument("--pstats", metavar="FILE",
+                        help="with --profile, also dump cProfile stats of the whole run")
+    parser.add_argument("--rerun", action="store_true",
+                        help="run even if an identical run is stored, replacing it")
+    parser.add_argument("--no-store", dest="store", action="store_false", default=USE_RESULT_STORE,
+                        help="neither read nor write the result store")
+    parser.add_argument("--list-strategies", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.list_strategies:
+        print("\n".join(sorted(discover())))
+        return
+    try:
+        params = parse_assignments(args.param)
+        stop_rules = parse_assignments(args.stop) or STOP_RULES
+        strategy_cls = get_strategy(args.strategy)
+        if args.trend_tf and args.derive_trend:
+            check_trend_tf(args.tf, args.trend_tf)
+        elif not args.trend_tf and trend_feed_use(strategy_cls, params) == "required":
+            raise ValueError(f"{args.strategy} reads datas[1]: it needs --trend-tf")
+        if args.fill_tf:
+            check_fill_tf(args.tf, args.fill_tf)
+        start, end = parse_date(args.start), parse_date(args.end)
+        if start is not None and end is not None and start >= end:
+            raise ValueError("--start must be before --end")
+        if start is not None or end is not None:
+            dt = load_bars(args.pair, args.tf)["datetime"]
+            first, hi = np.searchsorted(dt, [dt[0] if start is None else start,
+                                             dt[-1] + 1 if end is None else end])
+            if first >= hi:
+                raise ValueError(f"No {args.pair} {args.tf} bars between --start and --end")
+    except ValueError as e:
+        parser.error(str(e))
+
+    run_args = (
+        strategy_cls, args.pair, args.tf, args.trend_tf, params, stop_rules,
+        args.cash, args.stake, args.render_report, args.plot, args.metrics_only,
+        args.derive_trend, args.fill_tf, args.store, args.rerun, args.start, args.end, args.warmup,
+    )
+    if args.profile:
+        metrics = profile_backtest(run_args, args.profile, args.pstats, quiet=args.metrics_only)
+    else:
+        metrics = run_backtest(*run_args)
+    if args.metrics_only:
+        print(json.dumps({"strategy": args.strategy, "pair": args.pair, "tf": args.tf, **metrics}))
 
 
 if __name__ == "__main__":
-    run_backtest()
+    main()
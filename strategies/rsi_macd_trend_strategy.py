@@ -12,8 +12,8 @@ class RsiMacdTrendStrategy(bt.Strategy):
     )
 
     def __init__(self):
-        self.data_main = self.datas[0]  # 15m
-        self.data_trend = self.datas[1]  # for trend filtering
+        self.data_main = self.datas[0]  # main timeframe
+        self.data_trend = self.datas[1]  # higher timeframe for trend filtering
 
         self.rsi = bt.indicators.RSI(self.data_main.close, period=self.params.rsi_period)
 
@@ -11,8 +11,9 @@ class RsiTrendWithTPSLStrategy(bt.Strategy):
     )
 
     def __init__(self):
-        self.data_main = self.datas[0]  # 15m
-        self.data_trend = self.datas[0]  # 1h
+        self.data_main = self.datas[0]  # main timeframe
+        # higher-timeframe trend feed when one is added (ADD_TREND_TF), else the main feed
+        self.data_trend = self.datas[1] if len(self.datas) > 1 else self.datas[0]
 
         self.rsi = bt.indicators.RSI(self.data_main.close, period=self.params.rsi_period)
         self.trend_sma = bt.indicators.SMA(self.data_trend.close, period=self.params.trend_sma_period)
@@ -0,0 +1,408 @@
+"""Binary columnar cache for the OHLCV CSVs in data/.
+
+The first time a CSV is requested it is parsed once and written next to the
+data as one ``.npy`` file per column under ``data/.cache/{PAIR}_{tf}/``.
+Later runs memory-map those arrays and stream bars straight into Backtrader
+through ``ArrayData`` -- no text parsing, no ``strptime``.
+
+The datetime column is stored already converted with Backtrader's own
+``date2num`` (including the end-of-session shift GenericCSVData applies to
+daily bars), so cached and CSV feeds produce bit-identical bars.
+
+A cache entry is valid while the source file's mtime and size match the
+values recorded in its ``meta.json``; otherwise it is rebuilt.
+
+Compact entries (``data/.cache/compact/``, opt-in through COMPACT_BARS in
+run_backtest) hold the same bars in less than half the bytes: prices as int32
+in units of the instrument's last quoted decimal (5 for EURUSD, 3 for
+EURJPY), intraday timestamps as int32 epoch minutes, and all-zero columns
+(volume in the bundled files) not at all. Every column is only stored that
+way if it decodes back to exactly the float64 cache values; otherwise it is
+kept as float64. ``CompactBars`` decodes the columns on lookup and feeds
+stream them a chunk at a time, so strategies see identical bars.
+"""
+from __future__ import annotations
+
+import datetime as _dt
+import json
+import os
+from collections.abc import Mapping
+from typing import TYPE_CHECKING, Dict, Iterator, Optional
+
+import numpy as np
+import backtrader as bt
+from backtrader.utils import date2num
+
+if TYPE_CHECKING:
+    import pandas as pd  # imported lazily: only cache builds and series need it
+
+
+CACHE_DIR = os.path.join("data", ".cache")
+COLUMNS = ("datetime", "open", "high", "low", "close", "volume")
+SESSION_END = _dt.time(23, 59, 59, 999990)  # Backtrader's default sessionend
+COMPACT_DIR = os.path.join(CACHE_DIR, "compact")
+CHUNK_ROWS = 8_192                  # bars decoded at a time when a feed streams compact columns
+MAX_DECIMALS = 8                    # most price decimals tried before keeping float64
+EPOCH_ORDINAL = 719163              # date.toordinal() of 1970-01-01
+
+
+def _source_key(csv_path: str) -> dict:
+    st = os.stat(csv_path)
+    return {"mtime_ns": st.st_mtime_ns, "size": st.st_size}
+
+
+def cache_path(csv_path: str, cache_dir: str = CACHE_DIR) -> str:
+    """data/EURUSD_1h.csv -> data/.cache/EURUSD_1h"""
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(cache_dir, stem)
+
+
+def bt_datetimes(index: pd.DatetimeIndex, daily: bool) -> np.ndarray:
+    """Convert timestamps exactly as GenericCSVData does (float days, UTC)."""
+    out = np.empty(len(index), dtype=np.float64)
+    for i, dt in enumerate(index.to_pydatetime()):
+        num = date2num(dt)
+        if daily:
+            eos = date2num(_dt.datetime.combine(dt.date(), SESSION_END))
+            if eos > num:
+                num = eos
+        out[i] = num
+    return out
+
+
+def bt_num_to_datetime(nums: np.ndarray) -> pd.DatetimeIndex:
+    """Backtrader float dates -> DatetimeIndex, rounded exactly like bt.num2date."""
+    import pandas as pd
+
+    x = np.asarray(nums, dtype=np.float64)
+    days = x.astype(np.int64)
+    hour, rem = np.divmod(24.0 * (x - days), 1)
+    minute, rem = np.divmod(60.0 * rem, 1)
+    second, rem = np.divmod(60.0 * rem, 1)
+    micro = (1e6 * rem).astype(np.int64)
+    micro[micro < 10] = 0
+    micro[micro > 999990] = 1_000_000
+    seconds = (days - EPOCH_ORDINAL) * 86400 + (hour * 3600 + minute * 60 + second).astype(np.int64)
+    return pd.DatetimeIndex(pd.to_datetime(seconds * 1_000_000 + micro, unit="us"))
+
+
+def _is_cached(folder: str, key: dict) -> bool:
+    meta_file = os.path.join(folder, "meta.json")
+    if not os.path.exists(meta_file):
+        return False
+    with open(meta_file) as f:
+        meta = json.load(f)
+    return meta.get("source") == key
+
+
+def build_cache(csv_path: str, daily: bool, cache_dir: str = CACHE_DIR) -> str:
+    """Parse a CSV once and write its columns as .npy files. Returns the folder."""
+    folder = cache_path(csv_path, cache_dir)
+    os.makedirs(folder, exist_ok=True)
+    key = _source_key(csv_path)
+
+    import pandas as pd
+
+    df = pd.read_csv(csv_path, index_col=0, parse_dates=True)
+    columns = {"datetime": bt_datetimes(df.index, daily)}
+    for col in COLUMNS[1:]:
+        columns[col] = df[col].to_numpy(dtype=np.float64) if col in df else np.zeros(len(df))
+
+    # Write to temp names and rename, meta last: concurrent readers (e.g. sweep
+    # workers) either see a complete entry or rebuild it themselves.
+    tmp = f".tmp{os.getpid()}"
+    for col, arr in columns.items():
+        target = os.path.join(folder, f"{col}.npy")
+        with open(target + tmp, "wb") as f:
+            np.save(f, arr)
+        os.replace(target + tmp, target)
+
+    meta_file = os.path.join(folder, "meta.json")
+    with open(meta_file + tmp, "w") as f:
+        json.dump({"source": key, "rows": len(df), "daily": daily}, f)
+    os.replace(meta_file + tmp, meta_file)
+    return folder
+
+
+def load_arrays(csv_path: str, daily: bool, cache_dir: str = CACHE_DIR) -> Dict[str, np.ndarray]:
+    """Memory-mapped columns for a CSV, (re)building the cache entry if stale."""
+    folder = cache_path(csv_path, cache_dir)
+    if not _is_cached(folder, _source_key(csv_path)):
+        build_cache(csv_path, daily, cache_dir)
+    return {
+        col: np.load(os.path.join(folder, f"{col}.npy"), mmap_mode="r")
+        for col in COLUMNS
+    }
+
+
+# --- Compact entries ---
+
+def _price_decimals(x: np.ndarray) -> Optional[int]:
+    """Fewest decimals that represent every price exactly within int32, or None."""
+    for d in range(MAX_DECIMALS + 1):
+        scaled = np.rint(x * 10 ** d)
+        if np.abs(scaled).max(initial=0) >= 2 ** 31:
+            return None
+        if np.array_equal(scaled / 10 ** d, x):
+            return d
+    return None
+
+
+def _decode(raw: Optional[np.ndarray], encoding: dict, rows: int) -> np.ndarray:
+    kind = encoding["kind"]
+    if kind == "zeros":
+        return np.zeros(rows)
+    if kind == "minutes":
+        days, minutes = np.divmod(raw.astype(np.int64), 1440)
+        return (days + EPOCH_ORDINAL) + minutes / 1440
+    if kind == "scaled":
+        return raw / 10 ** encoding["decimals"]
+    return np.asarray(raw, dtype=np.float64)
+
+
+def encode_compact(arrays: Dict[str, np.ndarray]) -> tuple:
+    """(stored columns, encodings) for float64 bar columns; lossless by construction."""
+    rows = len(arrays["datetime"])
+    columns, encodings = {}, {}
+    for col in COLUMNS:
+        x = np.asarray(arrays[col], dtype=np.float64)
+        if not x.any():
+            encodings[col] = {"kind": "zeros"}
+            continue
+        if col == "datetime":
+            raw = np.rint((x - EPOCH_ORDINAL) * 1440)
+            candidates = [({"kind": "minutes"}, raw.astype(np.int32))] \
+                if np.abs(raw).max() < 2 ** 31 else []
+        else:
+            d = _price_decimals(x)
+            candidates = [] if d is None else [({"kind": "scaled", "decimals": d},
+                                                np.rint(x * 10 ** d).astype(np.int32))]
+        encoding, raw = next(((e, r) for e, r in candidates
+                              if np.array_equal(_decode(r, e, rows), x)), ({"kind": "float64"}, x))
+        columns[col], encodings[col] = raw, encoding
+    return columns, encodings
+
+
+class CompactBars(Mapping):
+    """{column: float64 array} view of compact columns, decoded on lookup.
+
+    Indexing a column decodes all of it; ArrayData streams the bars through
+    iter_rows() instead, CHUNK_ROWS at a time.
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray], encodings: Dict[str, dict], rows: int):
+        self.columns = columns
+        self.encodings = encodings
+        self.rows = rows
+
+    def __getitem__(self, col: str) -> np.ndarray:
+        return self.decode(col)
+
+    def __iter__(self):
+        return iter(COLUMNS)
+
+    def __len__(self) -> int:
+        return len(COLUMNS)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(arr.nbytes for arr in self.columns.values())
+
+    def slice(self, lo: int, hi: int) -> "CompactBars":
+        """Bars lo:hi, still compact (views of the mapped columns)."""
+        lo, hi, _ = slice(lo, hi).indices(self.rows)
+        return CompactBars({c: a[lo:hi] for c, a in self.columns.items()}, self.encodings,
+                           max(hi - lo, 0))
+
+    def decode(self, col: str, lo: int = 0, hi: Optional[int] = None) -> np.ndarray:
+        hi = self.rows if hi is None else hi
+        raw = self.columns.get(col)
+        return _decode(None if raw is None else raw[lo:hi], self.encodings[col], hi - lo)
+
+    def iter_rows(self, chunk: int = CHUNK_ROWS) -> Iterator[tuple]:
+        """(datetime, open, high, low, close, volume) float tuples, like ArrayData's rows."""
+        for lo in range(0, self.rows, chunk):
+            hi = min(lo + chunk, self.rows)
+            yield from zip(*(memoryview(self.decode(c, lo, hi)) for c in COLUMNS))
+
+
+def build_compact(csv_path: str, daily: bool, cache_dir: str = COMPACT_DIR) -> str:
+    """Write the compact entry of a CSV, from its float64 cache entry. Returns the folder."""
+    arrays = load_arrays(csv_path, daily)
+    folder = cache_path(csv_path, cache_dir)
+    os.makedirs(folder, exist_ok=True)
+    columns, encodings = encode_compact(arrays)
+
+    tmp = f".tmp{os.getpid()}"   # same write-then-rename protocol as build_cache
+    for col, arr in columns.items():
+        target = os.path.join(folder, f"{col}.npy")
+        with open(target + tmp, "wb") as f:
+            np.save(f, arr)
+        os.replace(target + tmp, target)
+
+    meta_file = os.path.join(folder, "meta.json")
+    with open(meta_file + tmp, "w") as f:
+        json.dump({"source": _source_key(csv_path), "rows": len(arrays["datetime"]),
+                   "daily": daily, "columns": encodings}, f)
+    os.replace(meta_file + tmp, meta_file)
+    return folder
+
+
+def load_compact(csv_path: str, daily: bool, cache_dir: str = COMPACT_DIR) -> CompactBars:
+    """Memory-mapped compact columns for a CSV, (re)building the entry if stale."""
+    folder = cache_path(csv_path, cache_dir)
+    if not _is_cached(folder, _source_key(csv_path)):
+        build_compact(csv_path, daily, cache_dir)
+    with open(os.path.join(folder, "meta.json")) as f:
+        meta = json.load(f)
+    columns = {
+        col: np.load(os.path.join(folder, f"{col}.npy"), mmap_mode="r")
+        for col, encoding in meta["columns"].items() if encoding["kind"] != "zeros"
+    }
+    return CompactBars(columns, meta["columns"], meta["rows"])
+
+
+def resample_bars(bars: Dict[str, np.ndarray], seconds: int) -> Dict[str, np.ndarray]:
+    """Aggregate bar columns into `seconds`-long bars (UTC-aligned), without lookahead.
+
+    OHLCV are aggregated like tools/resample_csv_files. Each bar is stamped
+    with the datetime of its last source bar, so a feed built from it delivers
+    the bar together with the source bar that completes it, never earlier.
+    """
+    dt = bars["datetime"]
+    period = np.rint(np.asarray(dt) * 86400).astype(np.int64) // seconds
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(period)) + 1))
+    ends = np.concatenate((starts[1:], [len(dt)])) - 1
+    return {
+        "datetime": np.asarray(dt[ends], dtype=np.float64),
+        "open": np.asarray(bars["open"][starts], dtype=np.float64),
+        "high": np.maximum.reduceat(bars["high"], starts),
+        "low": np.minimum.reduceat(bars["low"], starts),
+        "close": np.asarray(bars["close"][ends], dtype=np.float64),
+        "volume": np.add.reduceat(bars["volume"], starts),
+    }
+
+
+def period_start(dt, i: int, seconds: int) -> int:
+    """Index of the first bar in the `seconds`-long period (UTC-aligned) of bar i.
+
+    Like periods_back, it only reads bars near i, doubling the look-back as needed.
+    """
+    step = 64
+    while True:
+        lo = max(0, i - step)
+        period = np.rint(np.asarray(dt[lo:i + 1]) * 86400).astype(np.int64) // seconds
+        first = lo + int(np.searchsorted(period, period[-1]))
+        if first > lo or lo == 0:
+            return first
+        step *= 2
+
+
+def periods_back(dt, i: int, periods: int, seconds: int) -> int:
+    """Index of the first bar of the period `periods` whole periods before bar i's."""
+    step = 64
+    while True:
+        lo = max(0, i - step)
+        period = np.rint(np.asarray(dt[lo:i + 1]) * 86400).astype(np.int64) // seconds
+        starts = lo + np.flatnonzero(np.diff(period)) + 1   # bars opening a new period
+        before = starts[period[starts - lo] < period[-1]]
+        if len(before) >= periods:
+            return int(before[-periods])
+        if lo == 0:
+            return 0
+        step *= 2
+
+
+def slice_bars(bars: Dict[str, np.ndarray], start: float, end: float,
+               warmup: int = 0) -> Dict[str, np.ndarray]:
+    """Views of the bars with start <= datetime < end, plus `warmup` earlier bars.
+
+    The cached datetime column is sorted, so this is two binary searches; on
+    memory-mapped columns only the window's pages are ever read.
+    """
+    dt = bars["datetime"]
+    lo, hi = np.searchsorted(dt, [start, end])
+    return row_slice(bars, max(lo - warmup, 0), hi)
+
+
+def row_slice(bars, lo: int, hi: int):
+    """Bars lo:hi of column arrays or of a CompactBars (which stays compact)."""
+    if isinstance(bars, CompactBars):
+        return bars.slice(lo, hi)
+    return {col: arr[lo:hi] for col, arr in bars.items()}
+
+
+# --- Per-process memo ---
+
+# (pair, tf) or (pair, tf, trend_tf) -> column arrays, shared by the pool workers of a process
+_LOADED: Dict[tuple, dict] = {}
+
+
+def loaded_bars(pair: str, tf: str) -> dict:
+    """run_backtest.load_bars(pair, tf), loaded once per process."""
+    key = (pair, tf)
+    if key not in _LOADED:
+        from run_backtest import load_bars
+        _LOADED[key] = load_bars(pair, tf)
+    return _LOADED[key]
+
+
+def loaded_trend_bars(pair: str, tf: str, trend_tf: str) -> dict:
+    """run_backtest.load_trend_bars(pair, tf, trend_tf), loaded once per process."""
+    key = (pair, tf, trend_tf)
+    if key not in _LOADED:
+        from run_backtest import load_trend_bars
+        _LOADED[key] = load_trend_bars(pair, tf, trend_tf)
+    return _LOADED[key]
+
+
+class ArrayData(bt.feed.DataBase):
+    """Feed that streams bars from in-memory or memory-mapped column arrays.
+
+    ``arrays`` maps each name in COLUMNS to a 1-D float64 array (or is a
+    CompactBars); the ``datetime`` column must hold Backtrader date numbers.
+    """
+    params = (
+        ("arrays", None),
+    )
+
+    def start(self):
+        super().start()
+        self.stream(self.p.arrays)
+
+    def stream(self, arrays: Dict[str, np.ndarray]) -> None:
+        """Deliver the bars of `arrays` next (also used to extend a resumed run)."""
+        if isinstance(arrays, CompactBars):
+            self._rows = arrays.iter_rows()
+            return
+        # memoryviews hand back plain Python floats, much cheaper per element
+        # than indexing numpy scalars out of the arrays
+        self._rows = zip(*(memoryview(np.ascontiguousarray(arrays[c])) for c in COLUMNS))
+
+    def __getstate__(self):
+        # the row iterator cannot be pickled (tools.checkpoint streams new arrays)
+        state = self.__dict__.copy()
+        state.pop("_rows", None)
+        return state
+
+    def _load(self):
+        row = next(self._rows, None)
+        if row is None:
+            return False
+
+        lines = self.lines
+        (lines.datetime[0], lines.open[0], lines.high[0],
+         lines.low[0], lines.close[0], lines.volume[0]) = row
+        lines.openinterest[0] = 0.0
+        return True
+
+
+def cached_feed(csv_path: str, timeframe, compression: int,
+                cache_dir: Optional[str] = None, compact: bool = False) -> ArrayData:
+    """Drop-in replacement for the GenericCSVData feed built by make_feed."""
+    daily = timeframe >= bt.TimeFrame.Days
+    if compact:
+        arrays = load_compact(csv_path, daily, cache_dir or COMPACT_DIR)
+    else:
+        arrays = load_arrays(csv_path, daily, cache_dir or CACHE_DIR)
+    return ArrayData(arrays=arrays, timeframe=timeframe, compression=compression)
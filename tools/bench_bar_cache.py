@@ -0,0 +1,90 @@
+"""Benchmark: CSV parsing (GenericCSVData) vs the binary bar cache in make_feed,
+float64 and compact (COMPACT_BARS).
+
+Every measurement runs in a fresh subprocess so peak RSS is per path and the
+OS page cache is the only thing shared. "columns" is what a worker keeps
+mapped per dataset (the cache's column bytes); the digest of the preloaded
+lines shows every path delivers the same bars. Usage:
+
+    python -m tools.bench_bar_cache EURUSD 15m
+"""
+import hashlib
+import json
+import subprocess
+import sys
+import time
+
+
+REPEATS = 3
+PATHS = ("csv", "cache", "compact")
+
+
+def _measure(pair: str, tf: str, path: str) -> dict:
+    """Child process: build the feed and preload every bar, report time/RSS."""
+    import resource
+    import backtrader as bt
+    import run_backtest as rb
+
+    rb.COMPACT_BARS = path == "compact"
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    t0 = time.perf_counter()
+    data = rb.make_feed(pair, tf, use_cache=path != "csv")
+    bt.Cerebro().adddata(data)  # feeds need an environment to start
+    data._start()
+    data.preload()  # what cerebro.run() does before the first next()
+    elapsed = time.perf_counter() - t0
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    digest = hashlib.sha1()
+    for name in ("datetime", "open", "high", "low", "close", "volume"):
+        digest.update(getattr(data.lines, name).array.tobytes())
+    arrays = data.p.dataname if path == "csv" else data.p.arrays
+    return {
+        "path": path,
+        "bars": data.buflen(),
+        "seconds": elapsed,
+        "peak_rss_mb": rss_after / 1024,
+        "load_rss_mb": (rss_after - rss_before) / 1024,
+        "column_mb": None if path == "csv" else
+        (arrays.nbytes if path == "compact" else sum(a.nbytes for a in arrays.values())) / 2 ** 20,
+        "digest": digest.hexdigest()[:12],
+    }
+
+
+def _spawn(pair: str, tf: str, path: str) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-m", "tools.bench_bar_cache", "--child", pair, tf, path],
+        check=True, capture_output=True, text=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def run_benchmark(pair: str, tf: str, repeats: int = REPEATS) -> list:
+    for path in PATHS[1:]:
+        _spawn(pair, tf, path)  # warm-up: make sure the cache entries exist
+    rows = []
+    for path in PATHS:
+        runs = [_spawn(pair, tf, path) for _ in range(repeats)]
+        best = min(runs, key=lambda r: r["seconds"])
+        best["peak_rss_mb"] = max(r["peak_rss_mb"] for r in runs)
+        best["load_rss_mb"] = max(r["load_rss_mb"] for r in runs)
+        rows.append(best)
+    return rows
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--child"]:
+        _, _, pair, tf, path = sys.argv
+        print(json.dumps(_measure(pair, tf, path)))
+        sys.exit(0)
+
+    pair = sys.argv[1] if len(sys.argv) > 1 else "EURUSD"
+    tf = sys.argv[2] if len(sys.argv) > 2 else "15m"
+    rows = run_benchmark(pair, tf)
+    csv_row = rows[0]
+    for r in rows:
+        columns = f", columns {r['column_mb']:.2f} MB" if r["column_mb"] is not None else ""
+        print(f"{r['path']:>7}: {r['bars']} bars in {r['seconds']:.3f}s "
+              f"({r['bars'] / r['seconds'] / 1e3:.0f}k bars/s, {csv_row['seconds'] / r['seconds']:.1f}x), "
+              f"peak RSS {r['peak_rss_mb']:.1f} MB (+{r['load_rss_mb']:.1f} MB for the load)"
+              f"{columns}, bars {r['digest']}")
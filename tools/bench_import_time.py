@@ -0,0 +1,97 @@
+"""Benchmark: cold-start cost of run_backtest.
+
+Each measurement runs in a fresh interpreter, so nothing is shared between
+runs except the OS page cache. Compares
+
+  * eager  -- the old import set: pandas, quantstats, backtrader and all seven
+              strategy modules imported at the top of run_backtest
+  * lazy   -- ``import run_backtest`` (registry + on-demand imports)
+  * cli    -- a complete short job: ``run_backtest.py --metrics-only --no-store``
+              (the result store would turn repeats into lookups)
+
+Usage:
+
+    python -m tools.bench_import_time
+    python -m tools.bench_import_time --top 15       # slowest modules of each import
+"""
+import argparse
+import re
+import subprocess
+import sys
+import time
+
+
+REPEATS = 5
+
+EAGER = "; ".join([
+    "import pandas",
+    "import quantstats",
+    "import backtrader",
+    "import strategies.sma_rsi_strategy",
+    "import strategies.rsi_trend_strategy",
+    "import strategies.rsi_macd_strategy",
+    "import strategies.rsi_macd_trend_strategy",
+    "import strategies.rsi_trend_with_TP_SL",
+    "import strategies.hft_mean_reversion_strategy",
+    "import strategies.sma_price_action_strategy",
+    "import run_backtest",
+])
+LAZY = "import run_backtest"
+CLI_ARGS = ["run_backtest.py", "--strategy", "RsiMacdStrategy", "--pair", "EURJPY",
+            "--tf", "4h", "--metrics-only", "--no-store"]
+
+
+def _time(cmd: list, repeats: int) -> float:
+    """Best wall time of `cmd` over `repeats` fresh processes."""
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        subprocess.run(cmd, check=True, capture_output=True)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def top_imports(code: str, n: int) -> list:
+    """Slowest top-level imports of `code` per ``-X importtime`` (cumulative us)."""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                         check=True, capture_output=True, text=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        m = re.match(r"import time:\s+\d+ \|\s+(\d+) \| (\s*)(\S+)", line)
+        if m and not m.group(2):  # top-level only
+            rows.append((int(m.group(1)), m.group(3)))
+    return sorted(rows, reverse=True)[:n]
+
+
+def run_benchmark(repeats: int = REPEATS) -> list:
+    _time([sys.executable, *CLI_ARGS], 1)  # warm-up: bar cache and .pyc files
+    return [
+        ("interpreter", _time([sys.executable, "-c", "pass"], repeats)),
+        ("eager imports", _time([sys.executable, "-c", EAGER], repeats)),
+        ("lazy imports", _time([sys.executable, "-c", LAZY], repeats)),
+        ("cli --metrics-only --no-store", _time([sys.executable, *CLI_ARGS], repeats)),
+    ]
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="run_backtest cold-start benchmark")
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--top", type=int, default=0, help="also list the N slowest imports")
+    args = parser.parse_args(argv)
+
+    rows = run_benchmark(args.repeats)
+    print(f"{'case':<30} {'seconds':>8}")
+    for name, seconds in rows:
+        print(f"{name:<30} {seconds:>8.3f}")
+    timings = dict(rows)
+    print(f"\nimport speedup: {timings['eager imports'] / timings['lazy imports']:.2f}x")
+
+    if args.top:
+        for name, code in (("eager", EAGER), ("lazy", LAZY)):
+            print(f"\nslowest imports ({name}):")
+            for us, module in top_imports(code, args.top):
+                print(f"  {us / 1000:8.1f} ms  {module}")
+
+
+if __name__ == "__main__":
+    main()
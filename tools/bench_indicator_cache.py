@@ -0,0 +1,101 @@
+"""Benchmark: indicator warm-up with and without tools.indicator_cache.
+
+Times a strategy that only builds the usual indicators (RSI(14), SMA(200),
+MACD(12, 26, 9), ATR(14), ADX(14)) and does nothing per bar; its run time minus
+an empty strategy's is the indicator cost (with the cache, what remains is
+Backtrader advancing the indicator lines each bar). Cases: plain Backtrader,
+cold cache (compute + store), warm from disk (memory cleared) and warm from
+memory. Also checks that the cached lines are identical. Usage:
+
+    python -m tools.bench_indicator_cache EURUSD 1h
+"""
+import sys
+import tempfile
+import time
+
+import backtrader as bt
+import numpy as np
+
+from tools import indicator_cache
+
+
+REPEATS = 3
+
+
+class NoIndicators(bt.Strategy):
+    values = []
+
+
+class IndicatorLoad(bt.Strategy):
+    def __init__(self):
+        self.inds = [
+            bt.indicators.RSI(self.data.close, period=14),
+            bt.ind.SMA(period=200),
+            bt.indicators.MACD(self.data.close, period_me1=12, period_me2=26, period_signal=9),
+            bt.ind.ATR(period=14),
+            bt.ind.ADX(period=14),
+        ]
+
+    def stop(self):
+        self.values = [np.array(line.array[:line.buflen()]) for ind in self.inds for line in ind.lines]
+
+
+def _run(bars: dict, tf: str, cached: bool, strategy_cls=IndicatorLoad):
+    from run_backtest import bars_feed, run_strategy
+
+    t0 = time.perf_counter()
+    _, strat = run_strategy(strategy_cls, [bars_feed(bars, tf)], cache_indicators=cached)
+    return time.perf_counter() - t0, strat.values
+
+
+def run_benchmark(pair: str, tf: str, repeats: int = REPEATS) -> list:
+    from run_backtest import load_bars
+
+    bars = load_bars(pair, tf)
+    saved_dir = indicator_cache.INDICATOR_DIR
+    with tempfile.TemporaryDirectory() as scratch:
+        # a throwaway cache directory: the cold case needs it empty, and the real one stays intact
+        indicator_cache.INDICATOR_DIR = scratch
+        indicator_cache.clear_memory()
+        try:
+            return _cases(bars, tf, repeats)
+        finally:
+            indicator_cache.INDICATOR_DIR = saved_dir
+            indicator_cache.clear_memory()
+
+
+def _cases(bars: dict, tf: str, repeats: int) -> list:
+    empty = min(_run(bars, tf, False, NoIndicators)[0] for _ in range(repeats))
+    plain = min(_run(bars, tf, False)[0] for _ in range(repeats))
+    _, expected = _run(bars, tf, False)
+    cold, cold_values = _run(bars, tf, True)
+
+    disk = []
+    for _ in range(repeats):
+        indicator_cache.clear_memory()
+        seconds, disk_values = _run(bars, tf, True)
+        disk.append(seconds)
+    memory, memory_values = min((_run(bars, tf, True) for _ in range(repeats)), key=lambda r: r[0])
+
+    identical = all(
+        all(np.array_equal(a, b, equal_nan=True) for a, b in zip(expected, values))
+        for values in (cold_values, disk_values, memory_values)
+    )
+    return [
+        {"case": "no indicators", "seconds": empty, "identical": True},
+        {"case": "plain", "seconds": plain, "identical": True},
+        {"case": "cold cache", "seconds": cold, "identical": identical},
+        {"case": "warm (disk)", "seconds": min(disk), "identical": identical},
+        {"case": "warm (memory)", "seconds": memory, "identical": identical},
+    ]
+
+
+if __name__ == "__main__":
+    pair, tf = (sys.argv[1:3] + ["EURUSD", "1h"][len(sys.argv[1:3]):])[:2]
+    rows = run_benchmark(pair, tf)
+    empty, plain = rows[0]["seconds"], rows[1]["seconds"]
+    print(f"{pair} {tf}: run time, indicator cost = run time - '{rows[0]['case']}'")
+    for row in rows:
+        cost = row["seconds"] - empty
+        print(f"  {row['case']:<14} {row['seconds']:7.3f}s  indicators {cost:7.3f}s "
+              f"({cost / (plain - empty):6.1%} of plain)  identical={row['identical']}")
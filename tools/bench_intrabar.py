@@ -0,0 +1,73 @@
+"""Benchmark: bar-level fills vs tools.intrabar fill resolution.
+
+Runs a bracket-order strategy on the main timeframe three ways: Backtrader's
+bar-level matching, IntrabarBroker fed the main bars themselves (must be
+identical to bar-level -- a self-check, intraday only), and IntrabarBroker on
+each finer timeframe available. Reports run time, final value, closed trades and how
+many bars had both bracket legs reached. Usage:
+
+    python -m tools.bench_intrabar EURUSD 1h
+"""
+import os
+import sys
+import time
+
+from tools.strategy_registry import get_strategy
+
+
+STRATEGY = "SMAPriceActionStrategy"
+FILL_TFS = ["1m", "15m", "1h"]            # finest first; skipped when data/{PAIR}_{tf}.csv is missing
+REPEATS = 3
+
+
+def _run(strategy_cls, bars: dict, tf: str, fill_bars=None) -> dict:
+    import backtrader as bt
+    from run_backtest import bars_feed, run_strategy
+
+    t0 = time.perf_counter()
+    cerebro, strat = run_strategy(strategy_cls, [bars_feed(bars, tf)], fill_bars=fill_bars,
+                                  analyzers={"trades": bt.analyzers.TradeAnalyzer})
+    seconds = time.perf_counter() - t0
+    trades = strat.analyzers.trades.get_analysis()
+    return {
+        "seconds": seconds,
+        "final_value": cerebro.broker.getvalue(),
+        "trades": trades.get("total", {}).get("closed", 0),
+        "both_legs": sum(cerebro.broker.resolved.values()) if fill_bars is not None else None,
+    }
+
+
+def run_benchmark(pair: str, tf: str, strategy: str = STRATEGY, repeats: int = REPEATS) -> list:
+    from run_backtest import check_fill_tf, feed_path, load_bars
+
+    strategy_cls = get_strategy(strategy)
+    bars = load_bars(pair, tf)
+    cases = [("bar-level", None)]
+    if tf != "1d":  # fine bars are intraday bars stamped at their open
+        cases.append((f"intrabar {tf} (self-check)", bars))
+    for fill_tf in FILL_TFS:
+        try:
+            check_fill_tf(tf, fill_tf)
+        except ValueError:
+            continue
+        if os.path.exists(feed_path(pair, fill_tf)):
+            cases.append((f"intrabar {fill_tf}", load_bars(pair, fill_tf)))
+
+    rows = []
+    for name, fill_bars in cases:
+        runs = [_run(strategy_cls, bars, tf, fill_bars) for _ in range(repeats)]
+        rows.append({"case": name, **min(runs, key=lambda r: r["seconds"])})
+    return rows
+
+
+if __name__ == "__main__":
+    pair, tf = (sys.argv[1:3] + ["EURUSD", "1h"][len(sys.argv[1:3]):])[:2]
+    rows = run_benchmark(pair, tf)
+    base = rows[0]
+    print(f"{STRATEGY} {pair} {tf}")
+    for row in rows:
+        print(f"  {row['case']:<26} {row['seconds']:6.3f}s ({row['seconds'] / base['seconds']:4.2f}x)  "
+              f"final {row['final_value']:10.2f}  trades {row['trades']:>4}  "
+              f"bars with both legs reached {'-' if row['both_legs'] is None else row['both_legs']:>3}")
+    if "self-check" in rows[1]["case"]:
+        print(f"self-check identical to bar-level: {rows[1]['final_value'] == base['final_value']}")
@@ -0,0 +1,365 @@
+"""Benchmark suite: every strategy on every bundled pair/timeframe plus synthetic 1m data.
+
+Each case (strategy, series, timeframe) runs in a fresh subprocess, so peak
+RSS is per case and nothing is shared but the OS page cache. Recorded per case:
+
+  * load_seconds  -- mapping the cached bar arrays and preloading them into Backtrader
+  * run_seconds   -- the Cerebro run without the preload
+  * bars_per_second, peak_rss_mb, and final_value / exposure as a result fingerprint
+
+The fastest of REPEATS runs (SYNTHETIC_REPEATS for the synthetic series) is
+kept. Results are saved as JSON together with the Python / Backtrader / pandas /
+NumPy versions and compared against a stored baseline: a case whose run or load
+time, or peak memory, grew by more than the threshold is flagged as a
+regression, and a changed final value is reported too (a speed-up that changes
+results is a bug, not a win).
+
+The synthetic series is a seeded random walk of weekday 1m bars, written once
+to data/.cache/synthetic/ and served through the bar cache like the real CSVs.
+Runs offline; the default suite (synthetic data included) takes several minutes.
+
+Usage:
+    python -m tools.bench_suite --save-baseline          # record the baseline
+    python -m tools.bench_suite                          # run and compare
+    python -m tools.bench_suite --strategies RsiMacdStrategy --tfs 1h --synthetic-years 0
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import List, Optional
+
+import numpy as np
+
+from tools.strategy_registry import discover
+
+
+# =========================
+# Configuration (edit here)
+# =========================
+PAIRS = ["EURUSD", "EURGBP", "EURJPY", "USDCAD"]
+TFS = ["15m", "1h", "4h", "1d"]
+TREND_TF = {"1m": "1h", "15m": "4h", "1h": "4h", "4h": "1d", "1d": None}  # derived in memory, for
+                                    # strategies that read datas[1]; 1d has none, so strategies that
+                                    # need one are skipped there
+SYNTHETIC_YEARS = 2                 # years of synthetic 1m bars, 0 to skip
+SYNTHETIC_SEED = 7
+REPEATS = 3                         # best-of-N per case
+SYNTHETIC_REPEATS = 1               # long synthetic runs are steady enough with one
+THRESHOLD = 0.10                    # relative slow-down / memory growth flagged as regression
+MIN_SECONDS = 0.05                  # time regressions below this (baseline) are noise
+OUTPUT_DIR = os.path.join("reports", "benchmarks")
+BASELINE = os.path.join(OUTPUT_DIR, "baseline.json")
+SYNTHETIC_DIR = os.path.join("data", ".cache", "synthetic")
+# =========================
+
+
+# --- Synthetic data ---
+
+def synthetic_csv(years: int, seed: int = SYNTHETIC_SEED) -> str:
+    """Path of a seeded weekday 1m random-walk CSV, generated on first use."""
+    path = os.path.join(SYNTHETIC_DIR, f"SYN{years}Y_1m.csv")
+    if os.path.exists(path):
+        return path
+
+    import pandas as pd
+
+    index = pd.date_range("2020-01-01", periods=years * 365 * 1440, freq="1min")
+    index = index[index.dayofweek < 5]
+    rng = np.random.default_rng(seed)
+    close = 1.1 * np.exp(np.cumsum(rng.normal(0.0, 1e-4, len(index))))
+    open_ = np.concatenate(([1.1], close[:-1]))
+    wick = np.abs(rng.normal(0.0, 5e-5, (2, len(index))))
+    df = pd.DataFrame({
+        "open": open_,
+        "high": np.maximum(open_, close) * (1 + wick[0]),
+        "low": np.minimum(open_, close) * (1 - wick[1]),
+        "close": close,
+        "volume": rng.integers(1, 100, len(index)),
+    }, index=pd.Index(index, name="datetime"))
+
+    os.makedirs(SYNTHETIC_DIR, exist_ok=True)
+    tmp = f"{path}.tmp{os.getpid()}"
+    df.round(6).to_csv(tmp)
+    os.replace(tmp, path)
+    return path
+
+
+# --- Cases ---
+
+def make_cases(strategies: List[str], pairs: List[str], tfs: List[str],
+               synthetic_years: int = SYNTHETIC_YEARS, verbose: bool = True) -> List[dict]:
+    """One case per strategy x (pair, tf), plus the synthetic 1m series.
+
+    Only strategies that read a second feed get the TREND_TF one; those that
+    cannot run without it are skipped on timeframes that have none, and every
+    strategy is skipped on series shorter than its indicators' warm-up.
+    """
+    from run_backtest import feed_path, strategy_minperiods, trend_feed_use
+    from tools.strategy_registry import get_strategy
+
+    series = [(pair, tf, feed_path(pair, tf)) for pair in pairs for tf in tfs]
+    if synthetic_years:
+        series.append((f"SYN{synthetic_years}Y", "1m", synthetic_csv(synthetic_years)))
+    cases = []
+    for strategy in strategies:
+        strategy_cls = get_strategy(strategy)
+        use = trend_feed_use(strategy_cls)
+        need = {n: strategy_minperiods(strategy_cls, None, n) for n in ((1, 2) if use else (1,))}
+        for name, tf, csv in series:
+            trend_tf = TREND_TF[tf] if use else None
+            if use == "required" and not trend_tf:
+                if verbose:
+                    print(f"skipped {strategy}/{name}/{tf}: needs a trend feed, none configured for {tf}")
+                continue
+            lengths = series_lengths(csv, tf, trend_tf)
+            short = [(n, have) for n, have in zip(need[len(lengths)], lengths) if have < n]
+            if short:
+                if verbose:
+                    n, have = short[0]
+                    print(f"skipped {strategy}/{name}/{tf}: needs {n} bars to warm up, "
+                          f"the series has {have}")
+                continue
+            cases.append({"strategy": strategy, "series": name, "tf": tf, "csv": csv,
+                          "trend_tf": trend_tf, "synthetic": name.startswith("SYN")})
+    return cases
+
+
+def series_lengths(csv: str, tf: str, trend_tf: Optional[str]) -> List[int]:
+    """Bars in the main feed and, with `trend_tf`, in the trend feed derived from it."""
+    from run_backtest import tf_seconds
+    from tools.bar_cache import load_arrays
+
+    dt = load_arrays(csv, daily=_daily(tf))["datetime"]
+    if not trend_tf:
+        return [len(dt)]
+    period = np.rint(np.asarray(dt) * 86400).astype(np.int64) // tf_seconds(trend_tf)
+    return [len(dt), int(np.count_nonzero(np.diff(period))) + 1 if len(dt) else 0]
+
+
+def case_key(case: dict) -> str:
+    return f"{case['strategy']}/{case['series']}/{case['tf']}"
+
+
+def _daily(tf: str) -> bool:
+    import backtrader as bt
+    from run_backtest import TF_MAP
+    return TF_MAP[tf][0] >= bt.TimeFrame.Days
+
+
+def _peak_rss_mb() -> float:
+    """Peak RSS of this process. VmHWM where available: ru_maxrss also counts
+    the parent's memory at fork time, before the exec."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _measure(case: dict) -> dict:
+    """Child process: load the bars, run the strategy once, report time/RSS."""
+    from run_backtest import bars_feed, run_strategy, tf_seconds
+    from tools.bar_cache import load_arrays, resample_bars
+    from tools.profiler import Profiler
+    from tools.strategy_registry import get_strategy
+
+    strategy_cls = get_strategy(case["strategy"])
+    tf, trend_tf = case["tf"], case["trend_tf"]
+    t0 = time.perf_counter()
+    bars = load_arrays(case["csv"], daily=_daily(tf))
+    feeds = [bars_feed(bars, tf)]
+    if trend_tf:
+        feeds.append(bars_feed(resample_bars(bars, tf_seconds(trend_tf)), trend_tf))
+    mapped = time.perf_counter() - t0
+
+    # only the feeds are instrumented: no per-bar wrapper overhead in the run
+    profiler = Profiler()
+    profiler.instrument_feeds(feeds)
+    with profiler.phase("run"):
+        cerebro, strat = run_strategy(strategy_cls, feeds)
+    preload = sum(seconds for _, seconds in profiler.timers["feeds"].values())
+    run = profiler.phases["run"] - preload
+
+    n = len(bars["datetime"])
+    return {
+        "bars": n,
+        "load_seconds": mapped + preload,
+        "run_seconds": run,
+        "bars_per_second": n / run if run > 0 else None,
+        "peak_rss_mb": _peak_rss_mb(),
+        "final_value": cerebro.broker.getvalue(),
+        "exposure": strat.analyzers.metrics.exposure,
+    }
+
+
+def _spawn(case: dict) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-m", "tools.bench_suite", "--child", json.dumps(case)],
+        capture_output=True, text=True,
+    )
+    if out.returncode:
+        lines = out.stderr.strip().splitlines() or ["no output"]
+        return {"error": lines[-1]}
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def run_case(case: dict, repeats: int = REPEATS) -> dict:
+    """Best-of-`repeats` timings; peak RSS is the highest seen."""
+    runs = [_spawn(case) for _ in range(repeats)]
+    errors = [r for r in runs if "error" in r]
+    if errors:
+        return errors[0]
+    best = dict(min(runs, key=lambda r: r["run_seconds"]))
+    best["load_seconds"] = min(r["load_seconds"] for r in runs)
+    best["peak_rss_mb"] = max(r["peak_rss_mb"] for r in runs)
+    return best
+
+
+def environment() -> dict:
+    import backtrader as bt
+    import pandas as pd
+
+    return {
+        "python": platform.python_version(),
+        "backtrader": bt.__version__,
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def run_suite(cases: List[dict], repeats: int = REPEATS, verbose: bool = True) -> dict:
+    # warm-up: build every bar cache entry so no case pays for CSV parsing
+    from tools.bar_cache import load_arrays
+    for csv, tf in {(c["csv"], c["tf"]) for c in cases}:
+        load_arrays(csv, daily=_daily(tf))
+
+    results = {}
+    for i, case in enumerate(cases, 1):
+        key = case_key(case)
+        results[key] = {**{k: case[k] for k in ("strategy", "series", "tf", "trend_tf")},
+                        **run_case(case, SYNTHETIC_REPEATS if case["synthetic"] else repeats)}
+        if verbose:
+            r = results[key]
+            status = r["error"] if "error" in r else (
+                f"{r['bars']:>8} bars  load {r['load_seconds']:6.3f}s  run {r['run_seconds']:7.3f}s  "
+                f"{r['bars_per_second']:>9,.0f} bars/s  {r['peak_rss_mb']:6.1f} MB")
+            print(f"[{i}/{len(cases)}] {key:<46} {status}", flush=True)
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "environment": environment(),
+        "repeats": repeats,
+        "cases": results,
+    }
+
+
+# --- Baseline comparison ---
+
+def compare(current: dict, baseline: dict, threshold: float = THRESHOLD,
+            min_seconds: float = MIN_SECONDS) -> List[dict]:
+    """Findings per case present in both runs: regressions and changed results."""
+    findings = []
+    for key, cur in current["cases"].items():
+        base = baseline["cases"].get(key)
+        if base is None or "error" in base:
+            continue
+        if "error" in cur:
+            findings.append({"case": key, "metric": "error", "detail": cur["error"]})
+            continue
+        for metric, floor in (("run_seconds", min_seconds), ("load_seconds", min_seconds),
+                              ("peak_rss_mb", 0.0)):
+            if base[metric] >= floor and cur[metric] > base[metric] * (1 + threshold):
+                findings.append({
+                    "case": key, "metric": metric, "baseline": base[metric],
+                    "current": cur[metric], "change": cur[metric] / base[metric] - 1,
+                })
+        if not np.isclose(cur["final_value"], base["final_value"], rtol=0, atol=1e-6):
+            findings.append({"case": key, "metric": "final_value", "baseline": base["final_value"],
+                             "current": cur["final_value"], "change": None})
+    return findings
+
+
+def print_comparison(current: dict, baseline: dict, findings: List[dict],
+                     threshold: float = THRESHOLD) -> None:
+    changed = {k: (baseline["environment"].get(k), v) for k, v in current["environment"].items()
+               if baseline["environment"].get(k) != v}
+    for name, (old, new) in changed.items():
+        print(f"environment: {name} {old} -> {new}")
+
+    common = [k for k in current["cases"]
+              if "error" not in current["cases"][k] and "error" not in baseline["cases"].get(k, {"error": 1})]
+    if common:
+        ratio = np.exp(np.mean([np.log(current["cases"][k]["run_seconds"] / baseline["cases"][k]["run_seconds"])
+                                for k in common]))
+        print(f"{len(common)} cases compared, run time vs baseline: {ratio:.2f}x (geometric mean)")
+
+    if not findings:
+        print(f"No regressions beyond {threshold:.0%}.")
+        return
+    print(f"\n--- {len(findings)} regression(s) ---")
+    for f in findings:
+        if f["metric"] == "error":
+            print(f"{f['case']:<46} now fails: {f['detail']}")
+        elif f["change"] is None:
+            print(f"{f['case']:<46} {f['metric']} {f['baseline']:.2f} -> {f['current']:.2f}")
+        else:
+            print(f"{f['case']:<46} {f['metric']:<13} {f['baseline']:9.3f} -> "
+                  f"{f['current']:9.3f} ({f['change']:+.0%})")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark suite with baseline regression check")
+    parser.add_argument("--strategies", nargs="+", default=None, help="default: all in strategies/")
+    parser.add_argument("--pairs", nargs="+", default=PAIRS)
+    parser.add_argument("--tfs", nargs="+", default=TFS)
+    parser.add_argument("--synthetic-years", type=int, default=SYNTHETIC_YEARS)
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--output", default=None, help="results JSON (default: reports/benchmarks/)")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    args = parser.parse_args(argv)
+
+    strategies = args.strategies or sorted(discover())
+    cases = make_cases(strategies, args.pairs, args.tfs, args.synthetic_years)
+    current = run_suite(cases, args.repeats)
+
+    output = args.output or os.path.join(
+        OUTPUT_DIR, f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(current, f, indent=2)
+    print(f"\nResults saved to '{output}'")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(current, f, indent=2)
+        print(f"Baseline saved to '{args.baseline}'")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at '{args.baseline}'; record one with --save-baseline")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    findings = compare(current, baseline, args.threshold)
+    print_comparison(current, baseline, findings, args.threshold)
+    return 1 if findings else 0
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--child"]:
+        print(json.dumps(_measure(json.loads(sys.argv[2]))))
+        sys.exit(0)
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""Parity check: checkpoint + resume vs a full replay on the bundled data.
+
+For every strategy below and every pair, a run over the first part of the bars
+is checkpointed and resumed (through the pickle file) over the rest, in one
+step and in two; each must end exactly like a single run over all the bars:
+same closed trades, same EquityTracker records, same summary metrics and final
+position. Cut points fall where positions and bracket orders are open, which
+the report shows. Exits non-zero on any mismatch. Usage:
+
+    python -m tools.check_checkpoint_parity               # everything
+    python -m tools.check_checkpoint_parity EURUSD 1h     # one pair / timeframe
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from run_backtest import load_bars, summary_metrics
+from tools import checkpoint
+from tools.result_store import TradeList
+from tools.strategy_registry import get_strategy
+
+
+PAIRS = ["EURUSD", "EURGBP", "EURJPY", "USDCAD"]
+TIMEFRAMES = ["1h"]
+STRATEGIES = [                      # (class name, trend timeframe)
+    ("RsiTrendStrategy", None),
+    ("SMAPriceActionStrategy", None),
+    ("RsiTrendWithTPSLStrategy", None),
+    ("RsiMacdTrendStrategy", "4h"),
+]
+CUTS = (0.6, 0.85)                  # snapshot inside a trade near these fractions of the bars
+
+
+def _run_state(cerebro, strat) -> dict:
+    return {
+        "trades": strat.analyzers.trade_list.get_analysis(),
+        "equity": strat.analyzers.equity.arrays(),
+        "metrics": summary_metrics(cerebro, strat),
+        "position": (strat.position.size, strat.position.price),
+    }
+
+
+def _compare(full: dict, resumed: dict) -> list:
+    problems = []
+    if full["trades"] != resumed["trades"]:
+        problems.append(f"closed trades {len(resumed['trades'])} (resumed) vs "
+                        f"{len(full['trades'])} (full) or their details differ")
+    for col, arr in full["equity"].items():
+        if not np.array_equal(arr, resumed["equity"][col]):
+            problems.append(f"equity '{col}' differs")
+    if full["metrics"] != resumed["metrics"]:
+        problems.append(f"metrics differ: {resumed['metrics']} != {full['metrics']}")
+    if full["position"] != resumed["position"]:
+        problems.append(f"final position {resumed['position']} != {full['position']}")
+    return problems
+
+
+def _cut_points(bars: dict, trades: list) -> list:
+    """Bar counts to snapshot after: inside the first trade of 4+ bars opened after
+    each CUTS fraction of the bars (or at the fraction when there is none)."""
+    dt = bars["datetime"]
+    cuts = []
+    for f in CUTS:
+        at = dt[int(f * len(dt))]
+        inside = [t for t in trades if t[0] >= at and t[6] >= 4]
+        cuts.append(int(np.searchsorted(dt, inside[0][0])) + 2 if inside else int(f * len(dt)))
+    return cuts
+
+
+def check(name: str, trend_tf, pair: str, tf: str, folder: str) -> list:
+    """Returns a list of mismatch descriptions (empty when in parity)."""
+    strategy_cls = get_strategy(name)
+    bars = load_bars(pair, tf)
+    n = len(bars["datetime"])
+    analyzers = {"trade_list": TradeList}
+
+    t0 = time.perf_counter()
+    full = _run_state(*checkpoint.run_checkpointed(strategy_cls, bars, tf, trend_tf,
+                                                   analyzers=analyzers))
+    full_seconds = time.perf_counter() - t0
+
+    problems, notes, resume_seconds = [], [], 0.0
+    path = os.path.join(folder, f"{name}_{pair}_{tf}.pkl")
+    stops = _cut_points(bars, full["trades"])
+    for steps in ([stops[0], n], [stops[0], stops[1], n]):
+        first = {col: arr[:steps[0]] for col, arr in bars.items()}
+        cerebro, strat = checkpoint.run_checkpointed(strategy_cls, first, tf, trend_tf,
+                                                     path=path, analyzers=analyzers)
+        if len(steps) == 2:
+            # what the snapshot holds: an open position and / or live orders
+            snap = checkpoint.load(path, strategy_cls)
+            s = snap.runningstrats[0]
+            notes.append(f"pos {s.position.size:+.0f}, {sum(o.alive() for o in snap.broker.orders)} orders")
+        for stop in steps[1:]:
+            t0 = time.perf_counter()
+            cerebro = checkpoint.load(path, strategy_cls)
+            cerebro, strat = checkpoint.resume(cerebro, {c: a[:stop] for c, a in bars.items()}, path)
+            resume_seconds = time.perf_counter() - t0
+        problems += [f"{len(steps) - 1} resume(s): {p}" for p in _compare(full, _run_state(cerebro, strat))]
+
+    print(f"{name:<26} {pair} {tf:>3}: {len(full['trades']):4d} trades, full {full_seconds:5.2f}s, "
+          f"last resume {resume_seconds:5.2f}s, at snapshot: {notes[0]:<18} "
+          f"{'OK' if not problems else 'MISMATCH'}")
+    return problems
+
+
+if __name__ == "__main__":
+    pairs = sys.argv[1:2] or PAIRS
+    timeframes = sys.argv[2:3] or TIMEFRAMES
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as folder:
+        for name, trend_tf in STRATEGIES:
+            for pair in pairs:
+                for tf in timeframes:
+                    for problem in check(name, trend_tf, pair, tf, folder):
+                        print(f"    {problem}")
+                        failures += 1
+    sys.exit(1 if failures else 0)
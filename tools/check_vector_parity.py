@@ -0,0 +1,90 @@
+"""Parity check: vectorized engine vs the Backtrader path on the bundled data.
+
+For every strategy in tools.vector_engine.RULES and every data/{PAIR}_{tf}.csv
+both engines run with the same params, cash and stake; the closed trades
+(count and entry/exit times), the equity curve recorded by EquityTracker and
+the final value must match within tolerance. Exits non-zero on any mismatch. Usage:
+
+    python -m tools.check_vector_parity               # everything
+    python -m tools.check_vector_parity EURUSD 1h     # one pair / timeframe
+"""
+import sys
+import time
+
+import backtrader as bt
+
+from run_backtest import TF_MAP, bars_feed, equity_series, load_bars, run_strategy
+from tools.result_store import TradeList
+from tools.vector_engine import RULES, run_vectorized
+from strategies.sma_rsi_strategy import SmaRsiStrategy
+from strategies.rsi_trend_strategy import RsiTrendStrategy
+from strategies.rsi_trend_with_TP_SL import RsiTrendWithTPSLStrategy
+from strategies.rsi_macd_strategy import RsiMacdStrategy
+
+
+PAIRS = ["EURUSD", "EURGBP", "EURJPY", "USDCAD"]
+TIMEFRAMES = ["15m", "1h", "4h", "1d"]
+STRATEGIES = [SmaRsiStrategy, RsiTrendStrategy, RsiTrendWithTPSLStrategy, RsiMacdStrategy]
+REL_TOL = 1e-6
+
+
+def check(strategy_cls, pair: str, tf: str) -> list:
+    """Returns a list of mismatch descriptions (empty when in parity)."""
+    bars = load_bars(pair, tf)
+
+    t0 = time.perf_counter()
+    vec = run_vectorized(strategy_cls, bars)
+    vec_seconds = time.perf_counter() - t0
+
+    if vec.start >= len(vec.equity):
+        # Fewer bars than the warm-up: Backtrader cannot run this combination
+        print(f"{strategy_cls.__name__:<26} {pair} {tf:>3}: skipped, shorter than warm-up")
+        return []
+
+    t0 = time.perf_counter()
+    cerebro, strat = run_strategy(strategy_cls, [bars_feed(bars, tf)],
+                                  analyzers={"trades": TradeList}, equity_bucket=None)
+    bt_seconds = time.perf_counter() - t0
+
+    problems = []
+    bt_trades = strat.analyzers.trades.trades
+    vec_trades = vec.trades.dropna(subset=["exit_bar"])
+    if len(bt_trades) != len(vec_trades):
+        problems.append(f"closed trades {len(bt_trades)} (bt) != {len(vec_trades)} (vector)")
+    else:
+        for (dtopen, dtclose, *_), row in zip(bt_trades, vec_trades.itertuples()):
+            opened, closed = bt.num2date(dtopen), bt.num2date(dtclose)
+            if opened != row.entry_time or closed != row.exit_time:
+                problems.append(f"trade {opened} -> {closed} != {row.entry_time} -> {row.exit_time}")
+                break
+
+    bt_equity = equity_series(strat)
+    if not bt_equity.index.equals(vec.equity.index):
+        problems.append("equity timestamps differ")
+    elif (bt_equity - vec.equity).abs().max() > REL_TOL * bt_equity.abs().max():
+        problems.append(f"equity differs by up to {(bt_equity - vec.equity).abs().max():.6f}")
+
+    bt_value = cerebro.broker.getvalue()
+    if abs(bt_value - vec.final_value) > REL_TOL * abs(bt_value):
+        problems.append(f"final value {bt_value:.6f} (bt) != {vec.final_value:.6f} (vector)")
+
+    print(f"{strategy_cls.__name__:<26} {pair} {tf:>3}: {len(bt_trades):4d} trades, "
+          f"bt {bt_seconds:6.2f}s, vector {vec_seconds:6.3f}s  "
+          f"{'OK' if not problems else 'MISMATCH'}")
+    return problems
+
+
+if __name__ == "__main__":
+    pairs = sys.argv[1:2] or PAIRS
+    timeframes = sys.argv[2:3] or TIMEFRAMES
+    assert all(s.__name__ in RULES for s in STRATEGIES)
+
+    failures = 0
+    for strategy_cls in STRATEGIES:
+        for pair in pairs:
+            for tf in timeframes:
+                assert tf in TF_MAP
+                for problem in check(strategy_cls, pair, tf):
+                    print(f"    {problem}")
+                    failures += 1
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,274 @@
+"""Checkpoint a run at its last bar and resume it over newly appended bars.
+
+A checkpointed run pickles its whole Cerebro once the bars run out -- strategy
+and indicator line buffers, positions, pending and bracket orders, broker cash,
+EquityTracker arrays and the running metrics -- before anything is stopped.
+When new bars are appended to data/, resume() unpickles it and continues the
+same run loop over the bars after the snapshot only: no re-warming of long
+indicators, and the same results as a full replay (see check_checkpoint_parity).
+
+Runs are made in Backtrader's next mode (no preload / runonce), where every
+line is advanced bar by bar and can simply carry on. With a trend timeframe the
+trend feed is derived from the main bars, and the snapshot is taken at the last
+main bar that completes a trend period: a period still open at the end of the
+data would otherwise be delivered as a short bar that a full replay never sees.
+The bars after it are run on (the results cover all the data) and replayed on
+resume.
+
+A snapshot records the strategy's source digest and parameters, and the last
+bar it has seen; resume() refuses one that no longer matches the data or code.
+
+Usage:
+    python -m tools.checkpoint --strategy RsiTrendStrategy              # resume if possible
+    python -m tools.checkpoint --strategy RsiMacdTrendStrategy --trend-tf 4h --fresh
+"""
+import argparse
+import hashlib
+import json
+import os
+import pickle
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import backtrader as bt
+
+from tools.bar_cache import resample_bars
+
+
+# =========================
+# Configuration (edit here)
+# =========================
+CHECKPOINT_DIR = os.path.join("reports", "checkpoints")
+CHECKPOINT_VERSION = 1              # bump when snapshots stop being loadable
+# =========================
+
+
+class CheckpointError(Exception):
+    """The snapshot does not fit the data or the code it is resumed with."""
+
+
+class SnapshotCerebro(bt.Cerebro):
+    """Cerebro in next mode that pickles itself between two segments of its bars.
+
+    The feeds deliver the bars up to the checkpoint first; when they run out
+    the run is saved to `snapshot_path`, then the `tail` arrays (one per feed,
+    possibly empty) are streamed and the run carries on to the end.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.p.stdstats = False     # like run_strategy; DataTrades is also unpicklable
+        self.p.preload = False
+        self.p.runonce = False
+        self.snapshot_path: Optional[str] = None
+        self.meta: dict = {}
+        self.tail: Optional[list] = None
+
+    def _runnext(self, runstrats):
+        super()._runnext(runstrats)
+        if self.tail is None or self._event_stop:
+            return
+        if self.snapshot_path:
+            save(self, self.snapshot_path)
+        tail, self.tail = self.tail, None
+        for data, arrays in zip(self.datas, tail):
+            data.stream(arrays)
+        super()._runnext(runstrats)
+
+
+def save(cerebro: SnapshotCerebro, path: str) -> None:
+    """Pickle the paused run; the feeds' own arrays are left out (resume streams new ones)."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    arrays = [data.p.arrays for data in cerebro.datas]
+    tail, cerebro.tail = cerebro.tail, None
+    try:
+        for data in cerebro.datas:
+            data.p.arrays = None
+        with open(path + ".tmp", "wb") as f:
+            pickle.dump(cerebro, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + ".tmp", path)
+    finally:
+        for data, a in zip(cerebro.datas, arrays):
+            data.p.arrays = a
+        cerebro.tail = tail
+
+
+def _finish(cerebro: bt.Cerebro, runstrats: list) -> None:
+    """What Cerebro.runstrategies does after its run loop."""
+    for strat in runstrats:
+        strat._stop()
+    cerebro._broker.stop()
+    for data in cerebro.datas:
+        data.stop()
+    for feed in cerebro.feeds:
+        feed.stop()
+    cerebro.stop_writers(runstrats)
+
+
+# --- Where to cut ---
+
+def _rows(bars: Dict[str, np.ndarray], lo: int, hi: int) -> Dict[str, np.ndarray]:
+    return {col: arr[lo:hi] for col, arr in bars.items()}
+
+
+def checkpoint_index(dt: np.ndarray, main_seconds: int, trend_seconds: Optional[int]) -> int:
+    """Number of bars before the snapshot: all of them, or with a trend feed up to
+    the last bar whose trend period can have no later bar (the next bar starts a new one)."""
+    if not trend_seconds:
+        return len(dt)
+    secs = np.rint(np.asarray(dt) * 86400).astype(np.int64)
+    complete = np.flatnonzero((secs + main_seconds) // trend_seconds != secs // trend_seconds)
+    return int(complete[-1]) + 1 if len(complete) else 0
+
+
+def _segments(bars: Dict[str, np.ndarray], cut: int, tf: str,
+              trend_tf: Optional[str]) -> Tuple[list, list]:
+    """(head, tail) arrays per feed, split before bar `cut`."""
+    from run_backtest import tf_seconds
+
+    head, tail = _rows(bars, 0, cut), _rows(bars, cut, len(bars["datetime"]))
+    if not trend_tf:
+        return [head], [tail]
+    # cut is a trend period boundary, so each side resamples exactly as the whole would
+    seconds = tf_seconds(trend_tf)
+    return ([head, resample_bars(head, seconds) if cut else head],
+            [tail, resample_bars(tail, seconds) if len(tail["datetime"]) else tail])
+
+
+# --- Runs ---
+
+def snapshot_path(strategy_cls, pair: str, tf: str, trend_tf: Optional[str],
+                  params: Optional[dict]) -> str:
+    key = json.dumps([strategy_cls.__name__, pair, tf, trend_tf, sorted((params or {}).items())],
+                     default=repr)
+    name = f"{strategy_cls.__name__}_{pair}_{tf}_{hashlib.sha1(key.encode()).hexdigest()[:12]}.pkl"
+    return os.path.join(CHECKPOINT_DIR, name)
+
+
+def run_checkpointed(strategy_cls, bars: Dict[str, np.ndarray], tf: str,
+                     trend_tf: Optional[str] = None, params: Optional[dict] = None,
+                     path: Optional[str] = None, **run_kwargs):
+    """Full run over `bars` (column arrays of the main timeframe), saving a snapshot
+    to `path`. Returns (cerebro, strategy) like run_strategy."""
+    from run_backtest import bars_feed, run_strategy, tf_seconds
+    from tools.result_store import strategy_digest
+
+    dt = bars["datetime"]
+    cut = checkpoint_index(dt, tf_seconds(tf), tf_seconds(trend_tf) if trend_tf else None)
+    head, tail = _segments(bars, cut, tf, trend_tf)
+    feeds = [bars_feed(head[0], tf)]
+    if trend_tf:
+        feeds.append(bars_feed(head[1], trend_tf))
+
+    cerebro = SnapshotCerebro()
+    cerebro.snapshot_path = path if cut else None
+    cerebro.tail = tail
+    cerebro.meta = {
+        "version": CHECKPOINT_VERSION,
+        "strategy": strategy_cls.__name__,
+        "source": strategy_digest(strategy_cls),
+        "params": params or {},
+        "tf": tf,
+        "trend_tf": trend_tf,
+        "last_bar": [float(bars[c][cut - 1]) for c in ("datetime", "open", "high", "low", "close")]
+                    if cut else None,
+    }
+    return run_strategy(strategy_cls, feeds, params, cache_indicators=False, cerebro=cerebro,
+                        **run_kwargs)
+
+
+def load(path: str, strategy_cls, params: Optional[dict] = None) -> SnapshotCerebro:
+    """Unpickle a snapshot made for this strategy, code and parameters."""
+    from tools.result_store import strategy_digest
+
+    with open(path, "rb") as f:
+        cerebro = pickle.load(f)
+    meta = cerebro.meta
+    if meta.get("version") != CHECKPOINT_VERSION:
+        raise CheckpointError("snapshot from another checkpoint version")
+    if meta["strategy"] != strategy_cls.__name__ or meta["params"] != (params or {}):
+        raise CheckpointError("snapshot of another strategy or parameter set")
+    if meta["source"] != strategy_digest(strategy_cls):
+        raise CheckpointError(f"{strategy_cls.__name__} changed since the snapshot")
+    return cerebro
+
+
+def resume(cerebro: SnapshotCerebro, bars: Dict[str, np.ndarray], path: Optional[str] = None):
+    """Continue a loaded snapshot over the bars of `bars` after its last one, then
+    snapshot again at the new end (to `path`). Returns (cerebro, strategy)."""
+    from run_backtest import tf_seconds
+
+    meta = cerebro.meta
+    tf, trend_tf = meta["tf"], meta["trend_tf"]
+    dt = bars["datetime"]
+    start = int(np.searchsorted(dt, meta["last_bar"][0], side="right"))
+    seen = [float(bars[c][start - 1]) for c in ("datetime", "open", "high", "low", "close")] \
+        if start else None
+    if seen != meta["last_bar"]:
+        raise CheckpointError("the data no longer contains the snapshot's last bar unchanged")
+
+    new = _rows(bars, start, len(dt))
+    cut = checkpoint_index(new["datetime"], tf_seconds(tf), tf_seconds(trend_tf) if trend_tf else None)
+    head, tail = _segments(new, cut, tf, trend_tf)
+    if cut:
+        meta["last_bar"] = [float(new[c][cut - 1]) for c in ("datetime", "open", "high", "low", "close")]
+    cerebro.snapshot_path = path if cut else None
+    cerebro.tail = tail
+    for data, arrays in zip(cerebro.datas, head):
+        data.p.arrays = arrays
+        data.stream(arrays)
+
+    runstrats = cerebro.runningstrats
+    cerebro._runnext(runstrats)
+    _finish(cerebro, runstrats)
+    return cerebro, runstrats[0]
+
+
+def main(argv=None) -> None:
+    import time
+    import run_backtest as rb
+
+    parser = argparse.ArgumentParser(description="Run a backtest from its last checkpoint")
+    parser.add_argument("--strategy", default=rb.STRATEGY)
+    parser.add_argument("--pair", default=rb.PAIR)
+    parser.add_argument("--tf", default=rb.MAIN_TF, choices=list(rb.TF_MAP))
+    parser.add_argument("--trend-tf", default=None, choices=list(rb.TF_MAP))
+    parser.add_argument("--param", action="append", default=[], metavar="NAME=VALUE")
+    parser.add_argument("--fresh", action="store_true", help="ignore an existing snapshot")
+    args = parser.parse_args(argv)
+
+    try:
+        strategy_cls = rb.get_strategy(args.strategy)
+        params = rb.parse_assignments(args.param)
+        if args.trend_tf:
+            rb.check_trend_tf(args.tf, args.trend_tf)
+        elif rb.trend_feed_use(strategy_cls, params) == "required":
+            raise ValueError(f"{args.strategy} reads datas[1]: it needs --trend-tf")
+    except ValueError as e:
+        parser.error(str(e))
+
+    path = snapshot_path(strategy_cls, args.pair, args.tf, args.trend_tf, params)
+    bars = rb.load_bars(args.pair, args.tf)
+    t0 = time.perf_counter()
+    cerebro = None
+    if os.path.exists(path) and not args.fresh:
+        try:
+            cerebro = load(path, strategy_cls, params)
+        except (CheckpointError, pickle.UnpicklingError, AttributeError, EOFError) as e:
+            print(f"Snapshot not usable ({e}); running from the first bar")
+    if cerebro is not None:
+        since = bt.num2date(cerebro.meta["last_bar"][0])
+        cerebro, strat = resume(cerebro, bars, path)
+        print(f"Resumed from the snapshot at {since:%Y-%m-%d %H:%M}")
+    else:
+        cerebro, strat = run_checkpointed(strategy_cls, bars, args.tf, args.trend_tf, params, path)
+        print("Full run")
+    seconds = time.perf_counter() - t0
+
+    rb.print_performance(rb.summary_metrics(cerebro, strat), rb.CASH_START)
+    print(f"\n{seconds:.2f}s; snapshot at {bt.num2date(cerebro.meta['last_bar'][0]):%Y-%m-%d %H:%M} "
+          f"saved to '{path}'")
+
+
+if __name__ == "__main__":
+    main()
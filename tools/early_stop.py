@@ -0,0 +1,53 @@
+import backtrader as bt
+
+
+class EarlyStop(bt.Analyzer):
+    """Halts cerebro.run() as soon as a run is clearly hopeless.
+
+    Rules (each disabled when None):
+      - max_drawdown:   stop once drawdown from the equity peak exceeds this
+                        fraction (0.2 = -20%),
+      - min_value:      stop once broker value falls below this amount,
+      - no_trades_bars: stop if no trade has been opened after this many bars.
+
+    Drawdown is read from the "metrics" OnlineMetrics analyzer, which must be
+    added before this one (run_strategy does). ``reason`` records why the run
+    stopped (None if it ran to the end), ``stopped_at`` the bar's datetime.
+    """
+    params = (
+        ("max_drawdown", None),
+        ("min_value", None),
+        ("no_trades_bars", None),
+    )
+
+    def start(self):
+        self.metrics = self.strategy.analyzers.getbyname("metrics")
+        self.trades = 0
+        self.reason = None
+        self.stopped_at = None
+
+    def notify_trade(self, trade):
+        if trade.justopened:
+            self.trades += 1
+
+    def next(self):
+        if self.reason is not None:
+            return
+
+        p = self.p
+        reason = None
+        if p.max_drawdown is not None and self.metrics.drawdown <= -p.max_drawdown:
+            reason = f"drawdown {self.metrics.drawdown:.2%} beyond -{p.max_drawdown:.2%}"
+        elif p.min_value is not None and self.metrics.value < p.min_value:
+            reason = f"value {self.metrics.value:.2f} below {p.min_value:.2f}"
+        elif (p.no_trades_bars is not None and not self.trades
+              and self.metrics.bars >= p.no_trades_bars):
+            reason = f"no trades after {self.metrics.bars} bars"
+
+        if reason:
+            self.reason = reason
+            self.stopped_at = self.strategy.datas[0].datetime.datetime(0)
+            self.strategy.env.runstop()
+
+    def get_analysis(self):
+        return {"reason": self.reason, "stopped_at": self.stopped_at, "trades": self.trades}
@@ -1,10 +1,86 @@
+from __future__ import annotations
+
+import math
+from typing import TYPE_CHECKING
+
+import numpy as np
 import backtrader as bt
 
+from tools.bar_cache import bt_num_to_datetime
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
 class EquityTracker(bt.Analyzer):
-    def __init__(self):
-        self.values = []
-        self.datetimes = []
+    """Records broker value, cash and position size per bar into typed arrays.
+
+    Timestamps are kept as raw Backtrader float dates (no datetime objects).
+    Arrays are preallocated to the preloaded feed length and doubled if they
+    run out. With ``bucket`` set (in days, e.g. 1.0 = daily, 1 / 24 = hourly)
+    only the last record of each bucket is kept; otherwise one record per
+    distinct timestamp. Bars before ``start`` (a Backtrader float date, e.g.
+    warm-up bars before a date range) are not recorded. ``series()`` and
+    ``arrays()`` hand out views, no copies.
+    """
+    params = (
+        ("bucket", None),
+        ("start", None),
+    )
+
+    FIELDS = ("datetime", "value", "cash", "position")
+
+    def start(self):
+        capacity = max(self.data.buflen(), 1024)
+        self._arrays = {f: np.empty(capacity) for f in self.FIELDS}
+        self._n = 0
+        self._last_key = None
+
+    def _grow(self):
+        for f, arr in self._arrays.items():
+            bigger = np.empty(2 * len(arr))
+            bigger[:self._n] = arr[:self._n]
+            self._arrays[f] = bigger
 
     def next(self):
-        self.values.append(self.strategy.broker.getvalue())
-        self.datetimes.append(self.strategy.datas[0].datetime.datetime(0))
\ No newline at end of file
+        dt = self.strategy.datas[0].datetime[0]
+        if self.p.start is not None and dt < self.p.start:
+            return
+        key = dt if self.p.bucket is None else math.floor(dt / self.p.bucket)
+        if key == self._last_key:
+            i = self._n - 1  # same timestamp/bucket: keep the latest record
+        else:
+            if self._n == len(self._arrays["datetime"]):
+                self._grow()
+            i = self._n
+            self._n += 1
+            self._last_key = key
+
+        broker = self.strategy.broker
+        arrays = self._arrays
+        arrays["datetime"][i] = dt
+        arrays["value"][i] = broker.getvalue()
+        arrays["cash"][i] = broker.getcash()
+        arrays["position"][i] = self.strategy.getposition(self.strategy.datas[0]).size
+
+    def arrays(self) -> dict:
+        """Views of the recorded columns (Backtrader float dates in 'datetime')."""
+        return {f: arr[:self._n] for f, arr in self._arrays.items()}
+
+    def get_analysis(self):
+        return self.arrays()
+
+    def series(self, field: str = "value") -> pd.Series:
+        """One recorded column as a Series over a DatetimeIndex (values not copied)."""
+        import pandas as pd
+
+        arrays = self.arrays()
+        return pd.Series(arrays[field], index=bt_num_to_datetime(arrays["datetime"]), copy=False)
+
+    @property
+    def values(self) -> np.ndarray:
+        return self.arrays()["value"]
+
+    @property
+    def datetimes(self) -> pd.DatetimeIndex:
+        return bt_num_to_datetime(self.arrays()["datetime"])
@@ -0,0 +1,238 @@
+"""Memoized indicators shared across runs, in memory (LRU) and on disk.
+
+Inside ``cached_indicators()`` the common Backtrader indicators (SMA, EMA, RSI,
+MACD, ATR, ADX, StandardDeviation) are swapped for factories that look the
+output lines up by (input data hash, indicator, params). On a miss the real
+indicator is computed once, in a throwaway Cerebro over the same input, and
+stored as one ``.npy`` file per line under ``data/.cache/indicators/``; later
+runs memory-map those arrays, and the most recent entries stay in memory. The
+strategy gets a ``Precomputed`` indicator with the same line names and minimum
+periods, so ``strategies/*`` code runs unchanged and sees bit-identical values.
+
+Only indicators fed straight from a preloaded data feed (or one of its lines)
+are cached; anything else (indicator inputs, live data) falls back to the
+original class.
+"""
+import contextlib
+import hashlib
+import json
+import os
+from array import array
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import backtrader as bt
+
+from tools.bar_cache import CACHE_DIR, COLUMNS, ArrayData
+
+
+INDICATOR_DIR = os.path.join(CACHE_DIR, "indicators")
+MEMORY_ENTRIES = 256        # LRU size of the in-process cache
+CACHE_VERSION = 1           # bump to invalidate stored entries
+
+CACHED = (
+    bt.indicators.SMA,
+    bt.indicators.EMA,
+    bt.indicators.RSI,
+    bt.indicators.MACD,
+    bt.indicators.ATR,
+    bt.indicators.ADX,
+    bt.indicators.StandardDeviation,
+)
+
+# digest -> (line arrays, line minperiods), most recently used last
+_MEMORY: "OrderedDict[str, Tuple[tuple, tuple]]" = OrderedDict()
+# data feed lines that feed an indicator: close, low, high, open, volume
+_DATA_LINES = ("close", "low", "high", "open", "volume")
+
+
+class Precomputed(bt.Indicator):
+    """Indicator whose lines are copied from arrays computed beforehand."""
+    params = (
+        ("values", ()),        # one array per line, aligned with the input
+        ("minperiods", ()),    # minperiod of each line of the original indicator
+    )
+
+    def __init__(self):
+        for line, minperiod in zip(self.lines, self.p.minperiods):
+            line.addminperiod(minperiod)
+
+    def preonce(self, start, end):
+        self.once(start, end)
+
+    def once(self, start, end):
+        for line, values in zip(self.lines, self.p.values):
+            chunk = array("d")
+            chunk.frombytes(np.ascontiguousarray(values[start:end]).tobytes())
+            line.array[start:end] = chunk
+
+    def prenext(self):
+        self.next()
+
+    def next(self):
+        i = len(self) - 1
+        for line, values in zip(self.lines, self.p.values):
+            line[0] = float(values[i])
+
+
+_PRECOMPUTED: Dict[type, type] = {}
+
+
+def _precomputed_cls(ind_cls) -> type:
+    """Precomputed subclass with the lines (and plot settings) of `ind_cls`."""
+    if ind_cls not in _PRECOMPUTED:
+        _PRECOMPUTED[ind_cls] = type(f"Cached{ind_cls.__name__}", (Precomputed,), {
+            "lines": ind_cls.lines.getlinealiases(),
+            "plotinfo": dict(ind_cls.plotinfo._getitems()),
+            "plotlines": dict(ind_cls.plotlines._getitems()),
+        })
+    return _PRECOMPUTED[ind_cls]
+
+
+def _line_values(line) -> np.ndarray:
+    return np.frombuffer(line.array, dtype=np.float64)[:line.buflen()]
+
+
+def _data_digest(data) -> str:
+    """Hash of a preloaded feed's bars, memoized on the feed for its current length."""
+    n = data.buflen()
+    known = getattr(data, "_bars_digest", None)
+    if known and known[0] == n:
+        return known[1]
+
+    h = hashlib.blake2b(digest_size=16)
+    for name in _DATA_LINES:
+        h.update(memoryview(_line_values(getattr(data.lines, name))))
+    data._bars_digest = (n, h.hexdigest())
+    return data._bars_digest[1]
+
+
+def _resolve_input(args: tuple):
+    """(data feed or data line, line name or None) an indicator call reads, or None."""
+    owner = bt.metabase.findowner(None, bt.LineIterator)
+    if owner is None or len(args) > 1:
+        return None
+    if not args:
+        return (owner.datas[0], None) if isinstance(owner.datas[0], bt.AbstractDataBase) else None
+
+    arg = args[0]
+    if isinstance(arg, bt.AbstractDataBase):
+        return arg, None
+    for data in owner.datas:
+        if not isinstance(data, bt.AbstractDataBase):
+            continue
+        for name in _DATA_LINES:
+            if getattr(data.lines, name) is arg:
+                return data, name
+    return None
+
+
+def _compute(ind_cls, data, line_name: Optional[str], params: dict) -> Tuple[tuple, tuple]:
+    """Run the real indicator over a copy of the input bars; return its lines."""
+    arrays = {col: np.zeros(data.buflen()) for col in COLUMNS}
+    arrays["datetime"] = _line_values(data.lines.datetime)
+    for name in _DATA_LINES:
+        arrays[name] = _line_values(getattr(data.lines, name))
+
+    class Compute(bt.Strategy):
+        def __init__(self):
+            source = self.data if line_name is None else getattr(self.data.lines, line_name)
+            self.ind = ind_cls(source, **params)
+
+        def prenext(self):
+            # the lines are fully computed in the vectorized pass before the
+            # first bar; skip the bar-by-bar loop
+            self.env.runstop()
+
+        next = prenext
+
+    cerebro = bt.Cerebro(stdstats=False)
+    cerebro.adddata(ArrayData(arrays=arrays))
+    cerebro.addstrategy(Compute)
+    ind = cerebro.run()[0].ind
+    return (
+        tuple(_line_values(line).copy() for line in ind.lines),
+        tuple(line._minperiod for line in ind.lines),
+    )
+
+
+def _store(digest: str, names: tuple, values: tuple, minperiods: tuple, meta: dict) -> None:
+    folder = os.path.join(INDICATOR_DIR, digest)
+    os.makedirs(folder, exist_ok=True)
+    tmp = f".tmp{os.getpid()}"
+    for name, arr in zip(names, values):
+        target = os.path.join(folder, f"{name}.npy")
+        with open(target + tmp, "wb") as f:
+            np.save(f, arr)
+        os.replace(target + tmp, target)
+    meta_file = os.path.join(folder, "meta.json")
+    with open(meta_file + tmp, "w") as f:
+        json.dump({**meta, "lines": list(names), "minperiods": list(minperiods)}, f)
+    os.replace(meta_file + tmp, meta_file)
+
+
+def _load(digest: str) -> Optional[Tuple[tuple, tuple]]:
+    folder = os.path.join(INDICATOR_DIR, digest)
+    meta_file = os.path.join(folder, "meta.json")
+    if not os.path.exists(meta_file):
+        return None
+    with open(meta_file) as f:
+        meta = json.load(f)
+    values = tuple(np.load(os.path.join(folder, f"{name}.npy"), mmap_mode="r")
+                   for name in meta["lines"])
+    return values, tuple(meta["minperiods"])
+
+
+def lookup(ind_cls, data, line_name: Optional[str], params: dict) -> Tuple[tuple, tuple]:
+    """Line arrays and minperiods of `ind_cls(params)` on `data`: memory, disk, or compute."""
+    full = dict(ind_cls.params._getitems())
+    full.update(params)
+    key = repr((CACHE_VERSION, bt.__version__, _data_digest(data), line_name,
+                ind_cls.__module__, ind_cls.__name__, sorted(full.items())))
+    digest = hashlib.sha1(key.encode()).hexdigest()
+
+    if digest in _MEMORY:
+        _MEMORY.move_to_end(digest)
+        return _MEMORY[digest]
+
+    entry = _load(digest)
+    if entry is None:
+        entry = _compute(ind_cls, data, line_name, params)
+        meta = {"indicator": ind_cls.__name__, "input": line_name or "data",
+                "params": {k: repr(v) for k, v in full.items()}}
+        _store(digest, ind_cls.lines.getlinealiases(), *entry, meta)
+
+    _MEMORY[digest] = entry
+    if len(_MEMORY) > MEMORY_ENTRIES:
+        _MEMORY.popitem(last=False)
+    return entry
+
+
+def _factory(ind_cls):
+    def make(*args, **kwargs):
+        resolved = _resolve_input(args)
+        if resolved is None or resolved[0].buflen() == 0:  # not preloaded: nothing to hash
+            return ind_cls(*args, **kwargs)
+        values, minperiods = lookup(ind_cls, resolved[0], resolved[1], kwargs)
+        return _precomputed_cls(ind_cls)(*args, values=values, minperiods=minperiods)
+
+    make.__name__ = ind_cls.__name__
+    return make
+
+
+@contextlib.contextmanager
+def cached_indicators():
+    """Serve CACHED indicators created by strategies from the cache while active."""
+    patched = {name: obj for name, obj in vars(bt.indicators).items() if obj in CACHED}
+    try:
+        for name, ind_cls in patched.items():
+            setattr(bt.indicators, name, _factory(ind_cls))
+        yield
+    finally:
+        for name, ind_cls in patched.items():
+            setattr(bt.indicators, name, ind_cls)
+
+
+def clear_memory() -> None:
+    _MEMORY.clear()
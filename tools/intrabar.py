@@ -0,0 +1,162 @@
+"""Intrabar fill resolution: match stop/limit orders on finer bars of the same pair.
+
+Backtrader matches orders against the OHLC of the strategy's bar. When one bar
+touches both the stop and the target of a bracket, it cannot tell which came
+first and fills whichever order is queued first (the stop). IntrabarBroker
+keeps the strategy on its own timeframe but, for a feed carrying finer bars
+(see attach_fine_bars), matches Limit/Stop/StopLimit orders bar by bar over the
+fine bars inside the current main bar:
+
+  * an order fills on the first fine bar that reaches its price, at the price
+    Backtrader's own matching gives for that fine bar (gaps, slippage included);
+  * of two OCO / bracket legs, the one reached first fills and cancels the other;
+  * bracket legs are active from the fine bar after the entry fill, so a stop
+    or target hit in the entry bar itself is no longer deferred to the next bar.
+
+The strategy still sees one bar at a time, so only the orders' fine windows
+are scanned (with NumPy) -- the run costs about as much as the bar-level one.
+Market and Close orders, and feeds without fine bars, match as usual.
+"""
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import backtrader as bt
+from backtrader import Order
+
+
+TICKS = ("tick_open", "tick_high", "tick_low", "tick_close")
+_EPS = 0.5 / 86400  # half a second, in days: absorbs date2num rounding
+
+
+def attach_fine_bars(data, bars: Dict[str, np.ndarray]) -> None:
+    """Let IntrabarBroker resolve `data`'s fills on `bars` (column arrays, finer timeframe).
+
+    Both feeds are expected to stamp bars at their open, as the CSVs in data/ do.
+    """
+    data.fine_bars = {col: np.asarray(bars[col], dtype=np.float64)
+                      for col in ("datetime", "open", "high", "low", "close")}
+
+
+def _span_days(data) -> float:
+    """Length of one of the feed's bars, in days."""
+    if data._timeframe >= bt.TimeFrame.Days:
+        return float(data._compression)
+    return data._compression * {bt.TimeFrame.Minutes: 60, bt.TimeFrame.Seconds: 1}.get(
+        data._timeframe, 60) / 86400
+
+
+class IntrabarBroker(bt.brokers.BackBroker):
+    """BackBroker that resolves stop/limit fills on a feed's fine bars.
+
+    `resolved` counts the bars in which two legs of a group were both reached:
+    "stop_first" / "target_first" by which one the fine bars filled.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.resolved = Counter()
+        self._windows: Dict[int, Tuple[int, int]] = {}   # id(data) -> fine index range of the bar
+        self._start: Dict[int, int] = {}                 # order ref -> first fine index to check
+        self._filled_at: Dict[int, int] = {}             # order ref -> fine index of its fill
+
+    def next(self):
+        self._windows.clear()
+        self._start.clear()
+        self._filled_at.clear()
+        super().next()
+
+    # --- Fine windows ---
+
+    def _window(self, data) -> Tuple[int, int]:
+        """[lo, hi) indices of the fine bars inside data's current bar."""
+        key = id(data)
+        if key not in self._windows:
+            dt = data.datetime[0]
+            span = _span_days(data)
+            start = np.floor(dt) if data._timeframe >= bt.TimeFrame.Days else dt
+            lo, hi = np.searchsorted(data.fine_bars["datetime"], [start - _EPS, start + span - _EPS])
+            self._windows[key] = int(lo), int(hi)
+        return self._windows[key]
+
+    def _order_window(self, order) -> Tuple[int, int]:
+        lo, hi = self._window(order.data)
+        return max(lo, self._start.get(order.ref, lo)), hi
+
+    def _trigger_index(self, order) -> Optional[int]:
+        """First fine bar of the order's window that reaches its price, or None."""
+        lo, hi = self._order_window(order)
+        fine = order.data.fine_bars
+        exectype = order.exectype
+        if exectype in (Order.StopLimit, Order.StopTrailLimit) and order.triggered:
+            exectype, price = Order.Limit, order.created.pricelimit
+        else:
+            price = order.created.price
+
+        if exectype == Order.Limit:
+            hit = fine["low"][lo:hi] <= price if order.isbuy() else fine["high"][lo:hi] >= price
+        elif exectype in (Order.Stop, Order.StopTrail, Order.StopLimit, Order.StopTrailLimit):
+            hit = fine["high"][lo:hi] >= price if order.isbuy() else fine["low"][lo:hi] <= price
+        else:
+            return None
+        idx = np.flatnonzero(hit)
+        return lo + int(idx[0]) if len(idx) else None
+
+    def _group(self, order) -> list:
+        """Other live, active orders that cancel `order` when they fill (bracket / OCO)."""
+        pref = getattr(order.parent, "ref", None)
+        group = list(self._pchildren.get(pref, ())) if pref is not None else []
+        oco = self._ocol.get(self._ocos.get(order.ref), ())
+        if len(oco) > 1:
+            group += [o for o in self.pending if o is not None and o.ref in oco]
+        return [o for o in group if o is not order and o.alive() and o.active()]
+
+    # --- Matching ---
+
+    def _try_exec(self, order):
+        data = order.data
+        fine = getattr(data, "fine_bars", None)
+        lo, hi = self._window(data) if fine is not None else (0, 0)
+        if lo >= hi or order.exectype not in (Order.Limit, Order.Stop, Order.StopTrail,
+                                              Order.StopLimit, Order.StopTrailLimit):
+            # no fine bars for this bar, or an order type matched on the bar itself
+            if fine is not None and order.exectype == Order.Market:
+                self._filled_at[order.ref] = lo
+            return super()._try_exec(order)
+
+        k = self._trigger_index(order)
+        if k is None:
+            if order.exectype in (Order.StopTrail, Order.StopTrailLimit):
+                order.trailadjust(data.close[0])
+            return
+
+        rivals = [r for r in (self._trigger_index(o) for o in self._group(order)) if r is not None]
+        if rivals:
+            if min(rivals) < k:
+                return  # another leg is reached first; it fills and cancels this one
+            self.resolved["stop_first" if order.exectype != Order.Limit else "target_first"] += 1
+
+        saved = tuple(getattr(data, t, None) for t in TICKS)
+        try:
+            for j in range(k, hi):
+                for t, col in zip(TICKS, ("open", "high", "low", "close")):
+                    setattr(data, t, float(fine[col][j]))
+                super()._try_exec(order)
+                if not order.alive():
+                    self._filled_at[order.ref] = j
+                    break
+        finally:
+            for t, value in zip(TICKS, saved):
+                setattr(data, t, value)
+
+    def _bracketize(self, order, cancel=False):
+        super()._bracketize(order, cancel)
+        k = self._filled_at.get(order.ref)
+        if cancel or k is None or order.parent is not None:
+            return
+        # entry filled intrabar: its legs go live from the next fine bar of this bar
+        for child in self._pchildren.get(order.ref, ()):
+            if child in self._toactivate:
+                self._toactivate.remove(child)
+                child.activate()
+                self._start[child.ref] = k + 1
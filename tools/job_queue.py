@@ -0,0 +1,454 @@
+"""Job queue for backtest campaigns: a coordinator enqueues runs, workers anywhere pull them.
+
+A job is one run_backtest call (strategy, pair, timeframe, params, ...) stored
+as JSON in a SQLite queue. Workers claim jobs one at a time with a lease that
+a heartbeat thread keeps renewing while the run is going; the metrics go back
+into the job row only: workers bypass tools.result_store, whose WAL file is
+not safe to share between hosts.
+
+Workers that die (killed, host lost) stop renewing: once the lease expires
+the job is claimed again, up to MAX_ATTEMPTS claims. An exception inside a run
+fails the job at once with its traceback -- it would only fail again. Specs
+are checked when they are enqueued (strategy, params, timeframes, trend feed),
+so the ones that could only fail never reach a worker.
+
+The SQLite file is the local transport. On one host it runs in WAL mode. WAL
+keeps its index in shared memory, so it cannot work across hosts: workers on
+several machines sharing the file over a network file system need --shared on
+every process (a rollback journal, with SQLite's file locks), and even that is
+only as safe as the file system's locking, which many NFS setups get wrong.
+Beyond a trusted shared disk, put another backend behind JobQueue's claim /
+heartbeat / complete / fail, the whole contract workers rely on.
+
+Usage:
+    python -m tools.job_queue enqueue                        # the tools.param_sweep configuration
+    python -m tools.job_queue enqueue --strategy RsiTrendStrategy --strategy SMAPriceActionStrategy \\
+        --pair EURUSD --pair EURJPY --tf 1h --tf 4h --grid rsi_period=10,14,21
+    python -m tools.job_queue work --processes 4              # until stopped
+    python -m tools.job_queue work --drain                    # stop once the queue is empty
+    python -m tools.job_queue status
+    python -m tools.job_queue results --output reports/campaign.csv
+"""
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+
+# =========================
+# Configuration (edit here)
+# =========================
+QUEUE_DB = os.path.join("reports", "jobs.sqlite")
+LEASE_SECONDS = 120                 # a claimed job goes back to the queue this long after its last heartbeat
+HEARTBEAT_SECONDS = 20              # how often a worker renews the lease of the job it runs
+MAX_ATTEMPTS = 3                    # claims of a job (lost workers included) before it is marked failed
+POLL_SECONDS = 2.0                  # idle workers look for new jobs this often
+SHARED_FILE = False                 # True when processes on other hosts open the file (no WAL)
+# =========================
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    campaign TEXT, spec TEXT, status TEXT,
+    attempts INTEGER DEFAULT 0, worker TEXT, lease_until REAL,
+    created TEXT, started TEXT, finished TEXT,
+    metrics TEXT, error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, id);
+CREATE INDEX IF NOT EXISTS jobs_by_campaign ON jobs (campaign, status);
+"""
+STATUSES = ("queued", "running", "done", "failed")
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+class JobQueue:
+    """Jobs table in one SQLite file, shared by the coordinator and every worker."""
+
+    def __init__(self, path: str = QUEUE_DB, shared: bool = SHARED_FILE):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # autocommit; claims take the write lock explicitly (BEGIN IMMEDIATE)
+        self.db = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.db.row_factory = sqlite3.Row
+        # WAL's shared-memory index only works on one host
+        self.db.execute(f"PRAGMA journal_mode={'DELETE' if shared else 'WAL'}")
+        self.db.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.db.close()
+
+    # --- Coordinator ---
+
+    def enqueue(self, specs: Iterable[dict], campaign: Optional[str] = None) -> str:
+        """Queue one job per run spec (run_backtest keyword arguments). Returns the campaign."""
+        campaign = campaign or datetime.now().strftime("%Y%m%d-%H%M%S")
+        created = _now()
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            self.db.executemany(
+                "INSERT INTO jobs (campaign, spec, status, created) VALUES (?, ?, 'queued', ?)",
+                [(campaign, json.dumps(spec, sort_keys=True), created) for spec in specs])
+            self.db.execute("COMMIT")
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        return campaign
+
+    def requeue_failed(self, campaign: Optional[str] = None) -> int:
+        """Give failed jobs a fresh set of attempts."""
+        sql = ("UPDATE jobs SET status = 'queued', attempts = 0, worker = NULL, error = NULL "
+               "WHERE status = 'failed'")
+        args = ()
+        if campaign:
+            sql, args = sql + " AND campaign = ?", (campaign,)
+        return self.db.execute(sql, args).rowcount
+
+    def counts(self, campaign: Optional[str] = None) -> Dict[str, int]:
+        where, args = (" WHERE campaign = ?", (campaign,)) if campaign else ("", ())
+        rows = self.db.execute(f"SELECT status, COUNT(*) FROM jobs{where} GROUP BY status", args)
+        return {**dict.fromkeys(STATUSES, 0), **{status: n for status, n in rows}}
+
+    def jobs(self, campaign: Optional[str] = None, status: Optional[str] = None) -> List[dict]:
+        """Job rows with `spec` and `metrics` decoded."""
+        filters = {"campaign": campaign, "status": status}
+        where = [f"{col} = ?" for col, v in filters.items() if v is not None]
+        sql = "SELECT * FROM jobs" + (" WHERE " + " AND ".join(where) if where else "") + " ORDER BY id"
+        out = []
+        for row in self.db.execute(sql, [v for v in filters.values() if v is not None]):
+            job = dict(row)
+            job["spec"] = json.loads(job["spec"])
+            job["metrics"] = json.loads(job["metrics"]) if job["metrics"] else None
+            out.append(job)
+        return out
+
+    def latest_campaign(self) -> Optional[str]:
+        row = self.db.execute("SELECT campaign FROM jobs ORDER BY id DESC LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    # --- Workers ---
+
+    def claim(self, worker: str, lease: float = LEASE_SECONDS,
+              max_attempts: int = MAX_ATTEMPTS) -> Optional[dict]:
+        """Take the oldest queued job, or one whose worker stopped heartbeating.
+
+        Returns {"id", "spec", "attempts"} or None when nothing is claimable.
+        Expired jobs that have used up their attempts are marked failed.
+        """
+        now = time.time()
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            self.db.execute(
+                "UPDATE jobs SET status = 'failed', finished = ?, "
+                "error = 'lease expired ' || attempts || ' times (worker ' || worker || ' lost)' "
+                "WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+                (_now(), now, max_attempts))
+            row = self.db.execute(
+                "SELECT id, spec, attempts FROM jobs WHERE status = 'queued' "
+                "OR (status = 'running' AND lease_until < ?) ORDER BY id LIMIT 1", (now,)).fetchone()
+            if row is not None:
+                self.db.execute(
+                    "UPDATE jobs SET status = 'running', worker = ?, lease_until = ?, "
+                    "attempts = attempts + 1, started = ? WHERE id = ?",
+                    (worker, now + lease, _now(), row["id"]))
+            self.db.execute("COMMIT")
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        if row is None:
+            return None
+        return {"id": row["id"], "spec": json.loads(row["spec"]), "attempts": row["attempts"] + 1}
+
+    def heartbeat(self, job_id: int, worker: str, lease: float = LEASE_SECONDS) -> bool:
+        """Extend the lease; False if the job is no longer this worker's."""
+        cur = self.db.execute(
+            "UPDATE jobs SET lease_until = ? WHERE id = ? AND worker = ? AND status = 'running'",
+            (time.time() + lease, job_id, worker))
+        return cur.rowcount == 1
+
+    def complete(self, job_id: int, worker: str, metrics: dict) -> bool:
+        """Record the metrics; ignored (False) if the job was meanwhile given to another worker."""
+        cur = self.db.execute(
+            "UPDATE jobs SET status = 'done', metrics = ?, error = NULL, finished = ? "
+            "WHERE id = ? AND worker = ? AND status = 'running'",
+            (json.dumps(metrics), _now(), job_id, worker))
+        return cur.rowcount == 1
+
+    def fail(self, job_id: int, worker: str, error: str) -> bool:
+        cur = self.db.execute(
+            "UPDATE jobs SET status = 'failed', error = ?, finished = ? "
+            "WHERE id = ? AND worker = ? AND status = 'running'",
+            (error, _now(), job_id, worker))
+        return cur.rowcount == 1
+
+    def release(self, job_id: int, worker: str) -> None:
+        """Hand a job back unfinished (worker shutting down); the claim does not count."""
+        self.db.execute(
+            "UPDATE jobs SET status = 'queued', worker = NULL, lease_until = NULL, "
+            "attempts = attempts - 1 WHERE id = ? AND worker = ? AND status = 'running'",
+            (job_id, worker))
+
+
+# --- Run specs ---
+
+def campaign_specs(strategies: Dict[str, Dict[str, Iterable]], pairs: List[str],
+                   timeframes: List[str], trend_tf: Optional[str] = None, **common) -> List[dict]:
+    """One spec per strategy x pair x timeframe x parameter combination.
+
+    `strategies` maps class names to their param grids; `trend_tf` goes to the
+    strategies that read a trend feed only; `common` holds further run_backtest
+    keywords (stop_rules, start, end, ...) for every run.
+    """
+    from run_backtest import get_strategy, trend_feed_use
+    from tools.param_sweep import expand_grid
+
+    common = {k: v for k, v in common.items() if v is not None}
+    specs = []
+    for name, grid in strategies.items():
+        trend = {"trend_tf": trend_tf} if trend_tf and trend_feed_use(get_strategy(name)) else {}
+        specs += [{"strategy": name, "pair": pair, "tf": tf, "params": params, **trend, **common}
+                  for params in expand_grid(grid) for pair in pairs for tf in timeframes]
+    return specs
+
+
+def check_spec(spec: dict) -> None:
+    """Raise ValueError for a spec that could only fail on a worker."""
+    import run_backtest as rb
+
+    strategy_cls = rb.get_strategy(spec["strategy"])
+    unknown = set(spec.get("params", {})) - set(strategy_cls.params._getkeys())
+    if unknown:
+        raise ValueError(f"{spec['strategy']} has no parameter(s) {', '.join(sorted(unknown))}")
+    for tf in (spec["tf"], spec.get("trend_tf"), spec.get("fill_tf")):
+        if tf is not None and tf not in rb.TF_MAP:
+            raise ValueError(f"Unknown timeframe '{tf}'")
+    if not os.path.exists(rb.feed_path(spec["pair"], spec["tf"])):
+        raise ValueError(f"No data file '{rb.feed_path(spec['pair'], spec['tf'])}'")
+    if spec.get("trend_tf"):
+        rb.check_trend_tf(spec["tf"], spec["trend_tf"])
+    elif rb.trend_feed_use(strategy_cls, spec.get("params")) == "required":
+        raise ValueError(f"{spec['strategy']} reads datas[1]: it needs a trend timeframe")
+    if spec.get("fill_tf"):
+        rb.check_fill_tf(spec["tf"], spec["fill_tf"])
+    rb.parse_date(spec.get("start"))
+    rb.parse_date(spec.get("end"))
+
+
+def check_specs(specs: List[dict]) -> List[str]:
+    """Problems of a campaign's specs, one line per distinct problem (empty if none)."""
+    problems = {}
+    for spec in specs:
+        try:
+            check_spec(spec)
+        except (ValueError, KeyError) as e:
+            problems.setdefault(str(e), spec)
+    return [f"{problem} (e.g. {json.dumps(spec, sort_keys=True)})" for problem, spec in problems.items()]
+
+
+def run_job(spec: dict) -> dict:
+    """Execute one spec: run_backtest's metrics, nothing printed or rendered.
+
+    The result store is bypassed (see the module notes); the caller keeps the metrics.
+    """
+    from run_backtest import run_backtest
+
+    return run_backtest(**spec, metrics_only=True, store=False)
+
+
+# --- Worker ---
+
+class _Heartbeat(threading.Thread):
+    """Renews a job's lease from its own connection until stopped."""
+
+    def __init__(self, path: str, job_id: int, worker: str, lease: float, every: float,
+                 shared: bool):
+        super().__init__(daemon=True)
+        self.path, self.job_id, self.worker, self.shared = path, job_id, worker, shared
+        self.lease, self.every = lease, every
+        self.stopped = threading.Event()
+
+    def run(self):
+        queue = JobQueue(self.path, self.shared)
+        try:
+            while not self.stopped.wait(self.every):
+                if not queue.heartbeat(self.job_id, self.worker, self.lease):
+                    return
+        finally:
+            queue.close()
+
+
+def work(path: str = QUEUE_DB, worker: Optional[str] = None, drain: bool = False,
+         lease: float = LEASE_SECONDS, heartbeat: float = HEARTBEAT_SECONDS,
+         max_attempts: int = MAX_ATTEMPTS, poll: float = POLL_SECONDS,
+         shared: bool = SHARED_FILE) -> int:
+    """Claim and run jobs until stopped (or, with `drain`, until none is left).
+
+    Returns the number of jobs this worker completed.
+    """
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    queue = JobQueue(path, shared)
+    done = 0
+    try:
+        while True:
+            job = queue.claim(worker, lease, max_attempts)
+            if job is None:
+                if drain and not queue.counts()["running"]:
+                    return done
+                time.sleep(poll)
+                continue
+
+            beat = _Heartbeat(path, job["id"], worker, lease, heartbeat, shared)
+            beat.start()
+            try:
+                metrics = run_job(job["spec"])
+            except KeyboardInterrupt:
+                queue.release(job["id"], worker)
+                raise
+            except Exception:
+                queue.fail(job["id"], worker, traceback.format_exc(limit=5))
+                print(f"[{worker}] job {job['id']} failed")
+                continue
+            finally:
+                beat.stopped.set()
+                beat.join()
+            if queue.complete(job["id"], worker, metrics):
+                done += 1
+                print(f"[{worker}] job {job['id']} done (attempt {job['attempts']}): "
+                      f"{job['spec']['strategy']} {job['spec']['pair']} {job['spec']['tf']} "
+                      f"sharpe {metrics['sharpe']:.2f}")
+    except KeyboardInterrupt:
+        return done
+    finally:
+        queue.close()
+
+
+def _work_process(kwargs: dict) -> int:
+    return work(**kwargs)
+
+
+# --- CLI ---
+
+def _parse_grid(items: List[str]) -> Dict[str, list]:
+    """['period=10,20', 'mode=fast'] -> {'period': [10, 20], 'mode': ['fast']}"""
+    import ast
+
+    grid = {}
+    for item in items:
+        name, sep, raw = item.partition("=")
+        if not sep or not name:
+            raise ValueError(f"Expected NAME=V1,V2,..., got '{item}'")
+        values = []
+        for text in raw.split(","):
+            try:
+                values.append(ast.literal_eval(text))
+            except (ValueError, SyntaxError):
+                values.append(text)
+        grid[name.strip()] = values
+    return grid
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Backtest job queue: enqueue, work, status, results")
+    parser.add_argument("--db", default=QUEUE_DB, help="queue file")
+    parser.add_argument("--shared", action="store_true", default=SHARED_FILE,
+                        help="the file is opened from several hosts (no WAL; see the module notes)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    enq = sub.add_parser("enqueue", help="queue a campaign (default: tools.param_sweep's configuration)")
+    enq.add_argument("--strategy", action="append", default=[], help="class name (repeatable)")
+    enq.add_argument("--pair", action="append", default=[])
+    enq.add_argument("--tf", action="append", default=[])
+    enq.add_argument("--trend-tf", default=None)
+    enq.add_argument("--grid", action="append", default=[], metavar="NAME=V1,V2",
+                     help="param values, for every strategy given")
+    enq.add_argument("--start", default=None, metavar="DATE")
+    enq.add_argument("--end", default=None, metavar="DATE")
+    enq.add_argument("--campaign", default=None, help="name (default: a timestamp)")
+
+    wrk = sub.add_parser("work", help="run queued jobs")
+    wrk.add_argument("--processes", type=int, default=1, help="worker processes on this host")
+    wrk.add_argument("--drain", action="store_true", help="exit once the queue is empty")
+    wrk.add_argument("--lease", type=float, default=LEASE_SECONDS)
+    wrk.add_argument("--heartbeat", type=float, default=HEARTBEAT_SECONDS)
+
+    for name in ("status", "results", "requeue"):
+        p = sub.add_parser(name)
+        p.add_argument("--campaign", default=None, help="default: the latest one")
+    sub.choices["results"].add_argument("--order-by", default="sharpe")
+    sub.choices["results"].add_argument("--output", help="write every finished run to this CSV")
+    args = parser.parse_args(argv)
+
+    if args.command == "work":
+        kwargs = dict(path=args.db, drain=args.drain, lease=args.lease, heartbeat=args.heartbeat,
+                      shared=args.shared)
+        if args.processes <= 1:
+            done = work(**kwargs)
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=args.processes) as pool:
+                done = sum(pool.map(_work_process, [kwargs] * args.processes))
+        print(f"{done} jobs done")
+        return
+
+    queue = JobQueue(args.db, args.shared)
+    if args.command == "enqueue":
+        try:
+            grid = _parse_grid(args.grid)
+        except ValueError as e:
+            parser.error(str(e))
+        if args.strategy:
+            strategies = {name: grid for name in args.strategy}
+        else:
+            from tools import param_sweep as ps
+            strategies = {ps.STRATEGY.__name__: grid or ps.PARAM_GRID}
+            args.pair = args.pair or ps.PAIRS
+            args.tf = args.tf or ps.TIMEFRAMES
+            args.trend_tf = args.trend_tf or ps.TREND_TF
+        import run_backtest as rb
+        try:
+            specs = campaign_specs(strategies, args.pair or [rb.PAIR], args.tf or [rb.MAIN_TF],
+                                   trend_tf=args.trend_tf, start=args.start, end=args.end)
+        except ValueError as e:
+            parser.error(str(e))
+        problems = check_specs(specs)
+        if problems:
+            parser.error("nothing queued:\n  " + "\n  ".join(problems))
+        campaign = queue.enqueue(specs, args.campaign)
+        print(f"Queued {len(specs)} jobs as campaign '{campaign}' in '{args.db}'")
+        return
+
+    campaign = args.campaign or queue.latest_campaign()
+    if args.command == "requeue":
+        print(f"Requeued {queue.requeue_failed(campaign)} failed jobs of '{campaign}'")
+    elif args.command == "status":
+        counts = queue.counts(campaign)
+        print(f"Campaign '{campaign}': " + ", ".join(f"{n} {s}" for s, n in counts.items()))
+        for job in queue.jobs(campaign, "running"):
+            print(f"  job {job['id']} running on {job['worker']} (attempt {job['attempts']})")
+        for job in queue.jobs(campaign, "failed"):
+            print(f"  job {job['id']} failed: {job['error'].strip().splitlines()[-1]}")
+    else:
+        import pandas as pd
+        rows = [{"job": j["id"], "strategy": j["spec"]["strategy"], "pair": j["spec"]["pair"],
+                 "tf": j["spec"]["tf"], **j["spec"].get("params", {}), **j["metrics"]}
+                for j in queue.jobs(campaign, "done")]
+        table = pd.DataFrame(rows)
+        if not table.empty and args.order_by in table:
+            table = table.sort_values(args.order_by, ascending=False, ignore_index=True)
+        if args.output:
+            os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+            table.to_csv(args.output, index=False)
+            print(f"{len(table)} runs saved to '{args.output}'")
+        print(table.head(20).to_string())
+    queue.close()
+
+
+if __name__ == "__main__":
+    main()
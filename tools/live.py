@@ -0,0 +1,446 @@
+"""Live / paper mode: feed bars to a running strategy one at a time.
+
+Instead of replaying a finished CSV, cerebro runs on LiveBars feeds that a
+source thread fills as bars arrive. Strategy, indicator and broker state stay
+in memory, so each new bar costs one `next()` -- not a rerun of the history.
+Sources:
+
+  * replay  -- bars of the cache played back at --rate bars/s (default one
+               bar per 10 ms; 0 = all at once, so "bar" and "order" latency
+               then mostly measure the wait in the queue), standing in for
+               a broker feed;
+  * csv     -- follow a CSV in the data/ format as lines are appended (tail -f);
+  * socket  -- CSV lines from one TCP client (e.g. `nc localhost 9009`).
+
+The last --warmup cached bars are fed first as history, so indicators are
+ready when the first live bar comes in. With a trend timeframe, trend bars
+are built from the live bars as each trend period completes (see
+resample_bars); one closed by a gap arrives with the next bar.
+
+PaperBroker fills orders like the backtest broker and emits every live order
+as a JSON line. Latency is measured per live bar from its arrival (line read
+or bar published by the source): to the end of the bar's processing ("bar"),
+from the feed taking it off the queue ("processing") and to each order the
+strategy submits ("order"). LatencyTracker reports percentiles in microseconds.
+
+Usage:
+    python -m tools.live --source replay --bars 2000
+    python -m tools.live --source csv --path live/EURUSD_1h.csv --orders orders.jsonl
+    python -m tools.live --source socket --port 9009 --strategy RsiMacdTrendStrategy --trend-tf 4h
+"""
+import argparse
+import datetime as _dt
+import functools
+import json
+import queue
+import socket
+import sys
+import threading
+import time
+from array import array
+from typing import Callable, Optional
+
+import numpy as np
+import backtrader as bt
+from backtrader.utils import date2num
+
+from tools.bar_cache import COLUMNS, SESSION_END
+
+
+# =========================
+# Configuration (edit here)
+# =========================
+SOURCE = "replay"                   # "replay", "csv" or "socket"
+WARMUP_BARS = 500                   # cached bars fed as history before the live ones
+REPLAY_RATE = 100.0                 # replay bars per second; 0 = all at once (latency includes queueing)
+POLL_SECONDS = 0.05                 # csv source: how often to look for new lines
+IDLE_TIMEOUT: Optional[float] = None  # csv source: stop after this many idle seconds
+HOST, PORT = "127.0.0.1", 9009      # socket source
+QCHECK = 0.5                        # seconds the run loop waits for a bar before polling again
+REPORT_EVERY = 0                    # print latency stats every N live bars; 0 = only at the end
+# =========================
+
+
+def parse_line(line: str, daily: bool) -> Optional[tuple]:
+    """(datetime, open, high, low, close, volume) of one data/ CSV line; None for a header."""
+    fields = line.strip().split(",")
+    if len(fields) < 5 or fields[0] == "datetime":
+        return None
+    dt = _dt.datetime.fromisoformat(fields[0])
+    num = date2num(dt)
+    if daily:  # stamp daily bars at the end of the session, as GenericCSVData does
+        num = max(num, date2num(_dt.datetime.combine(dt.date(), SESSION_END)))
+    volume = float(fields[5]) if len(fields) > 5 and fields[5] else 0.0
+    return (num, *map(float, fields[1:5]), volume)
+
+
+class LiveBars(bt.feed.DataBase):
+    """Feed of bars pushed from another thread; live to cerebro (no preload, next mode).
+
+    `arrival_ns` / `dequeued_ns` are the perf_counter_ns stamps of the current
+    bar (0 for history bars). A higher-timeframe bar queued with a bar is
+    handed to the `higher` feed when this one takes the bar, so cerebro always
+    sees both in the same cycle.
+    """
+    params = (
+        ("qcheck", QCHECK),
+    )
+
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.higher: Optional[LiveBars] = None
+        self.arrival_ns = self.dequeued_ns = 0
+        self._live = self._done = False
+
+    def islive(self):
+        return True
+
+    def haslivedata(self):
+        return not self.queue.empty()
+
+    def put(self, bar: tuple, arrival_ns: int = 0, higher_bar: Optional[tuple] = None) -> None:
+        self.queue.put((bar, arrival_ns, higher_bar))
+
+    def finish(self) -> None:
+        """No more bars: the run ends once the queued ones are processed."""
+        self.queue.put(None)
+
+    def _load(self):
+        if self._done:
+            return False  # cerebro keeps asking while other feeds are still running
+        try:
+            item = self.queue.get(timeout=self._qcheck)
+        except queue.Empty:
+            return None  # nothing yet; cerebro polls again
+        if item is None:
+            self._done = True
+            if self.higher is not None:
+                self.higher.finish()
+            return False
+
+        bar, self.arrival_ns, higher_bar = item
+        self.dequeued_ns = time.perf_counter_ns() if self.arrival_ns else 0
+        if higher_bar is not None:
+            self.higher.put(higher_bar, self.arrival_ns)
+        if self.arrival_ns and not self._live:
+            self._live = True
+            self.put_notification(self.LIVE)
+        lines = self.lines
+        (lines.datetime[0], lines.open[0], lines.high[0],
+         lines.low[0], lines.close[0], lines.volume[0]) = bar
+        lines.openinterest[0] = 0.0
+        return True
+
+
+class BarRouter:
+    """Hands source bars to the main feed and, if it has a `higher` feed, builds its bars.
+
+    Bars not newer than the last one routed are dropped (history / live overlap).
+    """
+
+    def __init__(self, main: LiveBars, trend_seconds: int = 0, main_seconds: int = 0):
+        self.main = main
+        self.trend_seconds, self.main_seconds = trend_seconds, main_seconds
+        self.last_dt = -np.inf
+        self._pending: Optional[list] = None   # trend bar being built
+        self._period = None
+
+    def _trend_period(self, dt: float) -> int:
+        return int(round(dt * 86400)) // self.trend_seconds
+
+    def push(self, bar: tuple, arrival_ns: int = 0) -> None:
+        dt = bar[0]
+        if dt <= self.last_dt:
+            return
+        self.last_dt = dt
+        done = None
+        if self.main.higher is not None:
+            period = self._trend_period(dt)
+            if self._pending is not None and period != self._period:
+                # the previous period was closed by a gap: deliver it with this bar
+                done = (dt, *self._pending[1:])
+                self._pending = None
+            o, h, l, c, v = bar[1:]
+            if self._pending is None:
+                self._pending, self._period = [dt, o, h, l, c, v], period
+            else:
+                p = self._pending
+                p[0], p[2], p[3], p[4], p[5] = dt, max(p[2], h), min(p[3], l), c, p[5] + v
+            if done is None and self._trend_period(dt + self.main_seconds / 86400) != period:
+                # the next bar starts a new period: this one completes it
+                done = tuple(self._pending)
+                self._pending = None
+        self.main.put(bar, arrival_ns, done)
+
+    def finish(self) -> None:
+        self.main.finish()
+
+
+# --- Sources (run in a thread, push into a BarRouter) ---
+
+def feed_history(router: BarRouter, bars: dict, start: int, stop: int) -> None:
+    for row in zip(*(bars[c][start:stop].tolist() for c in COLUMNS)):
+        router.push(row)
+
+
+def replay_source(router: BarRouter, bars: dict, warmup: int = WARMUP_BARS,
+                  count: Optional[int] = None, rate: float = REPLAY_RATE) -> None:
+    """First `warmup` cached bars as history, then up to `count` more as live bars."""
+    n = len(bars["datetime"])
+    stop = n if count is None else min(n, warmup + count)
+    feed_history(router, bars, 0, warmup)
+    live = list(zip(*(bars[c][warmup:stop].tolist() for c in COLUMNS)))
+    while not router.main.queue.empty():
+        time.sleep(0.001)  # let the strategy catch up on history, as a feed would log in first
+    interval = 1.0 / rate if rate > 0 else 0.0
+    due = time.perf_counter()
+    for row in live:
+        if interval:
+            due += interval
+            time.sleep(max(0.0, due - time.perf_counter()))
+        router.push(row, time.perf_counter_ns())
+    router.finish()
+
+
+def csv_source(router: BarRouter, path: str, daily: bool, poll: float = POLL_SECONDS,
+               idle_timeout: Optional[float] = IDLE_TIMEOUT, stop: Optional[threading.Event] = None) -> None:
+    """Lines already in the file are history; appended lines are live bars."""
+    with open(path) as f:
+        for line in f:
+            bar = parse_line(line, daily)
+            if bar is not None:
+                router.push(bar)
+        partial, idle = "", 0.0
+        while not (stop and stop.is_set()):
+            chunk = f.readline()
+            if not chunk:
+                if idle_timeout is not None and idle >= idle_timeout:
+                    break
+                time.sleep(poll)
+                idle += poll
+                continue
+            arrival, idle = time.perf_counter_ns(), 0.0
+            partial += chunk
+            if not partial.endswith("\n"):
+                continue  # line still being written
+            bar = parse_line(partial, daily)
+            partial = ""
+            if bar is not None:
+                router.push(bar, arrival)
+    router.finish()
+
+
+def socket_source(router: BarRouter, daily: bool, host: str = HOST, port: int = PORT) -> None:
+    """Serve one TCP client sending CSV lines; the run ends when it disconnects."""
+    with socket.create_server((host, port)) as server:
+        print(f"Waiting for bars on {host}:{port}", file=sys.stderr)
+        conn, _ = server.accept()
+        with conn, conn.makefile("r") as lines:
+            for line in lines:
+                arrival = time.perf_counter_ns()
+                bar = parse_line(line, daily)
+                if bar is not None:
+                    router.push(bar, arrival)
+    router.finish()
+
+
+# --- Paper broker and latency ---
+
+def print_order(order, latency_ns: int) -> None:
+    print(json.dumps(order_record(order, latency_ns)), flush=True)
+
+
+def order_record(order, latency_ns: int) -> dict:
+    return {
+        "bar": bt.num2date(order.data.datetime[0]).isoformat(),
+        "ref": order.ref,
+        "side": "buy" if order.isbuy() else "sell",
+        "type": order.ExecTypes[order.exectype],
+        "size": abs(order.created.size),
+        "price": order.created.price,
+        "parent": getattr(order.parent, "ref", None),
+        "latency_us": latency_ns / 1000,
+    }
+
+
+class PaperBroker(bt.brokers.BackBroker):
+    """BackBroker that timestamps and emits every order submitted on a live bar.
+
+    `emit(order, latency_ns)` is called with the time since the bar arrived
+    (default: print the order as a JSON line); orders on history bars are
+    simulated silently.
+    """
+
+    def __init__(self, emit: Optional[Callable] = print_order):
+        super().__init__()
+        self.emit = emit
+        self.order_latency = array("q")
+
+    def submit(self, order, check=True):
+        arrival = getattr(order.data, "arrival_ns", 0)
+        if arrival:
+            latency = time.perf_counter_ns() - arrival
+            self.order_latency.append(latency)
+            if self.emit is not None:
+                self.emit(order, latency)
+        return super().submit(order, check)
+
+
+def latency_stats(samples_ns) -> dict:
+    """count, mean, p50, p90, p99 and max of nanosecond samples, in microseconds."""
+    us = np.frombuffer(samples_ns, dtype=np.int64) / 1000 if len(samples_ns) else np.empty(0)
+    if not len(us):
+        return {"count": 0}
+    p50, p90, p99 = np.percentile(us, [50, 90, 99])
+    return {"count": len(us), "mean": float(us.mean()), "p50": float(p50), "p90": float(p90),
+            "p99": float(p99), "max": float(us.max())}
+
+
+class LatencyTracker(bt.Analyzer):
+    """Per live bar: arrival -> end of processing, and queue -> end of processing.
+
+    Add it last: analyzers run after the strategy's next(), in the order added.
+    """
+    params = (
+        ("every", REPORT_EVERY),
+    )
+
+    def start(self):
+        self.bar = array("q")
+        self.processing = array("q")
+
+    def next(self):
+        data = self.strategy.datas[0]
+        if not data.arrival_ns:
+            return
+        now = time.perf_counter_ns()
+        self.bar.append(now - data.arrival_ns)
+        self.processing.append(now - data.dequeued_ns)
+        if self.p.every and len(self.bar) % self.p.every == 0:
+            print_latency(self.get_analysis(), file=sys.stderr)
+
+    def get_analysis(self):
+        broker = self.strategy.broker
+        return {
+            "bar": latency_stats(self.bar),
+            "processing": latency_stats(self.processing),
+            "order": latency_stats(getattr(broker, "order_latency", array("q"))),
+        }
+
+
+def print_latency(stats: dict, file=None) -> None:
+    for name, s in stats.items():
+        if not s["count"]:
+            print(f"{name:<11} no samples", file=file)
+            continue
+        print(f"{name:<11} n={s['count']:<7} mean {s['mean']:9.1f}us  p50 {s['p50']:9.1f}us  "
+              f"p90 {s['p90']:9.1f}us  p99 {s['p99']:9.1f}us  max {s['max']:9.1f}us", file=file)
+
+
+# --- Session ---
+
+def run_live(strategy_cls, pair: str, tf: str, source: str = SOURCE,
+             trend_tf: Optional[str] = None, params: Optional[dict] = None,
+             warmup: int = WARMUP_BARS, emit: Optional[Callable] = print_order,
+             every: int = REPORT_EVERY, **source_kwargs):
+    """Run a strategy on live bars from `source` until it ends. Returns (cerebro, strategy).
+
+    `source_kwargs` go to the source: count / rate (replay), path / poll /
+    idle_timeout (csv), host / port (socket).
+    """
+    from run_backtest import (TF_MAP, check_trend_tf, load_bars, run_strategy, tf_seconds,
+                              trend_feed_use)
+
+    if not trend_tf and trend_feed_use(strategy_cls, params) == "required":
+        raise ValueError(f"{strategy_cls.__name__} reads datas[1]: it needs a trend_tf")
+    timeframe, compression, _, _ = TF_MAP[tf]
+    daily = timeframe >= bt.TimeFrame.Days
+    main = LiveBars(timeframe=timeframe, compression=compression)
+    feeds = [main]
+    if trend_tf:
+        check_trend_tf(tf, trend_tf)
+        # filled by the main feed as it takes each bar: never worth waiting for
+        main.higher = LiveBars(timeframe=TF_MAP[trend_tf][0], compression=TF_MAP[trend_tf][1],
+                               qcheck=0.0)
+        feeds.append(main.higher)
+    router = BarRouter(main, tf_seconds(trend_tf) if trend_tf else 0, tf_seconds(tf))
+
+    bars = load_bars(pair, tf)
+    n = len(bars["datetime"])
+    if source == "replay":
+        target, args = replay_source, (router, bars, warmup)
+    elif source == "csv":
+        target, args = csv_source, (router, source_kwargs.pop("path"), daily)
+    elif source == "socket":
+        target, args = socket_source, (router, daily)
+    else:
+        raise ValueError(f"Unknown source '{source}' (replay, csv or socket)")
+    if source != "replay":
+        feed_history(router, bars, max(0, n - warmup), n)  # the latest cached bars
+    threading.Thread(target=target, args=args, kwargs=source_kwargs, daemon=True).start()
+
+    return run_strategy(strategy_cls, feeds, params, broker=PaperBroker(emit),
+                        analyzers={"latency": functools.partial(LatencyTracker, every=every)})
+
+
+def main(argv=None) -> None:
+    import run_backtest as rb
+
+    parser = argparse.ArgumentParser(description="Paper-trade a strategy on incrementally arriving bars")
+    parser.add_argument("--source", default=SOURCE, choices=["replay", "csv", "socket"])
+    parser.add_argument("--strategy", default=rb.STRATEGY)
+    parser.add_argument("--pair", default=rb.PAIR)
+    parser.add_argument("--tf", default=rb.MAIN_TF, choices=list(rb.TF_MAP))
+    parser.add_argument("--trend-tf", default=None, choices=list(rb.TF_MAP))
+    parser.add_argument("--param", action="append", default=[], metavar="NAME=VALUE")
+    parser.add_argument("--warmup", type=int, default=WARMUP_BARS, help="history bars fed first")
+    parser.add_argument("--bars", type=int, default=None, help="replay: live bars to play")
+    parser.add_argument("--rate", type=float, default=REPLAY_RATE, help="replay: bars per second")
+    parser.add_argument("--path", help="csv: file to follow")
+    parser.add_argument("--idle-timeout", type=float, default=IDLE_TIMEOUT)
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--orders", metavar="FILE", help="append emitted orders here (JSON lines); "
+                                                         "default stdout")
+    parser.add_argument("--every", type=int, default=REPORT_EVERY,
+                        help="print latency stats every N live bars")
+    args = parser.parse_args(argv)
+
+    if args.source == "csv" and not args.path:
+        parser.error("--source csv needs --path")
+    try:
+        strategy_cls = rb.get_strategy(args.strategy)
+        params = rb.parse_assignments(args.param)
+        if args.trend_tf:
+            rb.check_trend_tf(args.tf, args.trend_tf)
+        elif rb.trend_feed_use(strategy_cls, params) == "required":
+            raise ValueError(f"{args.strategy} reads datas[1]: it needs --trend-tf")
+    except ValueError as e:
+        parser.error(str(e))
+    source_kwargs = {
+        "replay": {"count": args.bars, "rate": args.rate},
+        "csv": {"path": args.path, "idle_timeout": args.idle_timeout},
+        "socket": {"host": args.host, "port": args.port},
+    }[args.source]
+
+    out = open(args.orders, "a") if args.orders else sys.stdout
+
+    def emit(order, latency_ns):
+        out.write(json.dumps(order_record(order, latency_ns)) + "\n")
+        out.flush()
+
+    try:
+        cerebro, strat = run_live(strategy_cls, args.pair, args.tf, args.source, args.trend_tf,
+                                  params, args.warmup, emit, args.every, **source_kwargs)
+    except KeyboardInterrupt:
+        return
+    finally:
+        if args.orders:
+            out.close()
+
+    print(f"\nFinal value {cerebro.broker.getvalue():.2f}", file=sys.stderr)
+    print_latency(strat.analyzers.latency.get_analysis(), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""Monte Carlo robustness of a run's closed-trade sequence.
+
+Each closed trade becomes a return on the equity it was opened with, and the
+sequence is resampled many times: "bootstrap" draws trades with replacement
+(final equity varies), "shuffle" permutes them (final equity is fixed, the path
+is not). All simulations of a batch are one (sims x trades) NumPy array:
+compounding, running peaks, drawdowns and underwater stretches are computed
+along the rows, with no Python loop per simulation or per trade. Batches are
+sized to keep each array around BATCH_ELEMENTS values.
+
+Per simulation: final equity, max drawdown and time to recovery (the longest
+stretch below a previous peak, in trades and, using the run's average trade
+spacing, in days). summarize() gives their percentiles, the probability of a
+loss, and percentile bands of the equity path by trade number.
+
+Usage:
+    python -m tools.monte_carlo --strategy SMAPriceActionStrategy --pair EURUSD --tf 1h
+    python -m tools.monte_carlo --strategy RsiMacdTrendStrategy --tf 1h --trend-tf 4h
+    python -m tools.monte_carlo --key 42f4c1b0 --sims 50000   # trades from tools.result_store
+"""
+import argparse
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+
+# =========================
+# Configuration (edit here)
+# =========================
+SIMS = 20_000
+METHOD = "bootstrap"                # "bootstrap" (with replacement) or "shuffle"
+PERCENTILES = (5, 25, 50, 75, 95)
+BATCH_ELEMENTS = 4_000_000          # values per (sims x trades) batch array
+SEED = 0
+# =========================
+
+
+def trade_returns(trades: Sequence[tuple], cash: float) -> np.ndarray:
+    """Return of each closed trade on the equity at its open, in closing order.
+
+    `trades` are TradeList rows (dtopen, dtclose, size, price, pnl, pnlcomm,
+    barlen); the equity at an open is the cash plus the P&L of the trades that
+    closed before it.
+    """
+    if not len(trades):
+        return np.empty(0)
+    rows = np.asarray([t[:6] for t in trades], dtype=np.float64)
+    rows = rows[np.argsort(rows[:, 1], kind="stable")]
+    dtopen, dtclose, pnl = rows[:, 0], rows[:, 1], rows[:, 5]
+    booked = np.concatenate(([0.0], np.cumsum(pnl)))
+    equity_at_open = cash + booked[np.searchsorted(dtclose, dtopen, side="right")]
+    return pnl / equity_at_open
+
+
+def _paths(returns: np.ndarray, rows: int, method: str, rng: np.random.Generator) -> np.ndarray:
+    """(rows x trades + 1) equity multiples, starting at 1."""
+    n = len(returns)
+    if method == "bootstrap":
+        sampled = returns[rng.integers(0, n, size=(rows, n))]
+    elif method == "shuffle":
+        sampled = rng.permuted(np.broadcast_to(returns, (rows, n)), axis=1)
+    else:
+        raise ValueError(f"Unknown method '{method}' (bootstrap or shuffle)")
+    paths = np.empty((rows, n + 1))
+    paths[:, 0] = 1.0
+    np.cumprod(1.0 + sampled, axis=1, out=paths[:, 1:])
+    return paths
+
+
+def path_stats(paths: np.ndarray) -> tuple:
+    """Final value, max drawdown and longest underwater stretch (in steps) of each row."""
+    steps = np.arange(paths.shape[1])
+    peaks = np.maximum.accumulate(paths, axis=1)
+    max_dd = (paths / peaks - 1.0).min(axis=1)
+    # steps since the last new peak; its maximum is the longest stretch underwater
+    last_peak = np.maximum.accumulate(np.where(paths >= peaks, steps, 0), axis=1)
+    return paths[:, -1], max_dd, (steps - last_peak).max(axis=1)
+
+
+def simulate(returns: np.ndarray, sims: int = SIMS, method: str = METHOD, seed: int = SEED,
+             batch_elements: int = BATCH_ELEMENTS, band_percentiles=PERCENTILES) -> Dict[str, np.ndarray]:
+    """Simulated final equity multiple, max drawdown and longest underwater stretch
+    (in trades) per simulation, plus equity bands by trade number (from the first batch)."""
+    n = len(returns)
+    final, max_dd, underwater = np.empty(sims), np.empty(sims), np.empty(sims, dtype=np.int64)
+    bands = np.ones((len(band_percentiles), n + 1))
+    if n == 0:
+        final.fill(1.0), max_dd.fill(0.0), underwater.fill(0)
+        return {"final": final, "max_dd": max_dd, "underwater": underwater, "bands": bands}
+
+    rng = np.random.default_rng(seed)
+    rows = max(1, min(sims, batch_elements // (n + 1)))
+    for lo in range(0, sims, rows):
+        hi = min(lo + rows, sims)
+        paths = _paths(returns, hi - lo, method, rng)
+        final[lo:hi], max_dd[lo:hi], underwater[lo:hi] = path_stats(paths)
+        if lo == 0:
+            bands = np.percentile(paths, band_percentiles, axis=0)
+    return {"final": final, "max_dd": max_dd, "underwater": underwater, "bands": bands}
+
+
+def summarize(sim: Dict[str, np.ndarray], cash: float, days_per_trade: Optional[float] = None,
+              percentiles=PERCENTILES) -> dict:
+    """Percentiles of final equity, max drawdown and time to recovery; probability of a loss."""
+    out = {
+        "sims": len(sim["final"]),
+        "p_loss": float(np.mean(sim["final"] < 1.0)),
+        "final_equity": dict(zip(percentiles, np.percentile(cash * sim["final"], percentiles))),
+        "max_dd": dict(zip(percentiles, np.percentile(sim["max_dd"], percentiles))),
+        "recovery_trades": dict(zip(percentiles, np.percentile(sim["underwater"], percentiles))),
+    }
+    if days_per_trade:
+        out["recovery_days"] = {p: v * days_per_trade for p, v in out["recovery_trades"].items()}
+    return out
+
+
+def days_per_trade(trades: Sequence[tuple]) -> Optional[float]:
+    """Average calendar days between trade closes (None for fewer than two trades)."""
+    if len(trades) < 2:
+        return None
+    closes = sorted(t[1] for t in trades)
+    return (closes[-1] - closes[0]) / (len(closes) - 1)
+
+
+def sweep_columns(trades: Sequence[tuple], cash: float, sims: int, seed: int = SEED) -> dict:
+    """Robustness columns for one sweep row: 5% worst final equity and max drawdown,
+    95th percentile of the recovery in trades, probability of a loss."""
+    sim = simulate(trade_returns(trades, cash), sims, "bootstrap", seed, band_percentiles=())
+    return {
+        "mc_final_p5": float(cash * np.percentile(sim["final"], 5)),
+        "mc_max_dd_p5": float(np.percentile(sim["max_dd"], 5)),
+        "mc_recovery_p95": float(np.percentile(sim["underwater"], 95)),
+        "mc_p_loss": float(np.mean(sim["final"] < 1.0)),
+    }
+
+
+def print_summary(summary: dict, historical: Optional[dict] = None) -> None:
+    cols = "  ".join(f"{f'p{p}':>10}" for p in summary["final_equity"])
+    print(f"{summary['sims']:,} simulations, P(loss) {summary['p_loss']:.1%}")
+    print(f"{'':<18}{cols}" + ("  historical" if historical else ""))
+    rows = [("final equity", "final_equity", "{:10.2f}"), ("max drawdown", "max_dd", "{:10.2%}"),
+            ("recovery (trades)", "recovery_trades", "{:10.0f}")]
+    if "recovery_days" in summary:
+        rows.append(("recovery (days)", "recovery_days", "{:10.1f}"))
+    for label, key, fmt in rows:
+        values = "  ".join(fmt.format(v) for v in summary[key].values())
+        hist = f"  {fmt.format(historical[key])}" if historical and key in historical else ""
+        print(f"{label:<18}{values}{hist}")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Monte Carlo of a run's closed trades")
+    parser.add_argument("--key", help="stored run (tools.result_store key or prefix)")
+    parser.add_argument("--strategy", default=None, help="run this strategy instead (class name)")
+    parser.add_argument("--pair", default=None)
+    parser.add_argument("--tf", default=None)
+    parser.add_argument("--trend-tf", default=None, help="trend feed (data[1]), derived from --tf's bars")
+    parser.add_argument("--param", action="append", default=[], metavar="NAME=VALUE")
+    parser.add_argument("--sims", type=int, default=SIMS)
+    parser.add_argument("--method", default=METHOD, choices=["bootstrap", "shuffle"])
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--output", help="write per-trade equity bands to this CSV")
+    args = parser.parse_args(argv)
+
+    import json
+    import time
+    import run_backtest as rb
+
+    if args.key:
+        from tools.result_store import ResultStore
+        store = ResultStore()
+        key = store.resolve(args.key)
+        if key is None:
+            parser.error(f"No single stored run with key '{args.key}'")
+        cash = json.loads(store.get(key)["config"])["cash"]
+        trades = [(t["dtopen"], t["dtclose"], t["size"], t["price"], t["pnl"], t["pnlcomm"],
+                   t["barlen"]) for t in store.trades(key)]
+    else:
+        from tools.result_store import TradeList
+        strategy_cls = rb.get_strategy(args.strategy or rb.STRATEGY)
+        pair, tf = args.pair or rb.PAIR, args.tf or rb.MAIN_TF
+        params = rb.parse_assignments(args.param)
+        try:
+            if args.trend_tf not in (None, *rb.TF_MAP):
+                raise ValueError(f"Unknown timeframe '{args.trend_tf}'")
+            if args.trend_tf:
+                rb.check_trend_tf(tf, args.trend_tf)
+            elif rb.trend_feed_use(strategy_cls, params) == "required":
+                raise ValueError(f"{strategy_cls.__name__} reads datas[1]: it needs --trend-tf")
+        except ValueError as e:
+            parser.error(str(e))
+        feeds = [rb.make_feed(pair, tf)]
+        if args.trend_tf:
+            feeds.append(rb.bars_feed(rb.load_trend_bars(pair, tf, args.trend_tf), args.trend_tf))
+        cash = rb.CASH_START
+        _, strat = rb.run_strategy(strategy_cls, feeds, params, analyzers={"trade_list": TradeList})
+        trades = strat.analyzers.trade_list.get_analysis()
+
+    returns = trade_returns(trades, cash)
+    t0 = time.perf_counter()
+    sim = simulate(returns, args.sims, args.method, args.seed)
+    elapsed = time.perf_counter() - t0
+
+    # the historical sequence, for comparison
+    final, max_dd, underwater = path_stats(np.concatenate(([1.0], np.cumprod(1.0 + returns)))[None])
+    historical = {"final_equity": cash * final[0], "max_dd": max_dd[0],
+                  "recovery_trades": underwater[0]}
+    spacing = days_per_trade(trades)
+    if spacing:
+        historical["recovery_days"] = underwater[0] * spacing
+
+    print(f"{len(returns)} closed trades, {args.method}, {elapsed:.2f}s")
+    print_summary(summarize(sim, cash, spacing), historical)
+
+    if args.output:
+        import pandas as pd
+        bands = pd.DataFrame(cash * sim["bands"].T, columns=[f"p{p}" for p in PERCENTILES])
+        bands.index.name = "trade"
+        bands.to_csv(args.output)
+        print(f"Equity bands saved to '{args.output}'")
+
+
+if __name__ == "__main__":
+    main()
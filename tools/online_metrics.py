@@ -0,0 +1,120 @@
+import math
+
+import backtrader as bt
+
+
+class OnlineMetrics(bt.Analyzer):
+    """Running performance metrics, updated in O(1) per bar without storing the curve.
+
+    Tracks the equity peak and bar-level max drawdown, end-of-day equity and
+    daily returns (Welford mean/variance and downside deviation for
+    Sharpe/Sortino), the max drawdown of the daily curve and exposure (share of
+    bars with an open position). ``get_analysis()`` can be read at any time
+    during the run; daily figures cover the days completed so far.
+
+    Daily figures follow run_backtest's pandas definitions: returns between
+    consecutive end-of-day values, daily drawdown measured on the compounded
+    returns (so the first day's close is the base, not a peak), annualized
+    with ``periods`` and a zero risk-free rate like QuantStats. Bars before
+    ``start`` (a Backtrader float date) are left out, as warm-up.
+    """
+    params = (
+        ("periods", 252),
+        ("start", None),
+    )
+
+    def start(self):
+        self.start_value = self.strategy.broker.getvalue()
+        self.value = self.peak = self.start_value
+        self.drawdown = self.max_drawdown = 0.0
+        self.bars = self.bars_in_market = 0
+
+        self._day = None
+        self._day_value = None   # last value seen on the current day
+        self._prev_eod = None    # close of the previous completed day
+        self._eod_peak = None
+        self.max_daily_dd = 0.0
+        self.days = 0            # number of daily returns
+        self._mean = self._m2 = self._downside_sq = 0.0
+
+    def next(self):
+        if self.p.start is not None and self.strategy.datas[0].datetime[0] < self.p.start:
+            return
+        value = self.strategy.broker.getvalue()
+        self.value = value
+        self.bars += 1
+        if self.strategy.getposition(self.strategy.datas[0]).size:
+            self.bars_in_market += 1
+
+        if value > self.peak:
+            self.peak = value
+        self.drawdown = value / self.peak - 1.0 if self.peak else 0.0
+        if self.drawdown < self.max_drawdown:
+            self.max_drawdown = self.drawdown
+
+        day = int(self.strategy.datas[0].datetime[0])
+        if day != self._day:
+            if self._day is not None:
+                self._close_day(self._day_value)
+            self._day = day
+        self._day_value = value
+
+    def stop(self):
+        if self._day is not None:
+            self._close_day(self._day_value)
+            self._day = None
+
+    def _close_day(self, eod: float) -> None:
+        if self._prev_eod is None:
+            self._prev_eod = eod
+            return
+
+        ret = eod / self._prev_eod - 1.0
+        self._prev_eod = eod
+
+        # Welford update of mean/variance, plus downside for Sortino
+        self.days += 1
+        delta = ret - self._mean
+        self._mean += delta / self.days
+        self._m2 += delta * (ret - self._mean)
+        if ret < 0:
+            self._downside_sq += ret * ret
+
+        if self._eod_peak is None or eod > self._eod_peak:
+            self._eod_peak = eod
+        dd = eod / self._eod_peak - 1.0
+        if dd < self.max_daily_dd:
+            self.max_daily_dd = dd
+
+    @property
+    def sharpe(self) -> float:
+        if self.days < 2:
+            return 0.0
+        std = math.sqrt(self._m2 / (self.days - 1))
+        return self._mean / std * math.sqrt(self.p.periods) if std else 0.0
+
+    @property
+    def sortino(self) -> float:
+        if not self.days:
+            return 0.0
+        downside = math.sqrt(self._downside_sq / self.days)
+        return self._mean / downside * math.sqrt(self.p.periods) if downside else 0.0
+
+    @property
+    def exposure(self) -> float:
+        return self.bars_in_market / self.bars if self.bars else 0.0
+
+    def get_analysis(self):
+        return {
+            "value": self.value,
+            "roi": (self.value - self.start_value) / self.start_value * 100,
+            "peak": self.peak,
+            "drawdown": self.drawdown,
+            "max_drawdown": self.max_drawdown,
+            "max_daily_dd": self.max_daily_dd,
+            "days": self.days,
+            "sharpe": self.sharpe,
+            "sortino": self.sortino,
+            "exposure": self.exposure,
+            "bars": self.bars,
+        }
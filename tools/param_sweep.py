@@ -0,0 +1,129 @@
+"""Parallel parameter sweeps: strategy params x pairs x timeframes on a process pool.
+
+Each worker keeps the bar arrays it has loaded, so a pair/timeframe is read once
+per process and reused for every parameter combination the worker runs. With
+MONTE_CARLO_SIMS set, every row also gets bootstrap robustness columns (mc_*)
+from the run's closed trades.
+
+Usage: edit the configuration block and run `python -m tools.param_sweep`.
+"""
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from strategies.hft_mean_reversion_strategy import HFTMeanReversionStrategy
+from tools.bar_cache import loaded_bars, loaded_trend_bars
+
+
+# =========================
+# Configuration (edit here)
+# =========================
+STRATEGY = HFTMeanReversionStrategy
+PARAM_GRID = {
+    "lookback": [10, 20, 40],
+    "z_thresh": [0.5, 1.0, 1.5],
+    "exit_bars": [3, 5, 10],
+}
+PAIRS = ["EURUSD", "EURGBP", "EURJPY", "USDCAD"]
+TIMEFRAMES = ["1h"]
+TREND_TF: Optional[str] = None      # e.g. "4h" for strategies that read datas[1]
+STOP_RULES: Optional[dict] = None   # EarlyStop rules, e.g. dict(max_drawdown=0.1)
+PROCESSES: Optional[int] = None     # None = all cores
+CACHE_INDICATORS = True             # share indicator lines across runs (tools.indicator_cache)
+MONTE_CARLO_SIMS: Optional[int] = 2_000  # bootstrap the closed trades of each run (tools.monte_carlo); None = off
+OUTPUT_CSV = "reports/sweep_results.csv"
+# =========================
+
+
+def expand_grid(grid: Dict[str, Iterable]) -> List[dict]:
+    """Cartesian product of a {param: values} grid as a list of param dicts."""
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def _run_chunk(strategy_cls, pair: str, tf: str, trend_tf: Optional[str],
+               combos: List[dict], stop_rules: Optional[dict]) -> List[dict]:
+    """Worker: run every param combination of one chunk on one pair/timeframe."""
+    from run_backtest import CASH_START, bars_feed, run_strategy, summary_metrics
+    from tools.monte_carlo import sweep_columns
+    from tools.result_store import TradeList
+
+    analyzers = {"trade_list": TradeList} if MONTE_CARLO_SIMS else None
+    rows = []
+    for params in combos:
+        feeds = [bars_feed(loaded_bars(pair, tf), tf)]
+        if trend_tf:
+            feeds.append(bars_feed(loaded_trend_bars(pair, tf, trend_tf), trend_tf))
+        cerebro, strat = run_strategy(strategy_cls, feeds, params, analyzers=analyzers,
+                                      stop_rules=stop_rules, cache_indicators=CACHE_INDICATORS)
+        row = {
+            "strategy": strategy_cls.__name__,
+            "pair": pair,
+            "tf": tf,
+            **params,
+            **summary_metrics(cerebro, strat),
+        }
+        if MONTE_CARLO_SIMS:
+            row.update(sweep_columns(strat.analyzers.trade_list.get_analysis(), CASH_START,
+                                     MONTE_CARLO_SIMS))
+        rows.append(row)
+    return rows
+
+
+def _chunks(items: List[dict], size: int) -> List[List[dict]]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def run_sweep(strategy_cls, param_grid: Dict[str, Iterable], pairs: List[str],
+              timeframes: List[str], trend_tf: Optional[str] = None,
+              processes: Optional[int] = None,
+              stop_rules: Optional[dict] = None) -> pd.DataFrame:
+    """Fan all (pair, tf, params) runs across a process pool; one row per run.
+
+    With `stop_rules` hopeless runs are cut short by EarlyStop; their row
+    carries the `stop_reason`.
+    """
+    from run_backtest import load_bars
+
+    # Build any missing cache entries up front so workers only ever map them
+    for pair in pairs:
+        for tf in timeframes + ([trend_tf] if trend_tf else []):
+            load_bars(pair, tf)
+
+    combos = expand_grid(param_grid)
+    workers = processes or os.cpu_count() or 1
+
+    # Group combinations by dataset so a chunk never needs more than one load;
+    # a few chunks per worker keeps the pool busy until the end.
+    n_sets = len(pairs) * len(timeframes)
+    size = max(1, len(combos) * n_sets // (workers * 4))
+
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_run_chunk, strategy_cls, pair, tf, trend_tf, chunk, stop_rules)
+            for pair in pairs
+            for tf in timeframes
+            for chunk in _chunks(combos, size)
+        ]
+        for future in as_completed(futures):
+            rows.extend(future.result())
+
+    results = pd.DataFrame(rows)
+    if not results.empty:
+        results = results.sort_values("sharpe", ascending=False, ignore_index=True)
+    return results
+
+
+if __name__ == "__main__":
+    total = len(expand_grid(PARAM_GRID)) * len(PAIRS) * len(TIMEFRAMES)
+    print(f"Sweeping {STRATEGY.__name__}: {total} runs")
+    table = run_sweep(STRATEGY, PARAM_GRID, PAIRS, TIMEFRAMES, TREND_TF, PROCESSES, STOP_RULES)
+
+    os.makedirs(os.path.dirname(OUTPUT_CSV), exist_ok=True)
+    table.to_csv(OUTPUT_CSV, index=False)
+    print(table.head(20).to_string())
+    print(f"\nSweep results saved to '{OUTPUT_CSV}'")
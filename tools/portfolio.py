@@ -0,0 +1,254 @@
+"""Multi-pair portfolio backtest: one Cerebro run, one shared broker.
+
+All pairs are added as feeds of a single Cerebro (Backtrader aligns them by
+timestamp) and the strategy is instantiated once per pair, each instance bound
+to its own pair's feeds, so every indicator is warmed up once and a full
+universe takes a single pass over the aligned bars. An instance's next() only
+runs on cycles where its own pair got a new bar. All instances trade against
+the same cash and margin; the combined portfolio value is recorded by the
+first instance's EquityTracker.
+
+Cash is held in ACCOUNT_CURRENCY. Each pair's P&L accrues bar by bar in its
+quote currency and is converted at the latest quote -> account rate, taken
+from the pairs in data/ (directly, inverted or through a common base, never
+from a later bar). A position reserves a fixed margin per unit: MARGIN times
+the pair's first price in account currency. A universe whose quote currencies
+cannot all be converted is refused.
+
+Usage:
+    python -m tools.portfolio
+    python -m tools.portfolio --strategy RsiMacdStrategy --pairs EURUSD EURGBP --tf 1h
+"""
+import argparse
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import backtrader as bt
+
+from tools.equity_tracker import EquityTracker
+from tools.online_metrics import OnlineMetrics
+from tools.strategy_registry import get_strategy
+
+
+# =========================
+# Configuration (edit here)
+# =========================
+STRATEGY = "RsiMacdStrategy"
+PAIRS = ["EURUSD", "EURGBP", "EURJPY", "USDCAD"]
+TF = "1h"
+TREND_TF: Optional[str] = None      # e.g. "4h" for strategies that read datas[1]
+PARAMS: dict = {}
+ACCOUNT_CURRENCY = "USD"
+MARGIN = 1.0                        # margin per unit as a fraction of the pair's first price
+# =========================
+
+
+# --- Currency conversion ---
+
+def _available_pairs(tf: str) -> List[str]:
+    from run_backtest import DATA_PATH, TF_MAP
+
+    suffix = TF_MAP[tf][3]
+    return [name[:-len(suffix)] for name in os.listdir(DATA_PATH) if name.endswith(suffix)]
+
+
+def _asof(dt: np.ndarray, values: np.ndarray, at: np.ndarray) -> np.ndarray:
+    """values at the last dt <= each of `at` (the first value before it starts)."""
+    return np.asarray(values)[np.maximum(np.searchsorted(dt, at, side="right") - 1, 0)]
+
+
+def conversion_rate(quote: str, account: str, tf: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """(datetimes, rates) turning `quote` amounts into `account` ones, None when they are
+    the same currency. Raises ValueError when no pair(s) in data/ give the rate."""
+    from run_backtest import load_bars
+
+    if quote == account:
+        return None
+    pairs = _available_pairs(tf)
+    if quote + account in pairs:
+        bars = load_bars(quote + account, tf)
+        return np.asarray(bars["datetime"]), np.asarray(bars["close"])
+    if account + quote in pairs:
+        bars = load_bars(account + quote, tf)
+        return np.asarray(bars["datetime"]), 1.0 / np.asarray(bars["close"])
+    for base in sorted({p[:3] for p in pairs}):
+        if base + quote in pairs and base + account in pairs:
+            in_quote, in_account = load_bars(base + quote, tf), load_bars(base + account, tf)
+            dt = np.asarray(in_quote["datetime"])
+            to_account = _asof(np.asarray(in_account["datetime"]), in_account["close"], dt)
+            return dt, to_account / np.asarray(in_quote["close"])
+    raise ValueError(f"No {quote} -> {account} rate from the {tf} pairs in data/; "
+                     f"pick another ACCOUNT_CURRENCY or universe")
+
+
+class ConvertedComm(bt.CommInfoBase):
+    """Margin-style commission info whose P&L is converted into the account currency.
+
+    Cash adjustments and P&L are in the quote currency times the rate at the
+    feed's current bar; `margin` is already in the account currency.
+    """
+    params = (
+        ("stocklike", False),
+        ("commtype", bt.CommInfoBase.COMM_FIXED),
+        ("data", None),
+        ("rates", None),     # (datetimes, rates) from conversion_rate, None = same currency
+    )
+
+    def rate(self) -> float:
+        if self.p.rates is None:
+            return 1.0
+        dt, rates = self.p.rates
+        i = int(np.searchsorted(dt, self.p.data.datetime[0], side="right")) - 1
+        return float(rates[max(i, 0)])
+
+    def profitandloss(self, size, price, newprice):
+        return size * (newprice - price) * self.rate()
+
+    def cashadjust(self, size, price, newprice):
+        return size * (newprice - price) * self.rate()
+
+
+def account_comminfo(pair: str, data, bars: Dict[str, np.ndarray], tf: str,
+                     account: str = ACCOUNT_CURRENCY, margin: float = MARGIN) -> ConvertedComm:
+    rates = conversion_rate(pair[3:], account, tf)
+    first = 1.0 if rates is None else float(_asof(*rates, bars["datetime"][:1])[0])
+    return ConvertedComm(data=data, rates=rates, margin=margin * float(bars["close"][0]) * first)
+
+
+def _bind_feeds(strat: bt.Strategy, datas: list) -> None:
+    """Point a strategy's data attributes (datas, data, data0, data_close, ...) at `datas`.
+
+    Mirrors the aliases Backtrader sets up before __init__, so the strategy code
+    and the indicators it creates without explicit data only see its own pair.
+    """
+    strat.datas = datas
+    strat.ddatas = {d: None for d in datas}
+    strat.dnames = bt.utils.DotDict([(d._name, d) for d in datas if d._name])
+    strat._clock = strat.data = datas[0]
+    for l, line in enumerate(datas[0].lines):
+        alias = datas[0]._getlinealias(l)
+        if alias:
+            setattr(strat, f"data_{alias}", line)
+        setattr(strat, f"data_{l}", line)
+    for d, data in enumerate(datas):
+        setattr(strat, f"data{d}", data)
+        for l, line in enumerate(data.lines):
+            alias = data._getlinealias(l)
+            if alias:
+                setattr(strat, f"data{d}_{alias}", line)
+            setattr(strat, f"data{d}_{l}", line)
+
+
+def on_feeds(strategy_cls, first: int, count: int):
+    """Subclass of `strategy_cls` that trades cerebro feeds [first, first + count) only
+    and whose next() skips cycles in which its own main feed got no new bar."""
+    def __init__(self, *args, **kwargs):
+        _bind_feeds(self, self.datas[first:first + count])
+        self._seen = 0
+        strategy_cls.__init__(self, *args, **kwargs)
+
+    def next(self):
+        if len(self.data) == self._seen:
+            return
+        self._seen = len(self.data)
+        strategy_cls.next(self)
+
+    return type(strategy_cls.__name__, (strategy_cls,), {"__init__": __init__, "next": next})
+
+
+def run_portfolio(strategy_cls, pairs: List[str], tf: str, trend_tf: Optional[str] = None,
+                  params: Optional[dict] = None, cash: Optional[float] = None,
+                  stake: Optional[int] = None, account: str = ACCOUNT_CURRENCY):
+    """Run `strategy_cls` on every pair in one pass. Returns (cerebro, strategies).
+
+    strategies[i] trades pairs[i]; strategies[0].analyzers.equity holds the
+    combined portfolio equity (in `account` currency), each instance's
+    "metrics" its own exposure.
+    """
+    from run_backtest import (CASH_START, EQUITY_BUCKET, ORDER_SIZE, bars_feed, load_bars,
+                              load_trend_bars)
+
+    cash = CASH_START if cash is None else cash
+    stake = ORDER_SIZE if stake is None else stake
+    per_pair = 2 if trend_tf else 1
+
+    # no standard observers: their per-data lines assume one strategy for all feeds
+    cerebro = bt.Cerebro(stdstats=False)
+    for i, pair in enumerate(pairs):
+        bars = load_bars(pair, tf)
+        data = bars_feed(bars, tf)
+        cerebro.adddata(data, name=pair)
+        cerebro.broker.addcommissioninfo(account_comminfo(pair, data, bars, tf, account), name=pair)
+        if trend_tf:
+            trend = load_trend_bars(pair, tf, trend_tf)
+            cerebro.adddata(bars_feed(trend, trend_tf), name=f"{pair}_{trend_tf}")
+        cerebro.addstrategy(on_feeds(strategy_cls, i * per_pair, per_pair), **(params or {}))
+
+    cerebro.addanalyzer(EquityTracker, _name="equity", bucket=EQUITY_BUCKET)
+    cerebro.addanalyzer(OnlineMetrics, _name="metrics")
+    cerebro.addanalyzer(bt.analyzers.TradeAnalyzer, _name="trades")
+    cerebro.broker.setcash(cash)
+    cerebro.addsizer(bt.sizers.FixedSize, stake=stake)
+    return cerebro, cerebro.run()
+
+
+def pair_summary(pairs: List[str], strats: list) -> List[dict]:
+    """Closed trades, net P&L and exposure of each pair's strategy instance."""
+    rows = []
+    for pair, strat in zip(pairs, strats):
+        trades = strat.analyzers.trades.get_analysis()
+        closed = trades.get("total", {}).get("closed", 0)
+        rows.append({
+            "pair": pair,
+            "trades": closed,
+            "pnl": trades.pnl.net.total if closed else 0.0,
+            "exposure": strat.analyzers.metrics.exposure,
+        })
+    return rows
+
+
+def main(argv=None) -> None:
+    from run_backtest import (CASH_START, build_report_folder, daily_returns, equity_series,
+                              parse_assignments, summary_metrics)
+    from tools.report_builder import save_run
+
+    parser = argparse.ArgumentParser(description="Multi-pair portfolio backtest")
+    parser.add_argument("--strategy", default=STRATEGY)
+    parser.add_argument("--pairs", nargs="+", default=PAIRS)
+    parser.add_argument("--tf", default=TF)
+    parser.add_argument("--trend-tf", default=TREND_TF)
+    parser.add_argument("--param", action="append", default=[], metavar="NAME=VALUE")
+    parser.add_argument("--cash", type=float, default=CASH_START)
+    parser.add_argument("--account", default=ACCOUNT_CURRENCY, help="account currency")
+    args = parser.parse_args(argv)
+
+    strategy_cls = get_strategy(args.strategy)
+    params = {**PARAMS, **parse_assignments(args.param)}
+    try:
+        cerebro, strats = run_portfolio(strategy_cls, args.pairs, args.tf, args.trend_tf,
+                                        params, args.cash, account=args.account)
+    except ValueError as e:
+        parser.error(str(e))
+
+    # --- Combined equity: daily returns for the batch QuantStats report ---
+    label = "-".join(args.pairs)
+    report_path = build_report_folder(strategy_cls, label, args.tf)
+    returns = daily_returns(equity_series(strats[0]))
+    save_run(report_path, returns, strategy_cls.__name__, label, args.tf)
+
+    metrics = summary_metrics(cerebro, strats[0], args.cash)
+    print("\n--- Per pair ---")
+    for row in pair_summary(args.pairs, strats):
+        print(f"{row['pair']:<8} trades {row['trades']:>4}  P&L {row['pnl']:>10.2f} {args.account}  "
+              f"exposure {row['exposure']:.1%}")
+
+    print("\n--- Portfolio ---")
+    print(f"Final Portfolio Value: {metrics['final_value']:.2f} {args.account}")
+    print(f"ROI: {metrics['roi']:.2f}% | Max DD: {metrics['max_dd']:.2%}")
+    print(f"Sharpe: {metrics['sharpe']:.2f} | Sortino: {metrics['sortino']:.2f}")
+    print(f"Daily returns saved to '{os.path.join(report_path, 'daily_returns.csv')}'")
+
+
+if __name__ == "__main__":
+    main()
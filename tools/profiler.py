@@ -0,0 +1,140 @@
+"""Hot-path profiling for backtests (run_backtest --profile).
+
+A Profiler collects inclusive wall time and call counts:
+
+  * phases     -- coarse steps timed with ``profiler.phase(name)`` (feed loading,
+                  the Cerebro run, equity/returns post-processing, reports)
+  * feeds      -- each feed's preload (CSV parsing or cache streaming)
+  * indicators -- each of the strategy's indicators: the vectorized pass
+                  (``once``) and the per-bar work (``advance`` in runonce mode,
+                  ``next`` otherwise)
+  * callbacks  -- the strategy's next/prenext/nextstart, notify_* and order entry
+  * broker     -- broker.next (order matching) and order submission
+  * analyzers  -- each analyzer's per-bar next
+
+Instrumentation wraps instance attributes of the objects of one run, so other
+runs are unaffected. Times are inclusive (strategy.next contains the orders it
+places); the wrappers themselves add a little per-call overhead.
+"""
+import contextlib
+import time
+from collections import defaultdict
+from typing import Dict
+
+import backtrader as bt
+
+
+STRATEGY_CALLBACKS = ("prenext", "nextstart", "next", "notify_order", "notify_trade",
+                      "buy", "sell", "close", "buy_bracket", "sell_bracket", "cancel")
+BROKER_CALLS = ("next", "submit")
+
+
+class Profiler:
+    """Phase timings plus per-object timers; ``report()`` returns a JSON-ready dict."""
+
+    def __init__(self):
+        self.phases: Dict[str, float] = defaultdict(float)
+        self.timers: Dict[str, Dict[str, list]] = defaultdict(lambda: defaultdict(lambda: [0, 0.0]))
+        self.bars = 0
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] += time.perf_counter() - t0
+
+    def wrap(self, obj, attr: str, section: str, label: str) -> None:
+        """Replace obj.attr by a timed wrapper recording into timers[section][label]."""
+        original = getattr(obj, attr, None)
+        if original is None:
+            return
+        record = self.timers[section][label]
+        clock = time.perf_counter
+
+        def timed(*args, **kwargs):
+            t0 = clock()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                record[0] += 1
+                record[1] += clock() - t0
+
+        setattr(obj, attr, timed)
+
+    def instrument_feeds(self, feeds) -> None:
+        for i, feed in enumerate(feeds):
+            self.wrap(feed, "preload", "feeds", f"data{i}.preload")
+
+    def instrument_strategy(self, strategy) -> None:
+        for name in STRATEGY_CALLBACKS:
+            self.wrap(strategy, name, "callbacks", name)
+        for name in BROKER_CALLS:
+            self.wrap(strategy.broker, name, "broker", name)
+        for i, ind in enumerate(strategy.getindicators()):
+            label = f"{i}:{indicator_label(ind)}"
+            self.wrap(ind, "_once", "indicators", f"{label}.once")
+            self.wrap(ind, "advance", "indicators", f"{label}.advance")
+            self.wrap(ind, "_next", "indicators", f"{label}.next")
+        for analyzer in strategy.analyzers:
+            if not isinstance(analyzer, ProfileAnalyzer):
+                self.wrap(analyzer, "next", "analyzers", type(analyzer).__name__)
+
+    def report(self, **meta) -> dict:
+        run = self.phases.get("run", 0.0)
+        preload = sum(seconds for _, seconds in self.timers["feeds"].values())
+        loop = run - preload
+        return {
+            **meta,
+            "bars": self.bars,
+            "wall_seconds": sum(self.phases.values()),
+            "bars_per_second": self.bars / loop if loop > 0 else None,
+            "us_per_bar": loop / self.bars * 1e6 if self.bars else None,
+            "phases": dict(self.phases),
+            **{
+                section: {
+                    label: {"calls": calls, "seconds": seconds}
+                    for label, (calls, seconds) in sorted(entries.items(), key=lambda kv: -kv[1][1])
+                    if calls
+                }
+                for section, entries in self.timers.items()
+            },
+        }
+
+
+def indicator_label(ind) -> str:
+    """e.g. 'SMA(period=200)': the period plus any other non-default, non-class params."""
+    params = ", ".join(f"{k}={v}" for k, v in ind.p._getkwargs().items()
+                       if (k == "period" or not ind.p.isdefault(k)) and not isinstance(v, type))
+    return f"{type(ind).__name__}({params})"
+
+
+class ProfileAnalyzer(bt.Analyzer):
+    """Hooks a Profiler into the strategy it is attached to when the run starts."""
+    params = (
+        ("profiler", None),
+    )
+
+    def start(self):
+        self.p.profiler.instrument_strategy(self.strategy)
+
+    def stop(self):
+        self.p.profiler.bars = len(self.strategy.datas[0])
+
+
+def print_summary(report: dict, top: int = 8) -> None:
+    """Human-readable digest of report(): phases, throughput, top timers."""
+    print("\n--- Profile ---")
+    for name, seconds in report["phases"].items():
+        print(f"{name:<28} {seconds:9.3f}s")
+    if report["bars_per_second"]:
+        print(f"{report['bars']} bars, {report['bars_per_second']:,.0f} bars/s "
+              f"({report['us_per_bar']:.1f} us/bar in the engine loop)")
+    for section in ("feeds", "indicators", "callbacks", "broker", "analyzers"):
+        entries = list(report.get(section, {}).items())[:top]
+        if not entries:
+            continue
+        print(f"[{section}]")
+        for label, t in entries:
+            print(f"  {label:<52} {t['seconds']:9.3f}s {t['calls']:>9} calls")
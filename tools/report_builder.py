@@ -0,0 +1,149 @@
+"""Batch QuantStats report builder.
+
+run_backtest only stores each run's daily returns (reports/<run>/daily_returns.csv
+plus run.json) and never imports QuantStats. This step renders the HTML reports
+for all stored runs that don't have one yet, in parallel worker processes,
+copies them into docs/ and regenerates docs/index.html once at the end.
+
+Usage:
+    python -m tools.report_builder            # render missing reports
+    python -m tools.report_builder --force    # re-render everything
+    python -m tools.report_builder --index    # only rebuild docs/index.html
+"""
+import argparse
+import glob
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+import pandas as pd
+
+
+REPORTS_DIR = "reports"
+DOCS_DIR = "docs"
+RETURNS_FILE = "daily_returns.csv"
+RUN_FILE = "run.json"
+REPORT_FILE = "qs_report.html"
+DOCS_SUFFIX = "_qs_report.html"
+
+INDEX_TEMPLATE = """
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <title>Backtest Reports</title>
+</head>
+<body>
+    <h1>Available Backtest Reports</h1>
+    <ul>
+{items}
+    </ul>
+</body>
+</html>
+"""
+
+
+def save_run(report_path: str, returns: pd.Series, strategy_name: str, pair: str, tf: str,
+             stop_reason: Optional[str] = None) -> None:
+    """Store what the report needs: daily returns and the run's identity."""
+    returns.rename("returns").to_csv(os.path.join(report_path, RETURNS_FILE))
+    run = {
+        "name": os.path.basename(os.path.normpath(report_path)),
+        "strategy": strategy_name,
+        "pair": pair,
+        "tf": tf,
+        "stop_reason": stop_reason,
+    }
+    with open(os.path.join(report_path, RUN_FILE), "w") as f:
+        json.dump(run, f, indent=2)
+
+
+def load_returns(report_path: str) -> pd.Series:
+    df = pd.read_csv(os.path.join(report_path, RETURNS_FILE), index_col=0, parse_dates=True)
+    return df.iloc[:, 0]
+
+
+def pending_runs(reports_dir: str = REPORTS_DIR, force: bool = False) -> List[str]:
+    """Run folders with stored returns and no report yet (stopped runs are skipped)."""
+    folders = []
+    for run_file in sorted(glob.glob(os.path.join(reports_dir, "*", RUN_FILE))):
+        folder = os.path.dirname(run_file)
+        with open(run_file) as f:
+            run = json.load(f)
+        if run.get("stop_reason"):
+            continue
+        if force or not os.path.exists(os.path.join(folder, REPORT_FILE)):
+            folders.append(folder)
+    return folders
+
+
+def render_report(report_path: str, docs_dir: str = DOCS_DIR) -> str:
+    """Render one run's QuantStats report and copy it into docs/. Returns the docs file."""
+    os.environ.setdefault("MPLBACKEND", "Agg")  # headless workers
+    import quantstats as qs
+
+    with open(os.path.join(report_path, RUN_FILE)) as f:
+        run = json.load(f)
+
+    qs_report_path = os.path.join(report_path, REPORT_FILE)
+    qs.reports.html(
+        load_returns(report_path),
+        output=qs_report_path,
+        title=f"{run['pair']} Strategy Performance",
+    )
+
+    # Save a copy into docs/ for GitHub Pages
+    os.makedirs(docs_dir, exist_ok=True)
+    qs_docs_path = os.path.join(docs_dir, run["name"] + DOCS_SUFFIX)
+    shutil.copy(qs_report_path, qs_docs_path)
+    return qs_docs_path
+
+
+def write_index(docs_dir: str = DOCS_DIR) -> str:
+    """Regenerate docs/index.html from the reports present in docs/."""
+    names = sorted(
+        (f for f in os.listdir(docs_dir) if f.endswith(DOCS_SUFFIX)),
+        reverse=True,
+    )
+    items = "\n".join(f'        <li><a href="{n}">{n}</a></li>' for n in names)
+    index_path = os.path.join(docs_dir, "index.html")
+    with open(index_path, "w") as f:
+        f.write(INDEX_TEMPLATE.format(items=items))
+    return index_path
+
+
+def build_reports(reports_dir: str = REPORTS_DIR, docs_dir: str = DOCS_DIR,
+                  jobs: Optional[int] = None, force: bool = False) -> List[str]:
+    """Render all pending reports concurrently, then rebuild the index once."""
+    folders = pending_runs(reports_dir, force)
+    rendered = []
+    if folders:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            for docs_path in pool.map(render_report, folders, [docs_dir] * len(folders)):
+                print(f"QuantStats report saved as '{docs_path}'")
+                rendered.append(docs_path)
+    write_index(docs_dir)
+    return rendered
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--reports-dir", default=REPORTS_DIR)
+    parser.add_argument("--docs-dir", default=DOCS_DIR)
+    parser.add_argument("--jobs", type=int, default=None)
+    parser.add_argument("--force", action="store_true", help="re-render existing reports")
+    parser.add_argument("--index", action="store_true", help="only rebuild docs/index.html")
+    args = parser.parse_args(argv)
+
+    if args.index:
+        print(f"Index written to '{write_index(args.docs_dir)}'")
+        return
+    rendered = build_reports(args.reports_dir, args.docs_dir, args.jobs, args.force)
+    print(f"{len(rendered)} report(s) rendered, index written to "
+          f"'{os.path.join(args.docs_dir, 'index.html')}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,67 +1,215 @@
+"""Resample HistData M1 exports (data/DAT_MT_{PAIR}_M1_{YEAR}.csv) into the
+data/{PAIR}_{tf}.csv files used by run_backtest.
+
+The M1 input is streamed in chunks and every target timeframe is built in the
+same pass: each chunk is aggregated to 1 minute, then each coarser timeframe
+is aggregated from the previous (already much smaller) one. Only the last,
+possibly incomplete bar of each timeframe is held back between chunks, so
+memory is bounded by the chunk size, not by the input length.
+
+With --append the existing outputs are extended instead of rewritten: the
+last bar of every output is popped back into memory, M1 rows that were
+already processed are skipped, and only the tail bars are recomputed.
+
+Usage:
+    python -m tools.resample_csv_files --pairs EURUSD EURJPY --years 2024 2025
+    python -m tools.resample_csv_files --pairs EURUSD --years 2025 --append
+"""
+import argparse
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
 import pandas as pd
 
-pair = 'EURJPY'  # Currency pair to process
-# Load M1 data
-df = pd.read_csv(f"data/DAT_MT_{pair}_M1_2024.csv", header=None)
-df.columns = ["date", "time", "open", "high", "low", "close", "volume"]
-
-# Combine datetime
-df['datetime'] = pd.to_datetime(df['date'] + ' ' + df['time'])
-df.set_index('datetime', inplace=True)
-
-# Resample to 1 minute
-df_1m = df.resample('1min').agg({
-    'open': 'first',
-    'high': 'max',
-    'low': 'min',
-    'close': 'last',
-    'volume': 'sum'
-}).dropna()
-df_1m.to_csv(f"data/{pair}_1m.csv")
-print(f"Saved {pair}_1m.csv")
-
-# Resample to 15 minutes
-df_15m = df.resample('15min').agg({
-    'open': 'first',
-    'high': 'max',
-    'low': 'min',
-    'close': 'last',
-    'volume': 'sum'
-}).dropna()
-df_15m.to_csv(f"data/{pair}_15m.csv")
-print(f"Saved {pair}_15m.csv")
-
-#print(df_15m.index.dtype)
-
-# Resample to 1 hour
-df_1h = df.resample('1h').agg({
-    'open': 'first',
-    'high': 'max',
-    'low': 'min',
-    'close': 'last',
-    'volume': 'sum'
-}).dropna()
-df_1h.to_csv(f"data/{pair}_1h.csv")
-print(f"Saved {pair}_1h.csv")
-
-# Resample to 4 hour
-df_4h = df.resample('4h').agg({
-    'open': 'first',
-    'high': 'max',
-    'low': 'min',
-    'close': 'last',
-    'volume': 'sum'
-}).dropna()
-df_4h.to_csv(f"data/{pair}_4h.csv")
-print(f"Saved {pair}_4h.csv")
-
-# Resample to 1 day
-df_1d = df.resample('1d').agg({
-    'open': 'first',
-    'high': 'max',
-    'low': 'min',
-    'close': 'last',
-    'volume': 'sum'
-}).dropna()
-df_1d.to_csv(f"data/{pair}_1d.csv")
-print(f"Saved {pair}_1d.csv")
+
+DATA_DIR = "data"
+CHUNK_ROWS = 500_000
+
+# timeframe label -> pandas frequency, finest first
+TIMEFRAMES = {
+    "1m": "1min",
+    "15m": "15min",
+    "1h": "1h",
+    "4h": "4h",
+    "1d": "1D",
+}
+AGG = {
+    "open": "first",
+    "high": "max",
+    "low": "min",
+    "close": "last",
+    "volume": "sum",
+}
+HEADER = "datetime,open,high,low,close,volume\n"
+
+
+def m1_path(pair: str, year: int, data_dir: str = DATA_DIR) -> str:
+    return os.path.join(data_dir, f"DAT_MT_{pair}_M1_{year}.csv")
+
+
+def output_path(pair: str, tf: str, data_dir: str = DATA_DIR) -> str:
+    return os.path.join(data_dir, f"{pair}_{tf}.csv")
+
+
+def state_path(pair: str, data_dir: str = DATA_DIR) -> str:
+    """Records the last M1 timestamp folded into the outputs of a pair."""
+    return os.path.join(data_dir, f".{pair}_resample.json")
+
+
+def read_m1_chunks(path: str, chunk_rows: int = CHUNK_ROWS):
+    """Yield M1 bars from a HistData MT export as datetime-indexed frames."""
+    reader = pd.read_csv(
+        path,
+        header=None,
+        names=["date", "time", "open", "high", "low", "close", "volume"],
+        chunksize=chunk_rows,
+    )
+    for chunk in reader:
+        chunk.index = pd.to_datetime(chunk.pop("date") + " " + chunk.pop("time"))
+        chunk.index.name = "datetime"
+        yield chunk
+
+
+def aggregate(bars: pd.DataFrame, freq: str) -> pd.DataFrame:
+    """OHLCV aggregation of (sorted) bars into `freq` buckets."""
+    return bars.groupby(bars.index.floor(freq)).agg(AGG)
+
+
+def pop_last_row(path: str) -> pd.DataFrame:
+    """Remove the last bar from a CSV output and return it as a 1-row frame."""
+    with open(path, "rb+") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(0, size - 4096))
+        tail = f.read()
+        body = tail.rstrip(b"\n")
+        start = body.rfind(b"\n") + 1
+        line = body[start:].decode()
+        if line in ("", HEADER.strip()):
+            raise ValueError(f"'{path}' has no bars to append to")
+        f.truncate(size - len(tail) + start)
+    return pd.read_csv(io.StringIO(HEADER + line), index_col=0, parse_dates=True)
+
+
+class _TimeframeWriter:
+    """Appends completed bars of one timeframe, holding back the open one."""
+
+    def __init__(self, path: str, tf: str, append: bool):
+        self.freq = TIMEFRAMES[tf]
+        self.date_format = "%Y-%m-%d" if tf == "1d" else "%Y-%m-%d %H:%M:%S"
+        self.pending: Optional[pd.DataFrame] = None
+        if append:
+            self.pending = pop_last_row(path)
+            self.file = open(path, "a", newline="")
+        else:
+            self.file = open(path, "w", newline="")
+            self.file.write(HEADER)
+
+    def add(self, bars: pd.DataFrame) -> None:
+        if bars.empty:
+            return
+        if self.pending is not None:
+            # Only the first new bar can share a bucket with the pending one
+            head = pd.concat([self.pending, bars.iloc[:1]]).groupby(level=0).agg(AGG)
+            bars = pd.concat([head, bars.iloc[1:]])
+        bars.iloc[:-1].to_csv(self.file, header=False, date_format=self.date_format)
+        self.pending = bars.iloc[-1:]
+
+    def close(self) -> None:
+        if self.pending is not None:
+            self.pending.to_csv(self.file, header=False, date_format=self.date_format)
+        self.file.close()
+
+
+class StreamingResampler:
+    """Single-pass, bounded-memory resampler of one pair into several timeframes."""
+
+    def __init__(self, pair: str, timeframes: List[str], data_dir: str = DATA_DIR,
+                 append: bool = False):
+        unknown = set(timeframes) - set(TIMEFRAMES)
+        if unknown:
+            raise ValueError(f"Unknown timeframes {sorted(unknown)}. Supported: {list(TIMEFRAMES)}")
+
+        self.pair = pair
+        self.data_dir = data_dir
+        self.timeframes = [tf for tf in TIMEFRAMES if tf in timeframes]
+        self.last_m1: Optional[pd.Timestamp] = None
+        if append:
+            with open(state_path(pair, data_dir)) as f:
+                self.last_m1 = pd.Timestamp(json.load(f)["last_m1"])
+        self.writers: Dict[str, _TimeframeWriter] = {
+            tf: _TimeframeWriter(output_path(pair, tf, data_dir), tf, append)
+            for tf in self.timeframes
+        }
+
+    def add(self, m1: pd.DataFrame) -> None:
+        if self.last_m1 is not None:
+            m1 = m1[m1.index > self.last_m1]
+        if m1.empty:
+            return
+        self.last_m1 = m1.index[-1]
+
+        # Cascade: every level is aggregated from the previous, smaller one
+        bars = aggregate(m1, TIMEFRAMES["1m"])
+        for tf in self.timeframes:
+            bars = aggregate(bars, TIMEFRAMES[tf])
+            self.writers[tf].add(bars)
+
+    def close(self) -> None:
+        for writer in self.writers.values():
+            writer.close()
+        if self.last_m1 is not None:
+            with open(state_path(self.pair, self.data_dir), "w") as f:
+                json.dump({"last_m1": self.last_m1.isoformat()}, f)
+
+
+def can_append(pair: str, timeframes: List[str], data_dir: str = DATA_DIR) -> bool:
+    paths = [state_path(pair, data_dir)] + [output_path(pair, tf, data_dir) for tf in timeframes]
+    return all(os.path.exists(p) for p in paths)
+
+
+def resample_pair(pair: str, years: List[int], timeframes: List[str],
+                  data_dir: str = DATA_DIR, append: bool = False,
+                  chunk_rows: int = CHUNK_ROWS) -> str:
+    """Stream the given years of M1 data for one pair into every timeframe."""
+    if append and not can_append(pair, timeframes, data_dir):
+        print(f"{pair}: no previous resample state, rebuilding outputs")
+        append = False
+
+    resampler = StreamingResampler(pair, timeframes, data_dir, append)
+    try:
+        for year in sorted(years):
+            for chunk in read_m1_chunks(m1_path(pair, year, data_dir), chunk_rows):
+                resampler.add(chunk)
+    finally:
+        resampler.close()
+    return f"{pair}: saved {', '.join(f'{pair}_{tf}.csv' for tf in resampler.timeframes)}"
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--pairs", nargs="+", required=True)
+    parser.add_argument("--years", nargs="+", type=int, required=True)
+    parser.add_argument("--tf", nargs="+", default=list(TIMEFRAMES), choices=list(TIMEFRAMES))
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--append", action="store_true",
+                        help="extend existing outputs, recomputing only the tail bars")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--jobs", type=int, default=None, help="parallel pairs (default: all cores)")
+    args = parser.parse_args(argv)
+
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        futures = [
+            pool.submit(resample_pair, pair, args.years, args.tf, args.data_dir,
+                        args.append, args.chunk_rows)
+            for pair in args.pairs
+        ]
+        for future in futures:
+            print(future.result())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""SQLite store of finished backtests, keyed by everything that decides the result.
+
+A run's key hashes the strategy's source file, its full parameter set (class
+defaults plus overrides), the pair, timeframes and run settings, and the
+content of every data file the run reads. run_backtest looks the key up first:
+on a hit the stored metrics come back without running anything (and without a
+new reports/ folder); on a miss the run is stored with its summary metrics,
+daily equity and closed trades.
+
+File digests are memoized by (path, mtime, size), so a lookup reads no data.
+The runs table is indexed by strategy / pair / timeframe for fast queries.
+
+Usage:
+    python -m tools.result_store                                # latest runs
+    python -m tools.result_store --strategy RsiMacdStrategy --order-by sharpe
+    python -m tools.result_store --trades <key or key prefix>
+"""
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import sqlite3
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+import backtrader as bt
+
+
+RESULTS_DB = os.path.join("reports", "results.sqlite")
+STORE_VERSION = 2                   # bump when stored results stop being comparable
+METRICS = ("final_value", "roi", "max_daily_dd", "max_dd", "sharpe", "sortino", "exposure")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    key TEXT PRIMARY KEY,
+    strategy TEXT, pair TEXT, tf TEXT, trend_tf TEXT, fill_tf TEXT,
+    params TEXT, config TEXT, created TEXT,
+    final_value REAL, roi REAL, max_daily_dd REAL, max_dd REAL,
+    sharpe REAL, sortino REAL, exposure REAL, stop_reason TEXT,
+    trades INTEGER, equity BLOB
+);
+CREATE INDEX IF NOT EXISTS runs_by_strategy ON runs (strategy, pair, tf);
+CREATE INDEX IF NOT EXISTS runs_by_pair ON runs (pair, tf);
+CREATE TABLE IF NOT EXISTS trades (
+    key TEXT, n INTEGER, dtopen REAL, dtclose REAL, size REAL, price REAL,
+    pnl REAL, pnlcomm REAL, barlen INTEGER
+);
+CREATE INDEX IF NOT EXISTS trades_by_key ON trades (key);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, digest TEXT
+);
+"""
+
+
+class TradeList(bt.Analyzer):
+    """Closed trades of the run: open/close date, size, entry price, P&L, bars held."""
+
+    def start(self):
+        self.trades = []
+        self._sizes = {}
+
+    def notify_trade(self, trade):
+        if trade.justopened:
+            self._sizes[trade.ref] = trade.size
+        elif trade.isclosed:
+            self.trades.append((trade.dtopen, trade.dtclose, self._sizes.pop(trade.ref, 0.0),
+                                trade.price, trade.pnl, trade.pnlcomm, trade.barlen))
+
+    def get_analysis(self):
+        return self.trades
+
+
+def daily_equity(rec: Dict[str, np.ndarray]) -> np.ndarray:
+    """[days, values]: the last recorded value of each day (EquityTracker arrays)."""
+    days = np.floor(rec["datetime"])
+    last = np.flatnonzero(np.diff(days, append=np.inf))
+    return np.stack([days[last], rec["value"][last]])
+
+
+def strategy_digest(strategy_cls) -> Optional[str]:
+    """Hash of the source file defining the strategy; None if it has no file."""
+    try:
+        path = inspect.getsourcefile(strategy_cls)
+    except TypeError:
+        return None
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+
+
+class ResultStore:
+    """Runs table plus trades and memoized data file digests in one SQLite file."""
+
+    def __init__(self, path: str = RESULTS_DB):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=30)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")  # concurrent readers while a run is stored
+        self.db.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.db.close()
+
+    # --- Keys ---
+
+    def file_digest(self, path: str) -> str:
+        st = os.stat(path)
+        row = self.db.execute("SELECT mtime_ns, size, digest FROM files WHERE path = ?",
+                              (path,)).fetchone()
+        if row and row["mtime_ns"] == st.st_mtime_ns and row["size"] == st.st_size:
+            return row["digest"]
+
+        h = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                            (path, st.st_mtime_ns, st.st_size, h.hexdigest()))
+        return h.hexdigest()
+
+    def run_key(self, strategy_cls, params: Optional[dict], config: dict,
+                data_files: List[str]) -> Optional[str]:
+        """Key of a run, or None when it cannot be keyed (strategy without a source file)."""
+        source = strategy_digest(strategy_cls)
+        if source is None:
+            return None
+        full = dict(strategy_cls.params._getitems())
+        full.update(params or {})
+        key = repr((STORE_VERSION, bt.__version__, strategy_cls.__name__, source,
+                    sorted(full.items()), sorted(config.items()),
+                    [(os.path.basename(p), self.file_digest(p)) for p in data_files]))
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    # --- Runs ---
+
+    def get(self, key: str) -> Optional[dict]:
+        """The stored run (its columns, with 'metrics' as run_backtest returns them), or None."""
+        row = self.db.execute("SELECT * FROM runs WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        run = dict(row)
+        run["metrics"] = {**{m: run[m] for m in METRICS}, "stop_reason": run["stop_reason"]}
+        return run
+
+    def put(self, key: str, strategy_cls, params: Optional[dict], config: dict,
+            metrics: dict, equity: np.ndarray, trades: list) -> None:
+        with self.db:
+            self.db.execute("DELETE FROM trades WHERE key = ?", (key,))
+            self.db.execute(
+                "INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, "
+                "?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, strategy_cls.__name__, config["pair"], config["tf"], config.get("trend_tf"),
+                 config.get("fill_tf"), json.dumps(params or {}, default=repr),
+                 json.dumps(config, default=repr), datetime.now().isoformat(timespec="seconds"),
+                 *(metrics[m] for m in METRICS), metrics["stop_reason"], len(trades),
+                 np.ascontiguousarray(equity, dtype=np.float64).tobytes()),
+            )
+            self.db.executemany("INSERT INTO trades VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                [(key, i, *t) for i, t in enumerate(trades)])
+
+    def equity(self, key: str):
+        """Stored daily equity of a run as a Series (pandas imported here only)."""
+        import pandas as pd
+        from tools.bar_cache import bt_num_to_datetime
+
+        blob = self.db.execute("SELECT equity FROM runs WHERE key = ?", (key,)).fetchone()[0]
+        days, values = np.frombuffer(blob, dtype=np.float64).reshape(2, -1)
+        return pd.Series(values, index=bt_num_to_datetime(days), name="value")
+
+    def resolve(self, prefix: str) -> Optional[str]:
+        """Full key of the single run whose key starts with `prefix`."""
+        rows = self.db.execute("SELECT key FROM runs WHERE key LIKE ? LIMIT 2",
+                               (prefix + "%",)).fetchall()
+        return rows[0][0] if len(rows) == 1 else None
+
+    def trades(self, key: str) -> List[dict]:
+        rows = self.db.execute("SELECT * FROM trades WHERE key = ? ORDER BY n", (key,))
+        return [dict(r) for r in rows]
+
+    def query(self, strategy: Optional[str] = None, pair: Optional[str] = None,
+              tf: Optional[str] = None, order_by: str = "created", limit: int = 20) -> List[dict]:
+        """Stored runs matching the filters, best first by `order_by` (latest for 'created')."""
+        if order_by not in METRICS + ("created", "trades"):
+            raise ValueError(f"Cannot order by '{order_by}'")
+        filters = {"strategy": strategy, "pair": pair, "tf": tf}
+        where = [f"{col} = ?" for col, v in filters.items() if v is not None]
+        sql = ("SELECT key, strategy, pair, tf, trend_tf, fill_tf, params, created, trades, "
+               + ", ".join(METRICS) + ", stop_reason FROM runs"
+               + (" WHERE " + " AND ".join(where) if where else "")
+               + f" ORDER BY {order_by} DESC LIMIT ?")
+        args = [v for v in filters.values() if v is not None] + [limit]
+        return [dict(r) for r in self.db.execute(sql, args)]
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Query stored backtest results")
+    parser.add_argument("--db", default=RESULTS_DB)
+    parser.add_argument("--strategy")
+    parser.add_argument("--pair")
+    parser.add_argument("--tf")
+    parser.add_argument("--order-by", default="created")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--trades", metavar="KEY", help="list the closed trades of one run")
+    args = parser.parse_args(argv)
+
+    store = ResultStore(args.db)
+    if args.trades:
+        key = store.resolve(args.trades)
+        if key is None:
+            parser.error(f"No single stored run with key '{args.trades}'")
+        for t in store.trades(key):
+            opened, closed = bt.num2date(t["dtopen"]), bt.num2date(t["dtclose"])
+            print(f"{opened:%Y-%m-%d %H:%M} -> {closed:%Y-%m-%d %H:%M}  size {t['size']:>12.2f}  "
+                  f"price {t['price']:.5f}  P&L {t['pnlcomm']:>9.2f}  bars {t['barlen']}")
+        return
+
+    try:
+        rows = store.query(args.strategy, args.pair, args.tf, args.order_by, args.limit)
+    except ValueError as e:
+        parser.error(str(e))
+    for r in rows:
+        print(f"{r['key'][:12]}  {r['created']}  {r['strategy']:<24} {r['pair']} {r['tf']:<3} "
+              f"ROI {r['roi']:6.2f}%  Sharpe {r['sharpe']:5.2f}  DD {r['max_dd']:7.2%}  "
+              f"trades {r['trades']:>4}  {r['params']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Lazy registry of the strategies in strategies/.
+
+Strategy classes are discovered by parsing the module sources (no imports),
+and only the module that defines the requested class is imported.
+"""
+import ast
+import glob
+import importlib
+import os
+from functools import lru_cache
+from typing import Dict
+
+
+STRATEGIES_PACKAGE = "strategies"
+STRATEGIES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                              STRATEGIES_PACKAGE)
+
+
+def _is_strategy(node: ast.ClassDef) -> bool:
+    """bt.Strategy subclasses (or subclasses of another *Strategy class)."""
+    for base in node.bases:
+        name = base.attr if isinstance(base, ast.Attribute) else getattr(base, "id", "")
+        if name.endswith("Strategy"):
+            return True
+    return False
+
+
+@lru_cache(maxsize=None)
+def discover(strategies_dir: str = STRATEGIES_DIR) -> Dict[str, str]:
+    """Map strategy class name -> module name, e.g. 'RsiMacdStrategy' -> 'rsi_macd_strategy'."""
+    found = {}
+    for path in sorted(glob.glob(os.path.join(strategies_dir, "*.py"))):
+        module = os.path.splitext(os.path.basename(path))[0]
+        with open(path) as f:
+            tree = ast.parse(f.read(), filename=path)
+        for node in tree.body:
+            if isinstance(node, ast.ClassDef) and _is_strategy(node):
+                found[node.name] = module
+    return found
+
+
+def get_strategy(name: str):
+    """Import and return one strategy class by name."""
+    modules = discover()
+    if name not in modules:
+        raise ValueError(f"Unknown strategy '{name}'. Available: {sorted(modules)}")
+    module = importlib.import_module(f"{STRATEGIES_PACKAGE}.{modules[name]}")
+    return getattr(module, name)
@@ -0,0 +1,235 @@
+"""Successive halving: screen many parameter sets on short data slices first.
+
+Every candidate of the search space is run on MIN_FRACTION of the bars; the
+best 1 / ETA by OPTIMIZE_BY move up to ETA times more data, and so on until the
+survivors run on all of it. A short rung's data is SLICES windows spread evenly
+over the period, scored by the mean over the windows -- one recent slice ranks
+candidates by a single market regime, and its picks did poorly on the full
+year. Windows start WARMUP bars early so indicators are ready; trading and
+the scores only cover the window itself. Each rung runs on a process pool, and
+workers map the bar arrays once (tools.bar_cache.loaded_bars).
+
+With ETA = 3 and MIN_FRACTION = 1/9 each of the three rungs processes about a
+third of the grid's bars, plus the warm-up bars of every window; the report
+prints the CPU time spent next to an estimate for the full grid. --compare-grid
+also runs the full grid on all the data and shows where the picks rank in it.
+
+Usage:
+    python -m tools.successive_halving
+    python -m tools.successive_halving --strategy RsiMacdTrendStrategy --pair EURJPY
+"""
+import argparse
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from tools.param_sweep import expand_grid
+from tools.strategy_registry import get_strategy
+from tools.bar_cache import loaded_bars, loaded_trend_bars
+from tools.walk_forward import run_slice, slice_feeds
+
+
+# =========================
+# Configuration (edit here)
+# =========================
+STRATEGY = "SMAPriceActionStrategy"
+SEARCH_SPACES = {                   # grid, trend feed and warm-up bars per strategy
+    "SMAPriceActionStrategy": {
+        "grid": {
+            "sma_fast": [12, 24, 36, 48],
+            "sma_trend": [100, 150, 200, 300],
+            "atr_period": [10, 14, 21],
+            "atr_dist_factor": [0.1, 0.3, 0.5],
+            "rr_ratio": [1.5, 2.0, 3.0],
+        },
+        "trend_tf": None,
+        "warmup": 300,
+    },
+    "RsiMacdTrendStrategy": {
+        "grid": {
+            "rsi_period": [10, 14, 21],
+            "rsi_oversold": [25, 30, 35],
+            "rsi_overbought": [65, 70, 75],
+            "trend_sma_period": [50, 100, 200],
+            "macd_fast": [8, 12],
+            "macd_slow": [21, 26],
+            "macd_signal": [9],
+        },
+        "trend_tf": "4h",
+        "warmup": 800,
+    },
+}
+PAIR = "EURUSD"
+TF = "1h"
+ETA = 3                             # keep the best 1/ETA of each rung; slices grow ETA-fold
+MIN_FRACTION = 1 / 9                # data fraction of the first rung
+SLICES = 3                          # windows per short rung, spread over the data
+MAX_CANDIDATES: Optional[int] = None  # sample this many grid points (seeded); None = whole grid
+SEED = 0
+OPTIMIZE_BY = "sharpe"              # any summary_metrics key, higher is better
+TOP = 10
+PROCESSES: Optional[int] = None     # None = all cores
+OUTPUT_DIR = "reports"
+# =========================
+
+
+def rung_fractions(eta: int = ETA, min_fraction: float = MIN_FRACTION) -> List[float]:
+    """Data fractions of the rungs, smallest first, ending at 1.0."""
+    rungs = max(1, round(math.log(1 / min_fraction, eta)) + 1)
+    return [eta ** (r - rungs + 1) for r in range(rungs)]
+
+
+def rung_windows(datetimes: np.ndarray, fraction: float, slices: int = SLICES) -> List[tuple]:
+    """(start, end) bounds of `slices` equal windows covering `fraction` of the bars,
+    spread evenly from the first bar to the last; the whole period for fraction 1."""
+    n = len(datetimes)
+    end_of_data = datetimes[-1] + 1
+    if fraction >= 1:
+        return [(datetimes[0], end_of_data)]
+    size = max(1, math.ceil(fraction * n / slices))
+    starts = np.linspace(0, n - size, slices).astype(int)
+    return [(datetimes[i], datetimes[i + size] if i + size < n else end_of_data) for i in starts]
+
+
+def _evaluate(strategy_cls, pair: str, tf: str, trend_tf: Optional[str], windows: List[tuple],
+              warmup: int, combos: List[dict], optimize_by: str) -> List[dict]:
+    """Worker: run `combos` on every window; mean score, metrics and CPU time of each.
+
+    'metrics' are the summary metrics of the last window (all the data on the
+    last rung). Runs that stop early or cannot warm up score -inf.
+    """
+    from run_backtest import summary_metrics
+
+    rows = []
+    for params in combos:
+        t0 = time.process_time()
+        scores, metrics = [], {}
+        for start, end in windows:
+            # warm-up bars feed the indicators only: no trades or metrics before `start`
+            run = run_slice(strategy_cls, slice_feeds(pair, tf, trend_tf, start, end, warmup),
+                            params, trade_from=start)
+            metrics = summary_metrics(*run) if run is not None else {}
+            usable = run is not None and not metrics["stop_reason"]
+            scores.append(metrics[optimize_by] if usable else -np.inf)
+        rows.append({
+            "params": params,
+            "score": float(np.mean(scores)),
+            "metrics": metrics,
+            "cpu_seconds": time.process_time() - t0,
+        })
+    return rows
+
+
+def _chunks(items: List[dict], parts: int) -> List[List[dict]]:
+    size = max(1, math.ceil(len(items) / parts))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def successive_halving(strategy_cls, param_grid: Dict[str, Iterable], pair: str, tf: str,
+                       trend_tf: Optional[str] = None, warmup: int = 0, eta: int = ETA,
+                       min_fraction: float = MIN_FRACTION, slices: int = SLICES,
+                       max_candidates: Optional[int] = MAX_CANDIDATES,
+                       optimize_by: str = OPTIMIZE_BY,
+                       processes: Optional[int] = None) -> tuple:
+    """Run the rungs. Returns (per-candidate table, final rung rows best first, CPU seconds)."""
+    # Build any missing cache entries up front so workers only ever map them
+    dt = loaded_bars(pair, tf)["datetime"]
+    if trend_tf:
+        loaded_trend_bars(pair, tf, trend_tf)
+
+    candidates = expand_grid(param_grid)
+    if max_candidates and max_candidates < len(candidates):
+        rng = np.random.default_rng(SEED)
+        candidates = [candidates[i] for i in sorted(rng.choice(len(candidates), max_candidates,
+                                                               replace=False))]
+
+    table = pd.DataFrame(candidates)
+    workers = processes or os.cpu_count() or 1
+    cpu_seconds = 0.0
+    rows: List[dict] = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for r, fraction in enumerate(rung_fractions(eta, min_fraction)):
+            windows = rung_windows(dt, fraction, slices)
+            futures = [pool.submit(_evaluate, strategy_cls, pair, tf, trend_tf, windows, warmup,
+                                   chunk, optimize_by)
+                       for chunk in _chunks(candidates, workers * 4)]
+            rows = [row for f in futures for row in f.result()]  # candidate order
+            cpu_seconds += sum(row["cpu_seconds"] for row in rows)
+
+            index = [_row_index(table, row["params"]) for row in rows]
+            table.loc[index, f"rung{r}_{optimize_by}"] = [row["score"] for row in rows]
+            print(f"rung {r}: {len(rows)} candidates on {fraction:.0%} of the bars"
+                  + (f" ({len(windows)} windows)" if fraction < 1 else ""))
+
+            rows.sort(key=lambda row: -row["score"])
+            if fraction < 1:
+                candidates = [row["params"] for row in rows[:max(1, len(rows) // eta)]]
+    return table, rows, cpu_seconds
+
+
+def _row_index(table: pd.DataFrame, params: dict) -> int:
+    mask = np.ones(len(table), dtype=bool)
+    for name, value in params.items():
+        mask &= (table[name] == value).to_numpy()
+    return int(np.flatnonzero(mask)[0])
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Successive-halving parameter search")
+    parser.add_argument("--strategy", default=STRATEGY, choices=list(SEARCH_SPACES))
+    parser.add_argument("--pair", default=PAIR)
+    parser.add_argument("--tf", default=TF)
+    parser.add_argument("--eta", type=int, default=ETA)
+    parser.add_argument("--min-fraction", type=float, default=MIN_FRACTION)
+    parser.add_argument("--slices", type=int, default=SLICES)
+    parser.add_argument("--max-candidates", type=int, default=MAX_CANDIDATES)
+    parser.add_argument("--optimize-by", default=OPTIMIZE_BY)
+    parser.add_argument("--jobs", type=int, default=PROCESSES)
+    parser.add_argument("--compare-grid", action="store_true",
+                        help="also run every candidate on all the data and rank the picks in it")
+    args = parser.parse_args(argv)
+
+    space = SEARCH_SPACES[args.strategy]
+    strategy_cls = get_strategy(args.strategy)
+    t0 = time.perf_counter()
+    table, final, cpu_seconds = successive_halving(
+        strategy_cls, space["grid"], args.pair, args.tf, space["trend_tf"], space["warmup"],
+        args.eta, args.min_fraction, args.slices, args.max_candidates, args.optimize_by, args.jobs,
+    )
+    wall = time.perf_counter() - t0
+
+    stem = os.path.join(OUTPUT_DIR, f"halving_{args.strategy}_{args.pair}_{args.tf}")
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    table.to_csv(stem + ".csv", index=False)
+
+    print(f"\n--- Best {min(TOP, len(final))} on all the data ---")
+    for row in final[:TOP]:
+        m = row["metrics"]
+        if not m:
+            continue
+        print(f"{args.optimize_by} {row['score']:6.2f}  ROI {m['roi']:6.2f}%  "
+              f"DD {m['max_dd']:7.2%}  exposure {m['exposure']:5.1%}  {row['params']}")
+
+    full_cpu = np.mean([row["cpu_seconds"] for row in final])
+    estimate = full_cpu * len(table)
+    print(f"\n{len(table)} candidates, {wall:.1f}s wall, {cpu_seconds:.1f} CPU-s "
+          f"(full grid on all the data: ~{estimate:.1f} CPU-s, {cpu_seconds / estimate:.0%})")
+
+    if args.compare_grid:
+        grid_table, grid_rows, grid_cpu = successive_halving(
+            strategy_cls, space["grid"], args.pair, args.tf, space["trend_tf"], space["warmup"],
+            args.eta, 1.0, args.slices, args.max_candidates, args.optimize_by, args.jobs,
+        )
+        ranks = {tuple(sorted(r["params"].items())): i + 1 for i, r in enumerate(grid_rows)}
+        picks = [ranks[tuple(sorted(r["params"].items()))] for r in final[:TOP]]
+        print(f"Full grid: {grid_cpu:.1f} CPU-s; ranks of the top {len(picks)} picks in it: {picks}")
+    print(f"Per-candidate rung scores saved to '{stem}.csv'")
+
+
+if __name__ == "__main__":
+    main()
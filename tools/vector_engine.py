@@ -0,0 +1,298 @@
+"""Vectorized NumPy backend for the RSI/SMA/MACD strategy family.
+
+Indicators are computed over whole price arrays with the same definitions
+(and seeding) as Backtrader's, entry/exit rules become boolean arrays, and
+the position simulation only steps from one signal to the next instead of
+visiting every bar.
+
+Fill semantics match Cerebro's defaults used by run_backtest:
+  - a market order decided on bar i's close fills at bar i+1's open,
+  - a fixed `stake` per order (bt.sizers.FixedSize),
+  - orders that would take cash below zero are rejected by BackBroker's
+    margin check; the strategies' notify_order() does not clear `self.order`
+    on Margin, so a rejection freezes them for the rest of the run,
+  - equity is cash + position * close on every bar, like EquityTracker.
+
+Supported strategies are listed in RULES.
+"""
+import math
+from typing import Callable, Dict, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from tools.bar_cache import bt_num_to_datetime
+
+
+# =========================
+# Indicators
+# =========================
+def _shift(x: np.ndarray, n: int = 1) -> np.ndarray:
+    out = np.full(len(x), np.nan)
+    out[n:] = x[:-n]
+    return out
+
+
+def sma(x: np.ndarray, period: int) -> np.ndarray:
+    out = np.full(len(x), np.nan)
+    if len(x) >= period:
+        out[period - 1:] = sliding_window_view(x, period).sum(axis=1) / period
+    return out
+
+
+def _smooth(x: np.ndarray, period: int, alpha: float) -> np.ndarray:
+    """Exponential smoothing seeded with the SMA of the first `period` values."""
+    out = np.full(len(x), np.nan)
+    valid = np.flatnonzero(~np.isnan(x))
+    if not len(valid) or valid[0] + period > len(x):
+        return out
+    first = valid[0] + period - 1
+    seed = math.fsum(x[valid[0]:first + 1]) / period
+    # y[t] = (1 - alpha) * y[t-1] + alpha * x[t], run in pandas' C loop
+    tail = np.concatenate(([seed], x[first + 1:]))
+    out[first:] = pd.Series(tail).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+    return out
+
+
+def ema(x: np.ndarray, period: int) -> np.ndarray:
+    return _smooth(x, period, 2.0 / (1.0 + period))
+
+
+def smma(x: np.ndarray, period: int) -> np.ndarray:
+    """Wilder's smoothed moving average (Backtrader's default movav for RSI/ATR/ADX)."""
+    return _smooth(x, period, 1.0 / period)
+
+
+def rsi(close: np.ndarray, period: int = 14) -> np.ndarray:
+    diff = close - _shift(close)
+    up = np.maximum(diff, 0.0)
+    down = np.maximum(-diff, 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = smma(up, period) / smma(down, period)
+    return 100.0 - 100.0 / (1.0 + rs)
+
+
+def macd(close: np.ndarray, fast: int = 12, slow: int = 26, signal: int = 9):
+    """Returns (macd, signal) lines."""
+    line = ema(close, fast) - ema(close, slow)
+    return line, ema(line, signal)
+
+
+def crossover(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """+1 when `a` crosses `b` upwards, -1 downwards, 0 otherwise (NaN in warm-up).
+
+    Like bt.ind.CrossOver, equality does not reset the side: the previous
+    bar's last non-zero difference is compared with the current relation.
+    """
+    diff = a - b
+    nzd = diff.copy()
+    valid = np.flatnonzero(~np.isnan(diff))
+    if len(valid):
+        after_seed = np.arange(len(diff)) > valid[0]
+        nzd[after_seed & (diff == 0.0)] = np.nan
+        nzd = pd.Series(nzd).ffill().to_numpy()
+    prev = _shift(nzd)
+    cross = ((prev < 0.0) & (a > b)).astype(float) - ((prev > 0.0) & (a < b))
+    cross[np.isnan(prev) | np.isnan(diff)] = np.nan
+    return cross
+
+
+def atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int = 14) -> np.ndarray:
+    prev_close = _shift(close)
+    true_range = np.maximum(high, prev_close) - np.minimum(low, prev_close)
+    return smma(true_range, period)
+
+
+def adx(high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int = 14) -> np.ndarray:
+    upmove = high - _shift(high)
+    downmove = _shift(low) - low
+    warmup = np.isnan(upmove)
+    plus_dm = np.where((upmove > downmove) & (upmove > 0.0), upmove, 0.0)
+    minus_dm = np.where((downmove > upmove) & (downmove > 0.0), downmove, 0.0)
+    plus_dm[warmup] = minus_dm[warmup] = np.nan
+
+    avg_range = atr(high, low, close, period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        di_plus = 100.0 * smma(plus_dm, period) / avg_range
+        di_minus = 100.0 * smma(minus_dm, period) / avg_range
+        dx = np.abs(di_plus - di_minus) / (di_plus + di_minus)
+    return 100.0 * smma(dx, period)
+
+
+# =========================
+# Strategy rules
+# =========================
+class Signals(NamedTuple):
+    start: int                                # first bar next() runs on
+    long_entry: np.ndarray
+    short_entry: np.ndarray
+    long_exit: Optional[np.ndarray] = None    # None: exit on take_profit/stop_loss
+    short_exit: Optional[np.ndarray] = None
+    take_profit: float = 0.0
+    stop_loss: float = 0.0
+
+
+def _start(*lines: np.ndarray) -> int:
+    """Index of the first bar on which every indicator has a value."""
+    return max(int(np.argmax(~np.isnan(line))) if (~np.isnan(line)).any() else len(line)
+               for line in lines)
+
+
+def _sma_rsi_signals(bars: Dict[str, np.ndarray], p: dict) -> Signals:
+    close = bars["close"]
+    sma1, sma2 = sma(close, p["sma_short"]), sma(close, p["sma_long"])
+    rsi_ = rsi(close, p["rsi_period"])
+    return Signals(
+        start=_start(sma1, sma2, rsi_),
+        long_entry=(sma1 > sma2) & (rsi_ < p["rsi_overbought"]),
+        short_entry=np.zeros(len(close), dtype=bool),
+        take_profit=p["take_profit"],
+        stop_loss=p["stop_loss"],
+    )
+
+
+def _rsi_trend_filters(bars: Dict[str, np.ndarray], p: dict):
+    close = bars["close"]
+    rsi_ = rsi(close, p["rsi_period"])
+    trend = sma(close, p["trend_sma_period"])
+    long_entry = (rsi_ < p["rsi_oversold"]) & (close > trend)
+    short_entry = (rsi_ > p["rsi_overbought"]) & (close < trend)
+    return _start(rsi_, trend), rsi_, long_entry, short_entry
+
+
+def _rsi_trend_signals(bars: Dict[str, np.ndarray], p: dict) -> Signals:
+    start, rsi_, long_entry, short_entry = _rsi_trend_filters(bars, p)
+    return Signals(start, long_entry, short_entry, rsi_ > 50, rsi_ < 50)
+
+
+def _rsi_trend_tpsl_signals(bars: Dict[str, np.ndarray], p: dict) -> Signals:
+    start, _, long_entry, short_entry = _rsi_trend_filters(bars, p)
+    return Signals(start, long_entry, short_entry,
+                   take_profit=p["take_profit"], stop_loss=p["stop_loss"])
+
+
+def _rsi_macd_signals(bars: Dict[str, np.ndarray], p: dict) -> Signals:
+    close = bars["close"]
+    rsi_ = rsi(close, p["rsi_period"])
+    cross = crossover(*macd(close, p["macd1"], p["macd2"], p["macdsig"]))
+    return Signals(
+        start=_start(rsi_, cross),
+        long_entry=(rsi_ < p["rsi_oversold"]) & (cross > 0),
+        short_entry=(rsi_ > p["rsi_overbought"]) & (cross < 0),
+        long_exit=rsi_ > 50,
+        short_exit=rsi_ < 50,
+    )
+
+
+# strategy class name -> rules builder
+RULES: Dict[str, Callable[[Dict[str, np.ndarray], dict], Signals]] = {
+    "SmaRsiStrategy": _sma_rsi_signals,
+    "RsiTrendStrategy": _rsi_trend_signals,
+    "RsiTrendWithTPSLStrategy": _rsi_trend_tpsl_signals,
+    "RsiMacdStrategy": _rsi_macd_signals,
+}
+
+
+# =========================
+# Simulation
+# =========================
+class VectorResult(NamedTuple):
+    equity: pd.Series        # broker value per bar
+    trades: pd.DataFrame     # one row per trade (exit_* NaN if still open)
+    final_value: float
+    start: int               # first bar the strategy's next() runs on
+
+
+def _exit_mask(sig: Signals, close: np.ndarray, side: int, entry_price: float,
+               fill: int) -> np.ndarray:
+    if sig.long_exit is not None:
+        return (sig.long_exit if side > 0 else sig.short_exit)[fill:]
+    prices = close[fill:]
+    if side > 0:
+        return ((prices >= entry_price * (1 + sig.take_profit))
+                | (prices <= entry_price * (1 - sig.stop_loss)))
+    return ((prices <= entry_price * (1 - sig.take_profit))
+            | (prices >= entry_price * (1 + sig.stop_loss)))
+
+
+def simulate(bars: Dict[str, np.ndarray], sig: Signals, cash: float, stake: float) -> VectorResult:
+    open_, close = bars["open"], bars["close"]
+    n = len(close)
+    entries = np.flatnonzero(sig.long_entry | sig.short_entry)
+    entries = entries[entries >= sig.start]
+
+    fill_bars, fill_sizes, fill_prices, trades = [], [], [], []
+    cash_now = cash
+    i = sig.start
+    while True:
+        # Next entry signal with a bar left to fill on
+        pos = np.searchsorted(entries, i)
+        if pos == len(entries) or entries[pos] >= n - 1:
+            break
+        j = entries[pos]
+        side = 1 if sig.long_entry[j] else -1  # long is checked first in next()
+        size = side * stake
+
+        # Margin check at creation price, then at the actual fill price
+        if cash_now - size * close[j] < 0 or cash_now - size * open_[j + 1] < 0:
+            break
+
+        fill = j + 1
+        cash_now -= size * open_[fill]
+        fill_bars.append(fill), fill_sizes.append(size), fill_prices.append(open_[fill])
+        trade = {"entry_bar": fill, "side": side, "size": stake,
+                 "entry_price": open_[fill], "exit_bar": np.nan, "exit_price": np.nan}
+        trades.append(trade)
+
+        # Exit: first bar from the fill on where the exit rule holds
+        exits = np.flatnonzero(_exit_mask(sig, close, side, close[j], fill)) + fill
+        if not len(exits) or exits[0] >= n - 1:
+            break
+        out = exits[0] + 1
+        if cash_now + size * close[out - 1] < 0 or cash_now + size * open_[out] < 0:
+            break
+        cash_now += size * open_[out]
+        fill_bars.append(out), fill_sizes.append(-size), fill_prices.append(open_[out])
+        trade.update(exit_bar=out, exit_price=open_[out])
+        i = out
+
+    # Position and cash per bar from the fills, then equity = cash + pos * close
+    flows = np.zeros(n)
+    moves = np.zeros(n)
+    fill_bars = np.asarray(fill_bars, dtype=int)
+    np.add.at(flows, fill_bars, -np.asarray(fill_sizes, dtype=float) * np.asarray(fill_prices))
+    np.add.at(moves, fill_bars, np.asarray(fill_sizes, dtype=float))
+    equity = cash + np.cumsum(flows) + np.cumsum(moves) * close
+
+    times = bt_num_to_datetime(bars["datetime"])
+    trades = pd.DataFrame(trades, columns=["entry_bar", "side", "size", "entry_price",
+                                           "exit_bar", "exit_price"])
+    if len(trades):
+        trades["pnl"] = trades["side"] * trades["size"] * (trades["exit_price"] - trades["entry_price"])
+        trades["entry_time"] = times[trades["entry_bar"].to_numpy()]
+        exit_bars = trades["exit_bar"].fillna(0).astype(int).to_numpy()
+        trades["exit_time"] = times[exit_bars].where(trades["exit_bar"].notna().to_numpy())
+
+    series = pd.Series(equity, index=times)
+    final_value = float(equity[-1]) if n else float(cash)
+    return VectorResult(series, trades, final_value, sig.start)
+
+
+def run_vectorized(strategy_cls, bars: Dict[str, np.ndarray], params: Optional[dict] = None,
+                   cash: Optional[float] = None, stake: Optional[float] = None) -> VectorResult:
+    """Vectorized equivalent of run_strategy(strategy_cls, [feed], params)."""
+    name = strategy_cls.__name__
+    if name not in RULES:
+        raise ValueError(f"No vectorized rules for '{name}'. Supported: {list(RULES)}")
+
+    if cash is None or stake is None:
+        from run_backtest import CASH_START, ORDER_SIZE
+        cash = CASH_START if cash is None else cash
+        stake = ORDER_SIZE if stake is None else stake
+
+    p = dict(strategy_cls.params._getitems())
+    p.update(params or {})
+    columns = {k: np.asarray(bars[k], dtype=np.float64)
+               for k in ("datetime", "open", "high", "low", "close")}
+    return simulate(columns, RULES[name](columns, p), cash, stake)
@@ -0,0 +1,291 @@
+"""Walk-forward optimization: rolling in-sample / out-of-sample windows.
+
+The bars of data/{PAIR}_{tf}.csv are split into windows of TRAIN_DAYS followed
+by TEST_DAYS, rolled forward by TEST_DAYS. For each window every PARAM_GRID
+combination is run on the train slice, the best one by OPTIMIZE_BY is then run
+on the test slice, and the out-of-sample equity of all windows is stitched into
+one curve. Windows run concurrently on a process pool; each worker maps the
+cached bar arrays once and slices them per window (no re-reading the CSV).
+
+The test run starts early enough before the test window for the chosen params'
+indicators to be ready when it opens (WARMUP_BARS overrides it); the warm-up
+bars are train data, so the strategy only trades and records equity from the
+window start on. A test window that still cannot warm up is left out of the
+stitched equity with a warning.
+
+Usage:
+    python -m tools.walk_forward
+    python -m tools.walk_forward --strategy RsiMacdStrategy --pair EURJPY --tf 1h
+"""
+import argparse
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+from tools.bar_cache import bt_num_to_datetime, loaded_bars, loaded_trend_bars, slice_bars
+from tools.param_sweep import expand_grid
+from tools.strategy_registry import get_strategy
+
+
+# =========================
+# Configuration (edit here)
+# =========================
+STRATEGY = "RsiMacdStrategy"
+PARAM_GRID = {
+    "rsi_period": [10, 14, 21],
+    "rsi_oversold": [25, 30],
+    "rsi_overbought": [70, 75],
+}
+PAIR = "EURUSD"
+TF = "1h"
+TREND_TF: Optional[str] = None      # e.g. "4h" for strategies that read datas[1]
+TRAIN_DAYS = 120                    # the bundled data covers one year: 4 windows
+TEST_DAYS = 60
+WARMUP_BARS: Optional[int] = None   # main bars before each test window; None = what the params need
+OPTIMIZE_BY = "sharpe"              # any summary_metrics key, higher is better
+STOP_RULES: Optional[dict] = None   # EarlyStop rules for the train runs
+PROCESSES: Optional[int] = None     # None = all cores
+CACHE_INDICATORS = True             # share indicator lines across runs (tools.indicator_cache)
+OUTPUT_DIR = "reports"
+# =========================
+
+
+class Window(NamedTuple):
+    """One walk-forward step, bounds in Backtrader float days."""
+    index: int
+    train_start: float
+    train_end: float   # == test start
+    test_end: float
+
+
+def make_windows(datetimes: np.ndarray, train_days: float = TRAIN_DAYS,
+                 test_days: float = TEST_DAYS) -> List[Window]:
+    """Rolling windows over the data, aligned to whole days.
+
+    Every test part is a full `test_days` long: the days after the last one are
+    left out with a warning. Raises ValueError when not even one window fits.
+    """
+    first, end = np.floor(datetimes[0]), datetimes[-1] + 1
+    windows = []
+    start = first
+    while start + train_days + test_days <= end:
+        train_end = start + train_days
+        windows.append(Window(len(windows), start, train_end, train_end + test_days))
+        start += test_days
+    if not windows:
+        raise ValueError(f"Not enough data for one {train_days:g}-day train and "
+                         f"{test_days:g}-day test window")
+    untested = end - windows[-1].test_end
+    if untested >= 1:
+        warnings.warn(f"The last {untested:.0f} days are shorter than a {test_days:g}-day test "
+                      "window and stay out of sample")
+    return windows
+
+
+def slice_feeds(pair: str, tf: str, trend_tf: Optional[str], start: float, end: float,
+                warmup: int = 0) -> list:
+    """Feeds over the bars in [start, end) plus `warmup` earlier main bars."""
+    from run_backtest import bars_feed
+
+    main = slice_bars(loaded_bars(pair, tf), start, end, warmup)
+    feeds = [bars_feed(main, tf)]
+    if trend_tf:
+        # same time span as the main slice, so the trend feed never looks ahead
+        trend = slice_bars(loaded_trend_bars(pair, tf, trend_tf), main["datetime"][0], end)
+        feeds.append(bars_feed(trend, trend_tf))
+    return feeds
+
+
+def warmup_bars(strategy_cls, params: dict, pair: str, tf: str, trend_tf: Optional[str],
+                start: float) -> int:
+    """Main bars before `start` that `params`' indicators need, on every feed.
+
+    A trend feed's warm-up (in trend bars) is counted back on the trend bars
+    and converted to the main bars it spans.
+    """
+    from run_backtest import strategy_minperiods
+
+    need = strategy_minperiods(strategy_cls, params, 2 if trend_tf else 1)
+    bars = need[0] - 1
+    if trend_tf:
+        dt = loaded_bars(pair, tf)["datetime"]
+        trend_dt = loaded_trend_bars(pair, tf, trend_tf)["datetime"]
+        t = max(0, int(np.searchsorted(trend_dt, start)) - need[1])
+        first = int(np.searchsorted(dt, start))
+        bars = max(bars, first - int(np.searchsorted(dt, trend_dt[t])))
+    return bars
+
+
+def run_slice(strategy_cls, feeds: list, params: dict, stop_rules: Optional[dict] = None,
+              trade_from: Optional[float] = None):
+    """run_strategy, or None when the slice is shorter than the indicators' warm-up
+    (Backtrader's vectorized indicators raise IndexError on such short data)."""
+    from run_backtest import run_strategy
+
+    try:
+        return run_strategy(strategy_cls, feeds, params, stop_rules=stop_rules,
+                            cache_indicators=CACHE_INDICATORS, trade_from=trade_from)
+    except IndexError:
+        return None
+
+
+def optimize(strategy_cls, pair: str, tf: str, trend_tf: Optional[str], window: Window,
+             combos: List[dict], optimize_by: str = OPTIMIZE_BY,
+             stop_rules: Optional[dict] = None) -> tuple:
+    """Best (params, score) of `combos` on the window's train slice.
+
+    Combinations that were stopped early or could not warm up are never picked;
+    if none is usable the score is -inf.
+    """
+    from run_backtest import summary_metrics
+
+    best, best_score = combos[0], -np.inf
+    for params in combos:
+        feeds = slice_feeds(pair, tf, trend_tf, window.train_start, window.train_end)
+        run = run_slice(strategy_cls, feeds, params, stop_rules)
+        if run is None:
+            continue
+        cerebro, strat = run
+        metrics = summary_metrics(cerebro, strat)
+        if metrics["stop_reason"]:
+            continue
+        if metrics[optimize_by] > best_score:
+            best, best_score = params, metrics[optimize_by]
+    return best, best_score
+
+
+def out_of_sample(strategy_cls, pair: str, tf: str, trend_tf: Optional[str], window: Window,
+                  params: dict, warmup: Optional[int] = WARMUP_BARS) -> tuple:
+    """Run `params` on the test slice. Returns (datetimes, daily returns) inside the window.
+
+    `warmup` None takes the params' own warm-up (warmup_bars). Both are empty
+    when the data before the window is too short for the strategy to warm up.
+    """
+    from run_backtest import CASH_START
+
+    if warmup is None:
+        warmup = warmup_bars(strategy_cls, params, pair, tf, trend_tf, window.train_end)
+    feeds = slice_feeds(pair, tf, trend_tf, window.train_end, window.test_end, warmup)
+    run = run_slice(strategy_cls, feeds, params, trade_from=window.train_end)
+    if run is None:
+        return np.empty(0), np.empty(0)
+    _, strat = run
+    rec = strat.analyzers.equity.arrays()  # from the window start on (trade_from)
+
+    values = rec["value"]
+    returns = np.diff(values, prepend=CASH_START) / np.concatenate(([CASH_START], values[:-1]))
+    return rec["datetime"], returns
+
+
+def run_window(strategy_cls, pair: str, tf: str, trend_tf: Optional[str], window: Window,
+               combos: List[dict], optimize_by: str = OPTIMIZE_BY,
+               warmup: Optional[int] = WARMUP_BARS,
+               stop_rules: Optional[dict] = None) -> dict:
+    """Worker: optimize on the train slice, then evaluate on the test slice."""
+    params, score = optimize(strategy_cls, pair, tf, trend_tf, window, combos,
+                             optimize_by, stop_rules)
+    datetimes, returns = out_of_sample(strategy_cls, pair, tf, trend_tf, window, params, warmup)
+    return {
+        "window": window,
+        "params": params,
+        "train_score": score,
+        "datetimes": datetimes,
+        "returns": returns,
+    }
+
+
+def walk_forward(strategy_cls, param_grid: Dict[str, Iterable], pair: str, tf: str,
+                 trend_tf: Optional[str] = None, train_days: float = TRAIN_DAYS,
+                 test_days: float = TEST_DAYS, warmup: Optional[int] = WARMUP_BARS,
+                 optimize_by: str = OPTIMIZE_BY, processes: Optional[int] = None,
+                 stop_rules: Optional[dict] = None) -> tuple:
+    """Run all windows concurrently. Returns (per-window table, stitched OOS equity).
+
+    Windows whose test run could not warm up have NaN oos_return and no part in
+    the equity; a warning names them.
+    """
+    from run_backtest import CASH_START
+
+    # Build any missing cache entries up front so workers only ever map them
+    loaded_bars(pair, tf)
+    if trend_tf:
+        loaded_trend_bars(pair, tf, trend_tf)
+
+    windows = make_windows(loaded_bars(pair, tf)["datetime"], train_days, test_days)
+    combos = expand_grid(param_grid)
+
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [
+            pool.submit(run_window, strategy_cls, pair, tf, trend_tf, w, combos,
+                        optimize_by, warmup, stop_rules)
+            for w in windows
+        ]
+        results = [f.result() for f in futures]  # window order
+
+    cold = [r["window"].index for r in results if not len(r["returns"])]
+    if cold:
+        warnings.warn(f"Test windows {cold} could not warm up (too few bars before them; "
+                      "see --warmup) and are left out of the out-of-sample equity")
+
+    rows = []
+    for r in results:
+        w = r["window"]
+        start, train_end, test_end = bt_num_to_datetime([w.train_start, w.train_end, w.test_end])
+        rows.append({
+            "window": w.index,
+            "train_start": start,
+            "test_start": train_end,
+            "test_end": test_end,
+            **r["params"],
+            f"train_{optimize_by}": r["train_score"],
+            "oos_days": len(r["returns"]),
+            "oos_return": float(np.prod(1 + r["returns"]) - 1) if len(r["returns"]) else np.nan,
+        })
+
+    returns = np.concatenate([r["returns"] for r in results])
+    datetimes = np.concatenate([r["datetimes"] for r in results])
+    equity = pd.Series(CASH_START * np.cumprod(1 + returns),
+                       index=bt_num_to_datetime(datetimes), name="value")
+    return pd.DataFrame(rows), equity
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Walk-forward optimization (grid: config block)")
+    parser.add_argument("--strategy", default=STRATEGY)
+    parser.add_argument("--pair", default=PAIR)
+    parser.add_argument("--tf", default=TF)
+    parser.add_argument("--trend-tf", default=TREND_TF)
+    parser.add_argument("--train-days", type=float, default=TRAIN_DAYS)
+    parser.add_argument("--test-days", type=float, default=TEST_DAYS)
+    parser.add_argument("--warmup", type=int, default=WARMUP_BARS,
+                        help="main bars before each test window (default: what the params need)")
+    parser.add_argument("--optimize-by", default=OPTIMIZE_BY)
+    parser.add_argument("--jobs", type=int, default=PROCESSES)
+    args = parser.parse_args(argv)
+
+    from run_backtest import CASH_START, daily_returns, sharpe_ratio
+
+    strategy_cls = get_strategy(args.strategy)
+    table, equity = walk_forward(
+        strategy_cls, PARAM_GRID, args.pair, args.tf, args.trend_tf, args.train_days,
+        args.test_days, args.warmup, args.optimize_by, args.jobs, STOP_RULES,
+    )
+
+    stem = os.path.join(OUTPUT_DIR, f"walk_forward_{args.strategy}_{args.pair}_{args.tf}")
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    table.to_csv(stem + "_windows.csv", index=False)
+    equity.to_csv(stem + "_equity.csv")
+
+    print(table.to_string())
+    roi = equity.iloc[-1] / CASH_START - 1 if len(equity) else 0.0
+    print(f"\nOut-of-sample: {len(table)} windows, ROI {roi:.2%}, "
+          f"Sharpe {sharpe_ratio(daily_returns(equity)):.2f}")
+    print(f"Saved '{stem}_windows.csv' and '{stem}_equity.csv'")
+
+
+if __name__ == "__main__":
+    main()